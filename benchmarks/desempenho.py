@@ -0,0 +1,227 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+from types import SimpleNamespace
+
+# Benchmark de extração, limpeza, gravação, exportação e análise concorrente.
+# Tudo roda localmente: os corpora são sintéticos e a IA é substituída por um stub
+# com latência configurável, de modo que nenhuma chamada de rede é feita.
+#
+#   python benchmarks/desempenho.py --saida resultados.json
+#   python benchmarks/desempenho.py --linhas 1000 10000 100000 --max-docx 10000
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+VOCABULARIO = (
+    "autos inquerito procedimento oficio peticao despacho promotoria justica requerimento "
+    "testemunha depoimento delegado portaria notificacao prazo diligencia audiencia "
+    "investigado vitima representacao arquivamento denuncia laudo pericia documento "
+    "fls conforme termos artigo lei codigo processo penal civil publico interesse"
+).split()
+
+def gerar_linhas(quantidade, semente):
+    aleatorio = random.Random(semente)
+    for _ in range(quantidade):
+        yield " ".join(aleatorio.choice(VOCABULARIO) for _ in range(aleatorio.randint(6, 14)))
+
+# --- Corpora sintéticos ---
+
+def gerar_txt(caminho, paginas, linhas_por_pagina=40):
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        for pagina in range(paginas):
+            # Espaços e quebras extras para exercitar o limpar_texto
+            arquivo.write("\n\n   ".join(gerar_linhas(linhas_por_pagina, pagina)) + "\t \n\n")
+
+def gerar_docx(caminho, paginas, linhas_por_pagina=40):
+    from docx import Document
+    doc = Document()
+    for pagina in range(paginas):
+        for linha in gerar_linhas(linhas_por_pagina, pagina):
+            doc.add_paragraph(linha)
+    doc.save(caminho)
+
+# PDF mínimo (fonte Helvetica, uma stream de texto por página), suficiente para o PyPDF2
+def gerar_pdf(caminho, paginas, linhas_por_pagina=40):
+    objetos = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    filhos = []
+    for pagina in range(paginas):
+        num_pagina = 4 + 2 * pagina
+        num_conteudo = num_pagina + 1
+        comandos = ["BT /F1 9 Tf 12 TL 40 800 Td"]
+        comandos += [f"({linha}) '" for linha in gerar_linhas(linhas_por_pagina, pagina)]
+        comandos.append("ET")
+        fluxo = "\n".join(comandos).encode("latin-1")
+        objetos[num_conteudo] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(fluxo), fluxo)
+        objetos[num_pagina] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {num_conteudo} 0 R >>"
+        ).encode()
+        filhos.append(f"{num_pagina} 0 R")
+    objetos[2] = f"<< /Type /Pages /Kids [{' '.join(filhos)}] /Count {paginas} >>".encode()
+
+    with open(caminho, "wb") as arquivo:
+        arquivo.write(b"%PDF-1.4\n")
+        deslocamentos = []
+        for numero in range(1, len(objetos) + 1):
+            deslocamentos.append(arquivo.tell())
+            arquivo.write(b"%d 0 obj\n%s\nendobj\n" % (numero, objetos[numero]))
+        inicio_xref = arquivo.tell()
+        arquivo.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1))
+        for deslocamento in deslocamentos:
+            arquivo.write(b"%010d 00000 n \n" % deslocamento)
+        arquivo.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref))
+
+# --- Medição ---
+
+def medir(funcao, repeticoes=3):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return {"mediana_s": round(statistics.median(tempos), 4), "minimo_s": round(min(tempos), 4)}
+
+# Substitui as chamadas do litellm por respostas locais com a latência indicada
+def instalar_stub_llm(latencia):
+    import utils
+    litellm = utils.importar("litellm")
+
+    def resposta():
+        conteudo = json.dumps({"assunto": "Documento sintético", "resumo": "Resumo gerado pelo stub."})
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=conteudo))],
+            usage=SimpleNamespace(prompt_tokens=0, completion_tokens=0),
+        )
+
+    def completion(**kwargs):
+        time.sleep(latencia)
+        return resposta()
+
+    async def acompletion(**kwargs):
+        await asyncio.sleep(latencia)
+        return resposta()
+
+    litellm.completion = completion
+    litellm.acompletion = acompletion
+
+def benchmark_extracao(pasta, tamanhos_paginas, repeticoes):
+    import utils
+    resultados = []
+    for paginas in tamanhos_paginas:
+        caminhos = {
+            "pdf": os.path.join(pasta, f"corpus_{paginas}.pdf"),
+            "docx": os.path.join(pasta, f"corpus_{paginas}.docx"),
+            "txt": os.path.join(pasta, f"corpus_{paginas}.txt"),
+        }
+        gerar_pdf(caminhos["pdf"], paginas)
+        gerar_docx(caminhos["docx"], paginas)
+        gerar_txt(caminhos["txt"], paginas)
+
+        texto_bruto = utils.ler_txt(caminhos["txt"])
+        resultados.append({
+            "paginas": paginas,
+            "ler_pdf": medir(lambda: utils.ler_pdf(caminhos["pdf"], paralelo=False), repeticoes),
+            "ler_pdf_paralelo": medir(lambda: utils.ler_pdf_paralelo(caminhos["pdf"]), repeticoes),
+            "ler_docx": medir(lambda: utils.ler_docx(caminhos["docx"]), repeticoes),
+            "ler_txt": medir(lambda: utils.ler_txt(caminhos["txt"]), repeticoes),
+            "limpar_texto": medir(lambda: utils.limpar_texto(texto_bruto), repeticoes),
+            "caracteres": len(texto_bruto),
+        })
+    return resultados
+
+def benchmark_banco(pasta, tamanhos_linhas, max_docx):
+    import utils
+    from lote import inserir_documentos
+    from exportacao import exportar_relatorio_sql, FORMATOS
+
+    resultados = []
+    for linhas in tamanhos_linhas:
+        caminho_banco = os.path.join(pasta, f"bench_{linhas}.db")
+        utils.CAMINHO_BANCO = caminho_banco
+        utils.criar_banco()
+
+        registros = [
+            (f"Documento {i}", " ".join(gerar_linhas(4, i)), f"{i % 500:04d}/2025", f"2025-{i % 12 + 1:02d}-15")
+            for i in range(linhas)
+        ]
+        resultado = {"linhas": linhas}
+        resultado["inserir_documentos"] = medir(lambda: inserir_documentos(registros, caminho_banco), 1)
+
+        for formato in FORMATOS:
+            if formato == "docx" and linhas > max_docx:
+                continue
+            resultado[f"exportar_{formato}"] = medir(
+                lambda: exportar_relatorio_sql(formato=formato, pasta=pasta, caminho_banco=caminho_banco), 1
+            )
+            if formato == "docx":
+                # Segunda exportação: todas as seções vêm de fragmentos_relatorio
+                resultado["exportar_docx_secoes_guardadas"] = medir(
+                    lambda: exportar_relatorio_sql(formato="docx", pasta=pasta, caminho_banco=caminho_banco), 1
+                )
+        resultados.append(resultado)
+    return resultados
+
+def benchmark_llm(pasta, documentos, latencia, concorrencias):
+    import utils
+    from lote import analisar_textos
+
+    utils.CAMINHO_BANCO = os.path.join(pasta, "bench_llm.db")
+    utils.criar_banco()
+    instalar_stub_llm(latencia)
+
+    resultados = []
+    for concorrencia in concorrencias:
+        # Textos distintos a cada rodada para não serem atendidos pelo cache de resumos
+        textos = [f"rodada {concorrencia} documento {i}" for i in range(documentos)]
+        inicio = time.perf_counter()
+        analisar_textos(textos, concorrencia)
+        decorrido = time.perf_counter() - inicio
+        resultados.append({
+            "concorrencia": concorrencia,
+            "documentos": documentos,
+            "tempo_s": round(decorrido, 3),
+            "documentos_por_s": round(documentos / decorrido, 2),
+        })
+    return {"latencia_s": latencia, "rodadas": resultados}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de desempenho do PJ Docs (offline)")
+    parser.add_argument("--paginas", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--linhas", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--max-docx", type=int, default=10000, help="Maior volume exportado em DOCX")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--documentos-llm", type=int, default=64)
+    parser.add_argument("--latencia-llm", type=float, default=0.2, help="Latência do stub da IA, em segundos")
+    parser.add_argument("--concorrencias", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--saida", help="Arquivo JSON com os resultados")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="pj_docs_bench_") as pasta:
+        resultado = {
+            "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "cpus": os.cpu_count(),
+            "extracao": benchmark_extracao(pasta, args.paginas, args.repeticoes),
+            "banco": benchmark_banco(pasta, args.linhas, args.max_docx),
+            "llm": benchmark_llm(pasta, args.documentos_llm, args.latencia_llm, args.concorrencias),
+        }
+
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    print(texto)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
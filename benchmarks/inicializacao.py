@@ -0,0 +1,128 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+# Benchmark de inicialização: tempo até a primeira pintura da MainWindow e totais do
+# "python -X importtime". Cada medição roda em um processo novo (inicialização a frio
+# do interpretador, com o cache de bytecode já gerado).
+#
+#   python benchmarks/inicializacao.py --repeticoes 5 --saida inicializacao.json
+#   python benchmarks/inicializacao.py --limite-ms 1500   # falha se a mediana passar do limite
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASTA_TRABALHO = tempfile.mkdtemp(prefix="pj_docs_bench_")
+
+# Executado no processo filho (em uma pasta temporária, com banco vazio): repete o
+# bloco __main__ de main.py e avisa assim que a janela é pintada
+CODIGO_JANELA = """
+import sys
+from PySide6.QtCore import QObject, QEvent
+from PySide6.QtWidgets import QApplication
+import main
+main.criar_banco()
+
+class Observador(QObject):
+    def eventFilter(self, objeto, evento):
+        if evento.type() == QEvent.Paint:
+            print("pintado", flush=True)
+            QApplication.instance().exit(0)
+        return False
+
+app = QApplication(sys.argv)
+janela = main.MainWindow()
+observador = Observador()
+janela.installEventFilter(observador)
+janela.show()
+sys.exit(app.exec())
+"""
+
+def ambiente():
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    env["PYTHONPATH"] = RAIZ + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+def medir_primeira_pintura():
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(
+        [sys.executable, "-c", CODIGO_JANELA],
+        cwd=PASTA_TRABALHO, env=ambiente(), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    for linha in processo.stdout:
+        if linha.strip() == "pintado":
+            decorrido = time.perf_counter() - inicio
+            break
+    else:
+        decorrido = None
+    processo.wait()
+    return decorrido
+
+def medir_importtime(modulo):
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=PASTA_TRABALHO, env=ambiente(), capture_output=True, text=True
+    )
+    # Linhas no formato: "import time:   self [us] | cumulative | imported package"
+    modulos = {}
+    for linha in resultado.stderr.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        _, proprio, cumulativo, nome = (parte.strip() for parte in linha.replace("import time:", "|", 1).split("|"))
+        modulos[nome] = (int(proprio), int(cumulativo))
+
+    total_us = sum(proprio for proprio, _ in modulos.values())
+    mais_lentos = sorted(
+        ((nome, cumulativo) for nome, (_, cumulativo) in modulos.items() if not nome.startswith(" ")),
+        key=lambda item: item[1], reverse=True
+    )[:10]
+    return {
+        "modulo": modulo,
+        "total_ms": round(total_us / 1000, 1),
+        "cumulativo_ms": round(modulos.get(modulo, (0, 0))[1] / 1000, 1),
+        "mais_lentos_ms": {nome: round(cumulativo / 1000, 1) for nome, cumulativo in mais_lentos},
+        "bibliotecas_pesadas_carregadas": [
+            nome for nome in ("litellm", "docx", "PyPDF2") if nome in modulos
+        ],
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de inicialização do PJ Docs")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--saida", help="Arquivo JSON com os resultados")
+    parser.add_argument("--limite-ms", type=float, help="Mediana máxima aceitável para a primeira pintura")
+    args = parser.parse_args(argv)
+
+    medir_primeira_pintura()  # Execução descartada: gera o cache de bytecode
+    tempos = [medir_primeira_pintura() for _ in range(args.repeticoes)]
+    tempos_ms = [round(t * 1000, 1) for t in tempos if t is not None]
+
+    resultado = {
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "primeira_pintura_ms": {
+            "amostras": tempos_ms,
+            "mediana": statistics.median(tempos_ms) if tempos_ms else None,
+            "minimo": min(tempos_ms) if tempos_ms else None,
+        },
+        "importtime": [medir_importtime("utils"), medir_importtime("main")],
+    }
+
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    print(texto)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
+
+    mediana = resultado["primeira_pintura_ms"]["mediana"]
+    if args.limite_ms is not None and (mediana is None or mediana > args.limite_ms):
+        print(f"Regressão: primeira pintura em {mediana} ms (limite {args.limite_ms} ms)", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
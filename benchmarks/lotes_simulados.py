@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import random
+import argparse
+
+# Simulador local da API de lotes, para testar as remessas (remessas.py) de ponta a ponta
+# sem rede. Lê a pasta usada por EndpointArquivos, processa os lotes pendentes e grava os
+# resultados e os erros no formato de saída da OpenAI. O cache de prompts é simulado pelo
+# prefixo comum das requisições do lote (cached_tokens), o que mostra se as instruções fixas
+# de fato vêm antes do texto do documento.
+#
+#   endpoint_lotes=data/lotes_simulados python cli.py remessa enviar
+#   python benchmarks/lotes_simulados.py data/lotes_simulados --taxa-erro 0.1
+#   endpoint_lotes=data/lotes_simulados python cli.py remessa acompanhar
+
+RESUMO = "Visão geral.\n\nQuestões tratadas.\n\nConclusão.\n\nPendências."
+
+def prefixo_comum(a, b):
+    limite = min(len(a), len(b))
+    indice = 0
+    while indice < limite and a[indice] == b[indice]:
+        indice += 1
+    return indice
+
+def responder(pedido, referencia, taxa_erro, taxa_json_invalido):
+    # Retorna (linha de resultado, é erro?)
+    custom_id = pedido["custom_id"]
+    if random.random() < taxa_erro:
+        return {
+            "id": f"batch_req_{random.getrandbits(48):x}", "custom_id": custom_id,
+            "response": {"status_code": 500, "request_id": None,
+                         "body": {"error": {"message": "Erro interno simulado", "type": "server_error"}}},
+            "error": None,
+        }, True
+
+    corpo = pedido.get("body", {})
+    conteudo = json.dumps({"assunto": "Documento simulado", "resumo": RESUMO}, ensure_ascii=False)
+    if random.random() < taxa_json_invalido:
+        conteudo = f"```json\n{conteudo[:-1]},\n}}\n```"  # Malformado, mas reparável
+    serializado = json.dumps(corpo.get("messages", []), ensure_ascii=False)
+    tokens_prompt = len(serializado) // 4
+    # Como no provedor: o prefixo já visto (em blocos de 128 tokens) sai do cache
+    tokens_cache = 0 if referencia is None else (prefixo_comum(serializado, referencia) // 4) // 128 * 128
+    return {
+        "id": f"batch_req_{random.getrandbits(48):x}", "custom_id": custom_id,
+        "response": {
+            "status_code": 200, "request_id": f"req_{random.getrandbits(48):x}",
+            "body": {
+                "id": f"simulado-{random.getrandbits(48):x}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": corpo.get("model", "simulado"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": conteudo}, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": tokens_prompt,
+                    "completion_tokens": len(conteudo) // 4,
+                    "total_tokens": tokens_prompt + len(conteudo) // 4,
+                    "prompt_tokens_details": {"cached_tokens": tokens_cache},
+                },
+            },
+        },
+        "error": None,
+    }, False
+
+def processar_lote(pasta, lote_id, taxa_erro=0.0, taxa_json_invalido=0.0, taxa_sem_resposta=0.0):
+    caminho_estado = os.path.join(pasta, "lotes", f"{lote_id}.json")
+    with open(caminho_estado, encoding="utf-8") as entrada:
+        estado = json.load(entrada)
+
+    resultados, erros = [], []
+    referencias = {}  # prompt_cache_key -> mensagens da primeira requisição
+    with open(os.path.join(pasta, "entrada", f"{lote_id}.jsonl"), encoding="utf-8") as entrada:
+        for linha in entrada:
+            if not linha.strip():
+                continue
+            pedido = json.loads(linha)
+            if random.random() < taxa_sem_resposta:
+                continue  # Simula um lote expirado antes de concluir
+            chave = pedido.get("body", {}).get("prompt_cache_key")
+            resultado, erro = responder(pedido, referencias.get(chave), taxa_erro, taxa_json_invalido)
+            referencias.setdefault(chave, json.dumps(pedido.get("body", {}).get("messages", []), ensure_ascii=False))
+            (erros if erro else resultados).append(resultado)
+
+    for nome, linhas, campo in (("saida", resultados, "output_file_id"), ("erros", erros, "error_file_id")):
+        if linhas:
+            arquivo_id = f"file_{lote_id}_{nome}.jsonl"
+            with open(os.path.join(pasta, "saida", arquivo_id), "w", encoding="utf-8") as saida:
+                saida.writelines(json.dumps(linha, ensure_ascii=False) + "\n" for linha in linhas)
+            estado[campo] = arquivo_id
+    estado["status"] = "expired" if taxa_sem_resposta else "completed"
+    estado["request_counts"] = {"total": len(resultados) + len(erros), "completed": len(resultados), "failed": len(erros)}
+    with open(caminho_estado, "w", encoding="utf-8") as saida:
+        json.dump(estado, saida)
+    return estado
+
+def processar_pendentes(pasta, **opcoes):
+    processados = []
+    pasta_lotes = os.path.join(pasta, "lotes")
+    for nome in sorted(os.listdir(pasta_lotes)) if os.path.isdir(pasta_lotes) else []:
+        with open(os.path.join(pasta_lotes, nome), encoding="utf-8") as entrada:
+            estado = json.load(entrada)
+        if estado["status"] == "validating":
+            processados.append(processar_lote(pasta, estado["id"], **opcoes))
+    return processados
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador local da API de lotes (pasta de EndpointArquivos)")
+    parser.add_argument("pasta", help="Mesma pasta informada em endpoint_lotes")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de requisições com erro 500")
+    parser.add_argument("--taxa-json-invalido", type=float, default=0.0, help="Fração de respostas com JSON reparável")
+    parser.add_argument("--taxa-sem-resposta", type=float, default=0.0, help="Fração sem resposta (lote expirado)")
+    parser.add_argument("--continuo", action="store_true", help="Continua aguardando novos lotes")
+    args = parser.parse_args()
+
+    opcoes = {"taxa_erro": args.taxa_erro, "taxa_json_invalido": args.taxa_json_invalido,
+              "taxa_sem_resposta": args.taxa_sem_resposta}
+    while True:
+        for estado in processar_pendentes(args.pasta, **opcoes):
+            print(json.dumps({"lote": estado["id"], "estado": estado["status"], **estado["request_counts"]}))
+        if not args.continuo:
+            break
+        time.sleep(2)
+
+if __name__ == "__main__":
+    main()
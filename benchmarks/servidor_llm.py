@@ -0,0 +1,138 @@
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Servidor local compatível com a API de chat da OpenAI, para testar sem rede as novas
+# tentativas, os limites e o disjuntor de cliente_llm.py e para testes de carga.
+# Simula latência, erros 429/500 e respostas com JSON malformado.
+#
+#   python benchmarks/servidor_llm.py --porta 8765 --latencia 0.3 --taxa-erro 0.1 --taxa-json-invalido 0.1
+#
+# No .env (ou no ambiente) da aplicação:
+#   api_base=http://127.0.0.1:8765/v1
+#   modelo_selecionado=openai/simulado
+#   OPENAI_API_KEY=qualquer
+
+RESUMO = "Visão geral.\n\nQuestões tratadas.\n\nConclusão.\n\nPendências."
+
+class Estatisticas:
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.contagens = {}
+
+    def contar(self, chave):
+        with self.trava:
+            self.contagens[chave] = self.contagens.get(chave, 0) + 1
+
+class Manipulador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Mantém a conexão aberta, como um provedor real
+
+    def log_message(self, formato, *argumentos):
+        if self.server.verboso:
+            super().log_message(formato, *argumentos)
+
+    def responder(self, status, corpo, cabecalhos=None):
+        dados = json.dumps(corpo).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/estatisticas"):
+            self.responder(200, self.server.estatisticas.contagens)
+        else:
+            self.responder(404, {"error": {"message": "Rota desconhecida"}})
+
+    def do_POST(self):
+        tamanho = int(self.headers.get("Content-Length", 0))
+        try:
+            pedido = json.loads(self.rfile.read(tamanho) or b"{}")
+        except ValueError:
+            self.responder(400, {"error": {"message": "JSON inválido", "type": "invalid_request_error"}})
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.responder(404, {"error": {"message": "Rota desconhecida"}})
+            return
+
+        servidor = self.server
+        time.sleep(servidor.latencia * random.uniform(0.5, 1.5))
+        sorteio = random.random()
+        if sorteio < servidor.taxa_erro / 2:
+            servidor.estatisticas.contar("429")
+            self.responder(429, {"error": {"message": "Limite de requisições", "type": "rate_limit_error"}},
+                           {"Retry-After": "1"})
+            return
+        if sorteio < servidor.taxa_erro:
+            servidor.estatisticas.contar("500")
+            self.responder(500, {"error": {"message": "Erro interno simulado", "type": "server_error"}})
+            return
+
+        mensagens = pedido.get("messages", [])
+        if random.random() < servidor.taxa_json_invalido:
+            servidor.estatisticas.contar("json_invalido")
+            conteudo = '{"assunto": "Documento simulado", "resumo": "Resposta cortada'
+        else:
+            servidor.estatisticas.contar("200")
+            corpo = {"assunto": "Documento simulado", "resumo": RESUMO}
+            conteudo = json.dumps(corpo, ensure_ascii=False)
+            if pedido.get("response_format", {}).get("type") != "json_object":
+                conteudo = RESUMO
+            elif random.random() < servidor.taxa_json_invalido:
+                conteudo = f"```json\n{conteudo[:-1]},\n}}\n```"  # Malformado, mas reparável
+
+        tokens_prompt = sum(len(str(mensagem.get("content", ""))) for mensagem in mensagens) // 4
+        self.responder(200, {
+            "id": f"simulado-{random.getrandbits(48):x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": pedido.get("model", "simulado"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": conteudo},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": tokens_prompt,
+                "completion_tokens": len(conteudo) // 4,
+                "total_tokens": tokens_prompt + len(conteudo) // 4,
+            },
+        })
+
+def criar_servidor(porta=8765, latencia=0.2, taxa_erro=0.0, taxa_json_invalido=0.0, verboso=False):
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), Manipulador)
+    servidor.daemon_threads = True
+    servidor.latencia = latencia
+    servidor.taxa_erro = taxa_erro
+    servidor.taxa_json_invalido = taxa_json_invalido
+    servidor.verboso = verboso
+    servidor.estatisticas = Estatisticas()
+    return servidor
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local compatível com a API de chat da OpenAI")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--latencia", type=float, default=0.2, help="Segundos por resposta (média)")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de respostas 429/500")
+    parser.add_argument("--taxa-json-invalido", type=float, default=0.0, help="Fração de respostas com JSON malformado")
+    parser.add_argument("--verboso", action="store_true")
+    args = parser.parse_args()
+
+    servidor = criar_servidor(args.porta, args.latencia, args.taxa_erro, args.taxa_json_invalido, args.verboso)
+    print(f"Servidor em http://127.0.0.1:{args.porta}/v1 (Ctrl+C para encerrar)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        print(json.dumps(servidor.estatisticas.contagens))
+
+if __name__ == "__main__":
+    main()
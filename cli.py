@@ -0,0 +1,280 @@
+import sys
+import json
+import argparse
+from contextlib import redirect_stdout
+from datetime import date
+
+# Ponto de entrada sem interface gráfica (não importa PySide6), para uso em servidores e no cron.
+# O progresso é emitido em JSON, uma linha por evento, na saída padrão; as mensagens
+# informativas das demais funções são desviadas para a saída de erros.
+saida_eventos = sys.stdout
+
+def emitir(evento, **dados):
+    print(json.dumps({"evento": evento, **dados}, ensure_ascii=False), file=saida_eventos, flush=True)
+
+def comando_banco(args):
+    from utils import criar_banco, conectar
+    criar_banco()
+    conn = conectar()
+    try:
+        versao = conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+    emitir("banco", versao=versao)
+    return 0
+
+def comando_ingerir(args):
+    from utils import criar_banco, conectar
+    from lote import listar_arquivos, processar_lote
+
+    criar_banco()
+    if args.descricao:
+        # Cadastra o procedimento, caso ainda não exista
+        conn = conectar()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR IGNORE INTO procedimentos (numero, descricao) VALUES (?, ?)",
+                    (args.procedimento, args.descricao)
+                )
+        finally:
+            conn.close()
+
+    emitir("inicio", arquivos=len(listar_arquivos(args.caminhos)), procedimento=args.procedimento)
+    try:
+        inseridos, falhas = processar_lote(
+            args.caminhos,
+            args.procedimento,
+            concorrencia=args.concorrencia,
+            max_processos=args.processos,
+            ao_progredir=lambda concluidos, total: emitir("progresso", concluidos=concluidos, total=total)
+        )
+    except Exception as e:
+        emitir("falha", erro=str(e))
+        return 2
+    for arquivo, erro in falhas:
+        emitir("falha", arquivo=arquivo, erro=erro)
+    emitir("concluido", inseridos=inseridos, falhas=len(falhas))
+    return 2 if falhas else 0
+
+def comando_exportar(args):
+    from filtros import FiltroDocumentos
+    from exportacao import exportar_relatorio_sql
+
+    filtro = FiltroDocumentos(
+        procedimentos=args.procedimento,
+        data_inicio=args.desde,
+        data_fim=args.ate,
+        texto_titulo=args.titulo
+    )
+    clausula, parametros = filtro.montar()
+    try:
+        caminho = exportar_relatorio_sql(clausula, parametros, args.formato, args.pasta)
+    except Exception as e:
+        emitir("falha", erro=str(e))
+        return 2
+    if caminho is None:
+        emitir("vazio")
+        return 1
+    emitir("concluido", arquivo=caminho)
+    return 0
+
+def comando_refazer(args):
+    from filtros import FiltroDocumentos
+    from lote import refazer_resumos
+
+    filtro = FiltroDocumentos(
+        procedimentos=args.procedimento,
+        data_inicio=args.desde,
+        data_fim=args.ate,
+        texto_titulo=args.titulo
+    )
+    clausula, parametros = filtro.montar()
+    try:
+        atualizados, falhas = refazer_resumos(
+            clausula, parametros,
+            concorrencia=args.concorrencia,
+            ao_progredir=lambda concluidos, total: emitir("progresso", concluidos=concluidos, total=total)
+        )
+    except Exception as e:
+        emitir("falha", erro=str(e))
+        return 2
+    for hash_texto, erro in falhas:
+        emitir("falha", hash_texto=hash_texto, erro=erro)
+    emitir("concluido", atualizados=atualizados, falhas=len(falhas))
+    return 2 if falhas else 0
+
+def comando_metricas(args):
+    from metricas import resumo_metricas
+    for grupo in resumo_metricas(args.dias):
+        emitir("metricas", **grupo)
+    return 0
+
+def comando_importar(args):
+    from utils import criar_banco
+    from importacao import importar_arquivo
+
+    criar_banco()
+    try:
+        resumo = importar_arquivo(
+            args.arquivo,
+            tipo=args.tipo,
+            criar_procedimentos=args.criar_procedimentos,
+            ao_progredir=lambda lidas: emitir("progresso", lidas=lidas)
+        )
+    except Exception as e:
+        emitir("falha", arquivo=args.arquivo, erro=str(e))
+        return 2
+    emitir("concluido", **resumo)
+    return 2 if resumo["rejeitados"] else 0
+
+def comando_servico(args):
+    import servico
+    argumentos = ["--host", args.host, "--leitores", str(args.leitores)]
+    if args.permitir_rede:
+        argumentos.append("--permitir-rede")
+    if args.porta:
+        argumentos += ["--porta", str(args.porta)]
+    servico.main(argumentos)
+    return 0
+
+def comando_vigiar(args):
+    from utils import criar_banco
+    from vigilancia import VigiaPastas
+
+    criar_banco()
+    vigia = VigiaPastas(
+        args.pasta,
+        intervalo=args.intervalo,
+        estabilidade=args.estabilidade,
+        concorrencia=args.concorrencia,
+        max_processos=args.processos,
+        ao_evento=emitir
+    )
+    if args.uma_vez:
+        emitir("fim", arquivos=vigia.executar_uma_vez())
+        return 0
+    try:
+        vigia.executar()
+    except KeyboardInterrupt:
+        emitir("fim")
+    return 0
+
+def comando_remessa(args):
+    from utils import criar_banco
+
+    criar_banco()
+    try:
+        return executar_remessa(args)
+    except Exception as e:
+        emitir("falha", erro=str(e))
+        return 2
+
+def executar_remessa(args):
+    import remessas
+
+    endpoint = remessas.obter_endpoint(args.endpoint) if args.acao in ("enviar", "acompanhar") else None
+    if args.acao == "preparar":
+        if not args.procedimento or not args.caminhos:
+            emitir("falha", erro="Informe o procedimento e os arquivos ou pastas")
+            return 1
+        ids, imediatos, falhas = remessas.preparar_remessas(args.caminhos, args.procedimento, max_processos=args.processos)
+        for arquivo, erro in falhas:
+            emitir("falha", arquivo=arquivo, erro=erro)
+        emitir("concluido", remessas=ids, registrados_sem_ia=imediatos, falhas=len(falhas))
+        return 2 if falhas else 0
+    if args.acao == "repetir":
+        remessa_id, perdidos = remessas.repetir_falhas()
+        for arquivo, erro in perdidos:
+            emitir("falha", arquivo=arquivo, erro=erro)
+        emitir("concluido", remessa=remessa_id, falhas=len(perdidos))
+        return 2 if perdidos else 0
+    if args.acao == "enviar":
+        emitir("concluido", enviadas=remessas.enviar_remessas(endpoint, ao_evento=emitir))
+        return 0
+    if args.acao == "acompanhar":
+        remessas.acompanhar_remessas(endpoint, ao_evento=emitir)
+        return 0
+    for remessa in remessas.listar_remessas():
+        emitir("remessa", **remessa)
+    return 0
+
+def criar_parser():
+    parser = argparse.ArgumentParser(prog="pj-docs", description="PJ Docs sem interface gráfica")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    banco = subparsers.add_parser("banco", help="Cria ou migra o banco de dados")
+    banco.set_defaults(funcao=comando_banco)
+
+    ingerir = subparsers.add_parser("ingerir", help="Resume arquivos e os registra em um procedimento")
+    ingerir.add_argument("procedimento", help="Número do procedimento")
+    ingerir.add_argument("caminhos", nargs="+", help="Arquivos (.pdf, .docx, .txt, .odt, .rtf, .html, .eml) ou pastas")
+    ingerir.add_argument("--descricao", help="Cadastra o procedimento com esta descrição, se não existir")
+    ingerir.add_argument("--concorrencia", type=int, help="Chamadas simultâneas à IA (padrão: concorrencia_llm)")
+    ingerir.add_argument("--processos", type=int, help="Processos para a extração de texto (padrão: núcleos da CPU)")
+    ingerir.set_defaults(funcao=comando_ingerir)
+
+    exportar = subparsers.add_parser("exportar", help="Exporta o relatório de documentos")
+    exportar.add_argument("--formato", choices=["docx", "csv", "jsonl", "html"], default="docx")
+    exportar.add_argument("--procedimento", action="append", help="Filtra por procedimento (pode ser repetido)")
+    exportar.add_argument("--desde", type=date.fromisoformat, help="Data inicial (AAAA-MM-DD)")
+    exportar.add_argument("--ate", type=date.fromisoformat, help="Data final, inclusiva (AAAA-MM-DD)")
+    exportar.add_argument("--titulo", default="", help="Palavras que devem constar do título")
+    exportar.add_argument("--pasta", help="Pasta de destino (padrão: PASTA_DOWNLOADS)")
+    exportar.set_defaults(funcao=comando_exportar)
+
+    refazer = subparsers.add_parser("refazer", help="Refaz os resumos a partir dos textos guardados no banco")
+    refazer.add_argument("--procedimento", action="append", help="Filtra por procedimento (pode ser repetido)")
+    refazer.add_argument("--desde", type=date.fromisoformat, help="Data inicial (AAAA-MM-DD)")
+    refazer.add_argument("--ate", type=date.fromisoformat, help="Data final, inclusiva (AAAA-MM-DD)")
+    refazer.add_argument("--titulo", default="", help="Palavras que devem constar do título")
+    refazer.add_argument("--concorrencia", type=int, help="Chamadas simultâneas à IA (padrão: concorrencia_llm)")
+    refazer.set_defaults(funcao=comando_refazer)
+
+    importar = subparsers.add_parser("importar", help="Importa procedimentos ou documentos de um CSV ou JSONL")
+    importar.add_argument("arquivo", help="CSV (';' ou ',') ou JSONL, com cabeçalhos como os da exportação")
+    importar.add_argument("--tipo", choices=["procedimentos", "documentos"], help="Padrão: detectado pelas colunas")
+    importar.add_argument("--criar-procedimentos", action="store_true",
+                          help="Cadastra os procedimentos ausentes, em vez de rejeitar os documentos")
+    importar.set_defaults(funcao=comando_importar)
+
+    vigiar = subparsers.add_parser("vigiar", help="Resume automaticamente os arquivos novos ou alterados de uma pasta")
+    vigiar.add_argument("pasta", help="Pasta de entrada, com uma subpasta por procedimento (ex.: 0001-2025)")
+    vigiar.add_argument("--intervalo", type=float, help="Segundos entre varreduras (padrão: 5; 60 com o watchdog)")
+    vigiar.add_argument("--estabilidade", type=float, default=2.0, help="Segundos sem alterações antes de processar")
+    vigiar.add_argument("--uma-vez", action="store_true", help="Varre e processa uma única vez (uso no cron)")
+    vigiar.add_argument("--concorrencia", type=int, help="Chamadas simultâneas à IA (padrão: concorrencia_llm)")
+    vigiar.add_argument("--processos", type=int, help="Processos para a extração de texto (padrão: núcleos da CPU)")
+    vigiar.set_defaults(funcao=comando_vigiar)
+
+    servir = subparsers.add_parser("servico", help="Serviço de banco compartilhado para várias estações (HTTP/JSON)")
+    servir.add_argument("--host", default="127.0.0.1")
+    servir.add_argument("--permitir-rede", action="store_true",
+                        help="Necessário para atender em outra interface além da local (exige token_servico no .env)")
+    servir.add_argument("--porta", type=int, help="Padrão: porta_servico no .env ou 8470")
+    servir.add_argument("--leitores", type=int, default=8, help="Conexões de leitura simultâneas")
+    servir.set_defaults(funcao=comando_servico)
+
+    remessa = subparsers.add_parser("remessa", help="Resumos pela API de lotes do provedor (até 24 h, menor custo)")
+    remessa.add_argument("acao", choices=["preparar", "enviar", "acompanhar", "repetir", "listar"])
+    remessa.add_argument("procedimento", nargs="?", help="Número do procedimento (preparar)")
+    remessa.add_argument("caminhos", nargs="*", help="Arquivos ou pastas (preparar)")
+    remessa.add_argument("--processos", type=int, help="Processos para a extração de texto (padrão: núcleos da CPU)")
+    remessa.add_argument("--endpoint", help="openai ou a pasta do simulador local (padrão: endpoint_lotes)")
+    remessa.set_defaults(funcao=comando_remessa)
+
+    metricas = subparsers.add_parser("metricas", help="Estatísticas das chamadas à IA (latência, tokens, custo)")
+    metricas.add_argument("--dias", type=int, default=30, help="Período considerado, em dias (padrão: 30)")
+    metricas.set_defaults(funcao=comando_metricas)
+
+    return parser
+
+def main(argv=None):
+    global saida_eventos
+    args = criar_parser().parse_args(argv)
+    saida_eventos = sys.stdout
+    with redirect_stdout(sys.stderr):
+        return args.funcao(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
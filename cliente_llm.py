@@ -0,0 +1,243 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import threading
+
+from utils import importar, contar_tokens_texto
+
+# Camada de acesso à IA usada por utils.analisar_conteudo e pelo lote: sessão HTTP
+# compartilhada, limites de requisições e de tokens por minuto (baldes de fichas),
+# novas tentativas com espera exponencial aleatória, disjuntor para falhas seguidas e
+# reparo de respostas JSON malformadas. Os limites valem para o processo; várias
+# estações usando a mesma chave devem dividir entre si os valores do provedor.
+
+limite_rpm = float(os.getenv('limite_rpm', '0'))              # 0 = sem limite
+limite_tpm = float(os.getenv('limite_tpm', '0'))
+max_tentativas_llm = max(1, int(os.getenv('max_tentativas_llm', '4')))  # Ao menos a chamada original
+timeout_llm = float(os.getenv('timeout_llm', '120'))
+conexoes_llm = int(os.getenv('conexoes_llm', '16'))
+api_base = os.getenv('api_base')                              # Ex.: http://127.0.0.1:8765/v1 (servidor local)
+
+ESPERA_BASE = 1.0
+ESPERA_MAXIMA = 60.0
+FALHAS_PARA_ABRIR = 5
+SEGUNDOS_ABERTO = 30.0
+
+class CircuitoAberto(Exception):
+    pass
+
+class RespostaInvalida(ValueError):
+    pass
+
+# --- Balde de fichas: reserva a capacidade e informa quanto esperar ---
+
+class BaldeFichas:
+    def __init__(self, por_minuto):
+        self.capacidade = por_minuto
+        self.taxa = por_minuto / 60.0
+        self.fichas = por_minuto
+        self.atualizado = time.monotonic()
+        self._trava = threading.Lock()
+
+    # A reserva é feita na hora (o saldo pode ficar negativo); quem chamou espera o tempo
+    # devolvido, com time.sleep ou asyncio.sleep. Assim o mesmo balde atende threads e
+    # laços de eventos diferentes.
+    def reservar(self, quantidade=1):
+        if self.capacidade <= 0:
+            return 0.0
+        quantidade = min(quantidade, self.capacidade)  # Um pedido maior que o limite passa sozinho
+        with self._trava:
+            agora = time.monotonic()
+            self.fichas = min(self.capacidade, self.fichas + (agora - self.atualizado) * self.taxa)
+            self.atualizado = agora
+            self.fichas -= quantidade
+            return max(0.0, -self.fichas / self.taxa)
+
+# --- Disjuntor: após falhas seguidas, recusa chamadas por um tempo e depois testa uma ---
+
+class Disjuntor:
+    def __init__(self, falhas_para_abrir=FALHAS_PARA_ABRIR, segundos_aberto=SEGUNDOS_ABERTO):
+        self.falhas_para_abrir = falhas_para_abrir
+        self.segundos_aberto = segundos_aberto
+        self.falhas = 0
+        self.aberto_ate = 0.0
+        self._trava = threading.Lock()
+
+    @property
+    def estado(self):
+        if self.falhas < self.falhas_para_abrir:
+            return "fechado"
+        return "aberto" if time.monotonic() < self.aberto_ate else "meio-aberto"
+
+    def permitir(self):
+        with self._trava:
+            if self.estado == "aberto":
+                raise CircuitoAberto(
+                    f"Serviço de IA indisponível após {self.falhas} falhas seguidas; "
+                    f"nova tentativa em {self.aberto_ate - time.monotonic():.0f} s"
+                )
+            if self.estado == "meio-aberto":
+                # Apenas uma chamada de teste; as demais continuam recusadas (CircuitoAberto)
+                # até que ela feche o disjuntor ou, falhando, o prazo recomece
+                self.aberto_ate = time.monotonic() + self.segundos_aberto
+
+    def sucesso(self):
+        with self._trava:
+            self.falhas = 0
+
+    def falha(self):
+        with self._trava:
+            self.falhas += 1
+            if self.falhas >= self.falhas_para_abrir:
+                self.aberto_ate = time.monotonic() + self.segundos_aberto
+
+baldes_requisicoes = BaldeFichas(limite_rpm)
+baldes_tokens = BaldeFichas(limite_tpm)
+disjuntor = Disjuntor()
+
+# --- Sessões HTTP compartilhadas (o litellm as usa no lugar de criar clientes próprios) ---
+
+_trava_sessoes = threading.Lock()
+_sessoes_async = {}
+
+def _limites_http():
+    httpx = importar('httpx')
+    return httpx.Limits(max_connections=conexoes_llm, max_keepalive_connections=conexoes_llm)
+
+def configurar_sessao():
+    litellm = importar('litellm')
+    with _trava_sessoes:
+        if litellm.client_session is None:
+            litellm.suppress_debug_info = True  # As falhas já são informadas aqui, em uma linha
+            httpx = importar('httpx')
+            litellm.client_session = httpx.Client(limits=_limites_http(), timeout=timeout_llm)
+
+# O cliente assíncrono fica preso ao laço de eventos em que foi criado; cada asyncio.run
+# (um por lote) recebe o seu
+def configurar_sessao_async():
+    litellm = importar('litellm')
+    laco = asyncio.get_running_loop()
+    with _trava_sessoes:
+        sessao = _sessoes_async.get(id(laco))
+        if sessao is None or sessao[0] is not laco:
+            httpx = importar('httpx')
+            for chave, (outro_laco, _) in list(_sessoes_async.items()):
+                if outro_laco.is_closed():
+                    del _sessoes_async[chave]
+            sessao = (laco, httpx.AsyncClient(limits=_limites_http(), timeout=timeout_llm))
+            _sessoes_async[id(laco)] = sessao
+        litellm.aclient_session = sessao[1]
+
+# --- Reparo de JSON ---
+
+_CERCAS = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.I)
+_VIRGULA_FINAL = re.compile(r",\s*([}\]])")
+
+def carregar_json(conteudo):
+    try:
+        return json.loads(conteudo)
+    except (TypeError, ValueError):
+        pass
+    # Respostas comuns de modelos: bloco ```json, texto antes/depois do objeto, vírgula sobrando
+    texto = _CERCAS.sub("", conteudo or "")
+    inicio, fim = texto.find("{"), texto.rfind("}")
+    if inicio != -1 and fim > inicio:
+        texto = texto[inicio:fim + 1]
+    texto = _VIRGULA_FINAL.sub(r"\1", texto)
+    try:
+        return json.loads(texto)
+    except ValueError as e:
+        raise RespostaInvalida(f"Resposta da IA não é um JSON válido: {e}") from e
+
+# --- Novas tentativas ---
+
+def _erros_transitorios():
+    litellm = importar('litellm')
+    return (
+        litellm.RateLimitError, litellm.Timeout, litellm.APIConnectionError,
+        litellm.ServiceUnavailableError, litellm.InternalServerError, litellm.BadGatewayError,
+        RespostaInvalida, TimeoutError, ConnectionError,
+    )
+
+def espera_backoff(tentativa, erro=None):
+    # Respeita o Retry-After enviado pelo provedor, quando houver
+    cabecalhos = getattr(erro, 'litellm_response_headers', None) or {}
+    try:
+        sugerido = float(cabecalhos.get('retry-after', ''))
+    except (TypeError, ValueError):
+        sugerido = 0.0
+    # Espera exponencial com variação aleatória completa ("full jitter")
+    return max(sugerido, random.uniform(0, min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** tentativa)))
+
+def _parametros(kwargs):
+    parametros = {"timeout": timeout_llm, "max_retries": 0, **kwargs}  # As tentativas ficam a cargo desta camada
+    if api_base and "api_base" not in parametros:
+        parametros["api_base"] = api_base
+    return parametros
+
+def _tokens_estimados(kwargs):
+    texto = "\n".join(str(mensagem.get("content", "")) for mensagem in kwargs.get("messages", []))
+    return contar_tokens_texto(texto, kwargs.get("model"))
+
+# Chamada síncrona com limites, novas tentativas e validação opcional da resposta
+# (por exemplo, utils.interpretar_resposta). Retorna (valor, resultado, tentativas).
+def completar(validar=None, medicao=None, **kwargs):
+    litellm = importar('litellm')
+    configurar_sessao()
+    tokens = _tokens_estimados(kwargs)
+    transitorios = _erros_transitorios()
+    for tentativa in range(max_tentativas_llm):
+        if medicao is not None:
+            medicao.tentativas = tentativa + 1
+        disjuntor.permitir()
+        time.sleep(max(baldes_requisicoes.reservar(1), baldes_tokens.reservar(tokens)))
+        try:
+            resultado = litellm.completion(**_parametros(kwargs))
+            if medicao is not None:
+                medicao.resultado = resultado
+            valor = validar(resultado) if validar else resultado
+        except transitorios as e:
+            if isinstance(e, RespostaInvalida):
+                disjuntor.sucesso()  # O serviço respondeu; só o conteúdo veio malformado
+            else:
+                disjuntor.falha()
+            if tentativa + 1 >= max_tentativas_llm:
+                raise
+            espera = espera_backoff(tentativa, e)
+            print(f"Falha transitória na IA ({type(e).__name__}); nova tentativa em {espera:.1f} s")
+            time.sleep(espera)
+            continue
+        disjuntor.sucesso()
+        return valor, resultado, tentativa + 1
+
+async def acompletar(validar=None, medicao=None, **kwargs):
+    litellm = importar('litellm')
+    configurar_sessao_async()
+    tokens = await asyncio.to_thread(_tokens_estimados, kwargs)
+    transitorios = _erros_transitorios()
+    for tentativa in range(max_tentativas_llm):
+        if medicao is not None:
+            medicao.tentativas = tentativa + 1
+        disjuntor.permitir()
+        await asyncio.sleep(max(baldes_requisicoes.reservar(1), baldes_tokens.reservar(tokens)))
+        try:
+            resultado = await litellm.acompletion(**_parametros(kwargs))
+            if medicao is not None:
+                medicao.resultado = resultado
+            valor = validar(resultado) if validar else resultado
+        except transitorios as e:
+            if isinstance(e, RespostaInvalida):
+                disjuntor.sucesso()  # O serviço respondeu; só o conteúdo veio malformado
+            else:
+                disjuntor.falha()
+            if tentativa + 1 >= max_tentativas_llm:
+                raise
+            espera = espera_backoff(tentativa, e)
+            print(f"Falha transitória na IA ({type(e).__name__}); nova tentativa em {espera:.1f} s")
+            await asyncio.sleep(espera)
+            continue
+        disjuntor.sucesso()
+        return valor, resultado, tentativa + 1
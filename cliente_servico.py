@@ -0,0 +1,77 @@
+import os
+
+from utils import importar
+
+# Cliente do serviço de banco compartilhado (servico.py), usado pela janela no modo cliente:
+# com servidor_pj_docs=http://servidor:8470 no .env, procedimentos e documentos são lidos e
+# gravados pelo serviço, e não no arquivo do SQLite. A sessão HTTP mantém as conexões abertas.
+# token_servico no .env deve ser o mesmo do servidor.
+
+servidor_pj_docs = os.getenv('servidor_pj_docs')
+token_servico = os.getenv('token_servico')
+TIMEOUT = 15.0
+
+class ErroServico(Exception):
+    def __init__(self, mensagem, status=None):
+        super().__init__(mensagem)
+        self.status = status
+
+class ClienteServico:
+    def __init__(self, url=None, timeout=TIMEOUT, token=None):
+        self.url = (url or servidor_pj_docs or "").rstrip("/")
+        token = token or token_servico
+        httpx = importar('httpx')
+        self.sessao = httpx.Client(
+            base_url=self.url, timeout=timeout, headers={"Authorization": f"Bearer {token}"} if token else None
+        )
+
+    def _requisitar(self, metodo, caminho, **kwargs):
+        httpx = importar('httpx')
+        try:
+            resposta = self.sessao.request(metodo, caminho, **kwargs)
+        except httpx.HTTPError as e:
+            raise ErroServico(f"Serviço indisponível em {self.url}: {e}") from e
+        try:
+            dados = resposta.json()
+        except ValueError:
+            raise ErroServico(f"Resposta inválida do serviço ({resposta.status_code})", resposta.status_code)
+        if resposta.status_code != 200:
+            raise ErroServico(dados.get("erro", f"Erro {resposta.status_code}"), resposta.status_code)
+        return dados["resultado"]
+
+    def fechar(self):
+        self.sessao.close()
+
+    # --- Procedimentos ---
+
+    def procedimentos(self, prefixo="", limite=50):
+        return self._requisitar("GET", "/procedimentos", params={"prefixo": prefixo, "limite": limite})
+
+    def recentes(self, limite=20):
+        return self._requisitar("GET", "/procedimentos/recentes", params={"limite": limite})
+
+    def existe(self, numero):
+        return self._requisitar("GET", "/procedimentos/existe", params={"numero": numero})
+
+    def cadastrar_procedimento(self, numero, descricao):
+        return self._requisitar("POST", "/procedimentos", json={"numero": numero, "descricao": descricao})
+
+    # --- Documentos ---
+
+    # filtro: FiltroDocumentos ou None; ids restringe a página aos documentos informados
+    def pagina(self, filtro=None, apos_id=0, limite=200, ids=None):
+        return self._requisitar("POST", "/documentos/pagina", json={
+            "filtro": filtro.como_dict() if filtro else None, "apos_id": apos_id, "limite": limite, "ids": ids,
+        })
+
+    def buscar(self, termo, limite=200):
+        return self._requisitar("GET", "/documentos/busca", params={"termo": termo, "limite": limite})
+
+    def inserir_documento(self, titulo, resumo, procedimento=None, data_criacao=None, texto=None, duplicata_de=None):
+        return self._requisitar("POST", "/documentos", json={
+            "titulo": titulo, "resumo": resumo, "procedimento": procedimento, "data_criacao": data_criacao,
+            "texto": texto, "duplicata_de": duplicata_de,
+        })
+
+    def alterar_documento(self, documento_id, **campos):
+        return self._requisitar("PATCH", f"/documentos/{documento_id}", json=campos)
@@ -0,0 +1,115 @@
+from bisect import insort
+from collections import OrderedDict
+
+from PySide6.QtCore import Qt, QStringListModel
+from PySide6.QtSql import QSqlQuery
+from PySide6.QtWidgets import QCompleter
+
+# Sugestões de número de procedimento por prefixo, buscadas no banco à medida que se digita.
+# A consulta por intervalo (numero >= prefixo AND numero < prefixo + U+10FFFF) usa o índice
+# único de procedimentos.numero, de modo que o custo não depende do total cadastrado.
+# Os resultados dos prefixos mais recentes ficam em memória (LRU) e recebem os
+# procedimentos novos sem nova consulta.
+
+LIMITE_SUGESTOES = 50
+LIMITE_RECENTES = 20
+
+class CompletadorProcedimentos(QCompleter):
+    def __init__(self, db, max_prefixos=64, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.max_prefixos = max_prefixos
+        self._resultados = OrderedDict()  # prefixo -> números (ordem de uso, LRU)
+        self._prefixo = None
+        self.modelo = QStringListModel(self)
+        self.setModel(self.modelo)
+        self.setCaseSensitivity(Qt.CaseSensitive)
+        self.setCompletionMode(QCompleter.PopupCompletion)
+        self.setMaxVisibleItems(15)
+
+    # Retorna None se a consulta falhar, para que a falha não seja guardada como lista vazia
+    def _executar(self, sql, parametros):
+        query = QSqlQuery(self.db)
+        query.prepare(sql)
+        for valor in parametros:
+            query.addBindValue(valor)
+        if not query.exec():
+            print(f"Erro na consulta de procedimentos: {query.lastError().text()}")
+            return None
+        numeros = []
+        while query.next():
+            numeros.append(query.value(0))
+        return numeros
+
+    def buscar(self, prefixo):
+        numeros = self._resultados.get(prefixo)
+        if numeros is not None:
+            self._resultados.move_to_end(prefixo)
+            return numeros
+        numeros = self._consultar(prefixo)
+        if numeros is None:
+            return []  # Falha na consulta: não guarda o resultado vazio
+        self._resultados[prefixo] = numeros
+        while len(self._resultados) > self.max_prefixos:
+            self._resultados.popitem(last=False)
+        return numeros
+
+    def _consultar(self, prefixo):
+        if prefixo:
+            return self._executar(
+                "SELECT numero FROM procedimentos WHERE numero >= ? AND numero < ? ORDER BY numero LIMIT ?",
+                (prefixo, prefixo + "\U0010ffff", LIMITE_SUGESTOES)
+            )
+        return self._executar("SELECT numero FROM procedimentos ORDER BY numero LIMIT ?", (LIMITE_SUGESTOES,))
+
+    def existe(self, numero):
+        return bool(numero) and bool(self._executar("SELECT numero FROM procedimentos WHERE numero = ?", (numero,)))
+
+    # Procedimentos cadastrados por último, para a lista suspensa dos combos
+    def recentes(self, limite=LIMITE_RECENTES):
+        return self._executar("SELECT numero FROM procedimentos ORDER BY id DESC LIMIT ?", (limite,)) or []
+
+    # Chamado a cada tecla: troca as sugestões pelas do prefixo digitado
+    def atualizar_prefixo(self, texto):
+        if texto == self._prefixo:
+            return
+        self._prefixo = texto
+        self.modelo.setStringList(self.buscar(texto))
+        self.setCompletionPrefix(texto)
+
+    # Após uma importação em massa, os resultados guardados deixam de valer
+    def descartar_resultados(self):
+        self._resultados.clear()
+        self._prefixo = None
+
+    # Inclui um procedimento recém-cadastrado nos resultados guardados, sem consultar o banco
+    def adicionar(self, numero):
+        for prefixo, numeros in self._resultados.items():
+            if numero.startswith(prefixo) and numero not in numeros:
+                insort(numeros, numero)
+                del numeros[LIMITE_SUGESTOES:]
+        if self._prefixo is not None and numero.startswith(self._prefixo):
+            self.modelo.setStringList(self._resultados.get(self._prefixo, []))
+
+# Modo cliente: a mesma consulta por prefixo, feita pelo serviço de banco compartilhado
+class CompletadorProcedimentosRemoto(CompletadorProcedimentos):
+    def __init__(self, cliente, max_prefixos=64, parent=None):
+        super().__init__(None, max_prefixos, parent)
+        self.cliente = cliente
+
+    def _remoto(self, funcao, *argumentos, padrao=None):
+        from cliente_servico import ErroServico
+        try:
+            return funcao(*argumentos)
+        except ErroServico as e:
+            print(f"Erro na consulta de procedimentos: {e}")
+            return padrao
+
+    def _consultar(self, prefixo):
+        return self._remoto(self.cliente.procedimentos, prefixo, LIMITE_SUGESTOES)
+
+    def existe(self, numero):
+        return bool(numero) and bool(self._remoto(self.cliente.existe, numero, padrao=False))
+
+    def recentes(self, limite=LIMITE_RECENTES):
+        return self._remoto(self.cliente.recentes, limite, padrao=[])
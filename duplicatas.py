@@ -0,0 +1,117 @@
+import os
+import re
+import hashlib
+from functools import lru_cache
+
+from utils import conectar, importar
+
+# Detecção de documentos quase idênticos (mesma petição com outro carimbo, outro cabeçalho...)
+# por assinaturas MinHash e LSH em faixas: documentos parecidos caem no mesmo "balde" em ao
+# menos uma faixa, e só esses candidatos são comparados, sem varrer a tabela inteira.
+
+NUM_PERMUTACOES = 128
+LINHAS_POR_FAIXA = 4                      # 32 faixas de 4 valores
+TAMANHO_SHINGLE = 5                       # Sequências de 5 palavras
+limiar_duplicata = float(os.getenv('limiar_duplicata', '0.85'))
+
+_PRIMO = (1 << 61) - 1
+_PALAVRAS = re.compile(r'\w+')
+
+# Coeficientes das permutações (a * h + b) mod p; semente fixa para que as assinaturas
+# gravadas continuem comparáveis entre execuções
+@lru_cache(maxsize=1)
+def _permutacoes():
+    np = importar('numpy')
+    aleatorio = np.random.default_rng(20250101)
+    a = aleatorio.integers(1, 1 << 32, NUM_PERMUTACOES, dtype=np.uint64)
+    b = aleatorio.integers(0, 1 << 32, NUM_PERMUTACOES, dtype=np.uint64)
+    return a, b
+
+def _hashes_shingles(texto):
+    np = importar('numpy')
+    palavras = _PALAVRAS.findall(texto.lower())
+    if len(palavras) < TAMANHO_SHINGLE:
+        palavras = palavras + [''] * (TAMANHO_SHINGLE - len(palavras))
+    shingles = {' '.join(palavras[i:i + TAMANHO_SHINGLE]) for i in range(len(palavras) - TAMANHO_SHINGLE + 1)}
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little') for s in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+
+def assinatura_minhash(texto):
+    np = importar('numpy')
+    a, b = _permutacoes()
+    hashes = _hashes_shingles(texto)
+    minimos = np.full(NUM_PERMUTACOES, _PRIMO, dtype=np.uint64)
+    # Em blocos, para limitar a matriz permutações x shingles em documentos extensos;
+    # h e a têm 32 bits, então o produto cabe em 64 bits sem estouro
+    for inicio in range(0, len(hashes), 4096):
+        bloco = hashes[inicio:inicio + 4096]
+        valores = (np.outer(a, bloco) + b[:, None]) % np.uint64(_PRIMO)
+        np.minimum(minimos, valores.min(axis=1), out=minimos)
+    return (minimos & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+def baldes_lsh(assinatura):
+    faixas = assinatura.reshape(-1, LINHAS_POR_FAIXA)
+    return [
+        (faixa, int.from_bytes(hashlib.blake2b(valores.tobytes(), digest_size=7).digest(), 'little'))
+        for faixa, valores in enumerate(faixas)
+    ]
+
+def similaridade(assinatura_a, assinatura_b):
+    return float((assinatura_a == assinatura_b).mean())
+
+# Com uma conexão informada, a gravação entra na transação de quem chamou
+def registrar_assinatura(documento_id, assinatura, conn=None):
+    conexao = conn or conectar()
+    try:
+        conexao.execute(
+            "INSERT OR REPLACE INTO assinaturas_documentos (documento_id, assinatura) VALUES (?, ?)",
+            (documento_id, assinatura.tobytes())
+        )
+        conexao.executemany(
+            "INSERT OR IGNORE INTO faixas_lsh (faixa, balde, documento_id) VALUES (?, ?, ?)",
+            [(faixa, balde, documento_id) for faixa, balde in baldes_lsh(assinatura)]
+        )
+        if conn is None:
+            conexao.commit()
+    finally:
+        if conn is None:
+            conexao.close()
+
+# Uma busca por faixa (faixa = ? AND balde = ?) pela chave primária de faixas_lsh; o
+# IN (VALUES ...) com pares de valores não usa o índice e varre a tabela inteira
+def consulta_candidatos(baldes):
+    faixas = "\n                UNION ALL ".join(
+        "SELECT documento_id FROM faixas_lsh WHERE faixa = ? AND balde = ?" for _ in baldes
+    )
+    sql = f"""
+            SELECT a.documento_id, a.assinatura, d.titulo, d.resumo, d.procedimento
+            FROM assinaturas_documentos a JOIN documentos d ON d.id = a.documento_id
+            WHERE a.documento_id IN (
+                {faixas}
+            )
+        """
+    return sql, [valor for balde in baldes for valor in balde]
+
+# Retorna o documento já cadastrado mais parecido (acima do limiar) ou None
+def buscar_quase_duplicata(assinatura, limiar=None, conn=None):
+    limiar = limiar_duplicata if limiar is None else limiar
+    sql, parametros = consulta_candidatos(baldes_lsh(assinatura))
+    conexao = conn or conectar()
+    try:
+        candidatos = conexao.execute(sql, parametros).fetchall()
+    finally:
+        if conn is None:
+            conexao.close()
+
+    np = importar('numpy')
+    melhor = None
+    for documento_id, bruto, titulo, resumo, procedimento in candidatos:
+        valor = similaridade(assinatura, np.frombuffer(bruto, dtype=np.uint32))
+        if valor >= limiar and (melhor is None or valor > melhor['similaridade']):
+            melhor = {
+                'id': documento_id, 'similaridade': valor,
+                'titulo': titulo, 'resumo': resumo, 'procedimento': procedimento,
+            }
+    return melhor
@@ -0,0 +1,330 @@
+import os
+import csv
+import json
+import html
+import zlib
+import hashlib
+from collections import deque
+from itertools import groupby
+from concurrent.futures import ProcessPoolExecutor
+
+import utils
+from metricas import perfilar
+from utils import (conectar, importar, formatar_data, adicionar_procedimento_docx,
+                   adicionar_documento_docx, finalizar_procedimento_docx)
+
+# Lê os documentos diretamente do banco, já ordenados para o agrupamento por procedimento
+def iterar_registros(clausula="", parametros=(), caminho_banco=None, tamanho_lote=500):
+    conn = conectar(caminho_banco)
+    try:
+        cursor = conn.execute(f"""
+            SELECT procedimento, data_criacao, titulo, resumo FROM documentos
+            {'WHERE ' + clausula if clausula else ''}
+            ORDER BY procedimento, data_criacao, id
+        """, list(parametros))
+        while True:
+            linhas = cursor.fetchmany(tamanho_lote)
+            if not linhas:
+                break
+            for procedimento, data, titulo, resumo in linhas:
+                yield {"procedimento": procedimento, "data": data, "titulo": titulo, "resumo": resumo}
+    finally:
+        conn.close()
+
+# --- Escritores incrementais: recebem um procedimento e seus documentos por vez ---
+
+class EscritorRelatorio:
+    extensao = ""
+
+    def __init__(self, caminho, caminho_banco=None):
+        self.caminho = caminho
+        self.caminho_banco = caminho_banco
+
+    def iniciar_procedimento(self, procedimento):
+        pass
+
+    def escrever_documento(self, item):
+        pass
+
+    def finalizar_procedimento(self):
+        pass
+
+    def fechar(self):
+        pass
+
+    # Libera os recursos sem concluir o arquivo (exportação interrompida por erro)
+    def descartar(self):
+        pass
+
+# --- DOCX em seções reaproveitadas ---
+# Montar parágrafos pelo python-docx é a parte cara do relatório. Cada procedimento vira
+# uma seção, identificada pelo hash das suas linhas e guardada já montada (o XML do corpo,
+# comprimido) na tabela fragmentos_relatorio: na exportação seguinte, só as seções de
+# procedimentos alterados são montadas de novo, em processos paralelos, e o documento final
+# é a concatenação das seções. As seções a montar seguem para os processos em grupos, durante
+# a leitura, e cada grupo montado é gravado ao terminar: a memória usada não cresce com o
+# tamanho do relatório, e a montagem acompanha a leitura do banco.
+
+VERSAO_SECOES = 1         # Alterar junto com o layout das seções (descarta as guardadas)
+MIN_SECOES_PROCESSOS = 32  # Abaixo disto, as seções são montadas no próprio processo
+SECOES_POR_TAREFA = 64
+SECOES_POR_CONSULTA = 500
+SECOES_POR_MONTAGEM = 256  # Seções ausentes do cache acumuladas antes de seguirem para montagem
+MAX_DOCUMENTOS_RETIDOS = 20000  # Documentos retidos à espera da consulta ou da montagem
+DIAS_SECOES = 30          # Seções não usadas há mais tempo são descartadas
+
+def chave_secao(procedimento, documentos):
+    resumo = hashlib.sha256(f"v{VERSAO_SECOES}".encode())
+    resumo.update(json.dumps(procedimento, ensure_ascii=False).encode('utf-8'))
+    for item in documentos:
+        resumo.update(b'\0')
+        resumo.update(json.dumps([item["data"], item["titulo"], item["resumo"]], ensure_ascii=False).encode('utf-8'))
+    return resumo.hexdigest()
+
+# Monta cada seção em um documento vazio e retorna o XML do corpo (sem o <w:sectPr>).
+# Executada nos processos auxiliares; recebe [(procedimento, documentos)].
+def montar_secoes(secoes):
+    etree = importar('lxml.etree')
+    doc = importar('docx').Document()
+    corpo = doc.element.body
+    fim = corpo[-1]  # <w:sectPr>, único filho do corpo no modelo padrão
+    fragmentos = []
+    for procedimento, documentos in secoes:
+        adicionar_procedimento_docx(doc, procedimento)
+        for item in documentos:
+            adicionar_documento_docx(doc, item)
+        finalizar_procedimento_docx(doc)
+        corpo.remove(fim)
+        fragmentos.append(zlib.compress(etree.tostring(corpo), 1))
+        for elemento in list(corpo):
+            corpo.remove(elemento)
+        corpo.append(fim)
+    return fragmentos
+
+class EscritorDocx(EscritorRelatorio):
+    extensao = "docx"
+
+    def __init__(self, caminho, caminho_banco=None, max_processos=None):
+        super().__init__(caminho, caminho_banco)
+        self.max_processos = max_processos
+        self.conn = conectar(caminho_banco)
+        self.chaves = []        # Ordem das seções no relatório
+        self.pendentes = {}     # chave -> (procedimento, documentos), ainda não conferidas no cache
+        self.montar = {}        # chave -> (procedimento, documentos), ausentes do cache
+        self.reaproveitadas = 0
+        self._retidos = 0       # Documentos em pendentes e montar
+        self._executor = None
+        self._tarefas = deque()  # (chaves, futuro) em montagem nos processos
+        self._procedimento = None
+        self._documentos = []
+
+    def iniciar_procedimento(self, procedimento):
+        self._procedimento, self._documentos = procedimento, []
+
+    def escrever_documento(self, item):
+        self._documentos.append(item)
+
+    def finalizar_procedimento(self):
+        chave = chave_secao(self._procedimento, self._documentos)
+        self.chaves.append(chave)
+        self.pendentes[chave] = (self._procedimento, self._documentos)
+        self._retidos += len(self._documentos)
+        if len(self.pendentes) >= SECOES_POR_CONSULTA or self._retidos >= MAX_DOCUMENTOS_RETIDOS:
+            self._conferir_cache()
+            if len(self.montar) >= SECOES_POR_MONTAGEM or self._retidos >= MAX_DOCUMENTOS_RETIDOS:
+                self._montar_alteradas()
+
+    # Os documentos das seções já guardadas são liberados logo, sem esperar o fim da leitura
+    def _conferir_cache(self):
+        chaves = list(self.pendentes)
+        marcadores = ", ".join("?" for _ in chaves)
+        with self.conn:
+            # Marcar o uso também protege as seções do descarte por idade até o fim da exportação
+            encontradas = {linha[0] for linha in self.conn.execute(
+                f"UPDATE fragmentos_relatorio SET usado_em = CURRENT_TIMESTAMP WHERE chave IN ({marcadores}) RETURNING chave",
+                chaves
+            )}
+        for chave in chaves:
+            secao = self.pendentes.pop(chave)
+            if chave in encontradas:
+                self.reaproveitadas += 1
+                self._retidos -= len(secao[1])
+            else:
+                self.montar[chave] = secao
+
+    def _gravar_secoes(self, chaves, fragmentos):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO fragmentos_relatorio (chave, conteudo) VALUES (?, ?)", zip(chaves, fragmentos)
+            )
+
+    # Envia as seções ausentes aos processos, em tarefas de SECOES_POR_TAREFA; com mais tarefas
+    # em andamento do que o dobro de processos, aguarda as mais antigas (e grava o resultado)
+    # antes de enviar outras. Ao concluir, aguarda todas; poucas seções no fim de uma
+    # exportação pequena são montadas no próprio processo.
+    def _montar_alteradas(self, concluir=False):
+        secoes = list(self.montar.items())
+        self.montar.clear()
+        self._retidos = 0
+        if self._executor is None and concluir and len(secoes) < MIN_SECOES_PROCESSOS:
+            if secoes:
+                self._gravar_secoes([chave for chave, _ in secoes], montar_secoes([secao for _, secao in secoes]))
+            return
+        if self._executor is None and secoes:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_processos)
+        max_tarefas = 2 * (self.max_processos or os.cpu_count() or 1)
+        for inicio in range(0, len(secoes), SECOES_POR_TAREFA):
+            parte = secoes[inicio:inicio + SECOES_POR_TAREFA]
+            futuro = self._executor.submit(montar_secoes, [secao for _, secao in parte])
+            self._tarefas.append(([chave for chave, _ in parte], futuro))
+            while len(self._tarefas) > max_tarefas:
+                self._gravar_secoes(self._tarefas[0][0], self._tarefas.popleft()[1].result())
+        if concluir:
+            while self._tarefas:
+                self._gravar_secoes(self._tarefas[0][0], self._tarefas.popleft()[1].result())
+            self._encerrar_processos()
+
+    def _encerrar_processos(self):
+        self._tarefas.clear()
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def fechar(self):
+        etree = importar('lxml.etree')
+        parser = importar('docx.oxml.parser').oxml_parser
+        try:
+            if self.pendentes:
+                self._conferir_cache()
+            self._montar_alteradas(concluir=True)
+
+            doc = importar('docx').Document()
+            doc.add_heading('PJ Docs', 0)
+            fim = doc.element.body[-1]
+            for inicio in range(0, len(self.chaves), SECOES_POR_CONSULTA):
+                bloco = self.chaves[inicio:inicio + SECOES_POR_CONSULTA]
+                guardadas = dict(self.conn.execute(
+                    f"SELECT chave, conteudo FROM fragmentos_relatorio WHERE chave IN ({', '.join('?' for _ in bloco)})",
+                    bloco
+                ))
+                for chave in bloco:
+                    corpo = etree.fromstring(zlib.decompress(guardadas[chave]), parser)
+                    for elemento in list(corpo):
+                        fim.addprevious(elemento)
+            doc.save(self.caminho)
+
+            with self.conn:
+                self.conn.execute(
+                    "DELETE FROM fragmentos_relatorio WHERE usado_em < datetime('now', ?)", (f"-{DIAS_SECOES} days",)
+                )
+        finally:
+            self._encerrar_processos()
+            self.conn.close()
+
+    def descartar(self):
+        self._encerrar_processos()
+        self.conn.close()
+
+class EscritorCsv(EscritorRelatorio):
+    extensao = "csv"
+
+    def __init__(self, caminho, caminho_banco=None):
+        super().__init__(caminho, caminho_banco)
+        # utf-8-sig e ';' para abrir corretamente no Excel em português
+        self.arquivo = open(caminho, 'w', encoding='utf-8-sig', newline='')
+        self.escritor = csv.writer(self.arquivo, delimiter=';')
+        self.escritor.writerow(["procedimento", "data", "titulo", "resumo"])
+
+    def escrever_documento(self, item):
+        self.escritor.writerow([item["procedimento"], formatar_data(item["data"]), item["titulo"], item["resumo"]])
+
+    def fechar(self):
+        self.arquivo.close()
+
+    def descartar(self):
+        self.arquivo.close()
+
+class EscritorJsonl(EscritorRelatorio):
+    extensao = "jsonl"
+
+    def __init__(self, caminho, caminho_banco=None):
+        super().__init__(caminho, caminho_banco)
+        self.arquivo = open(caminho, 'w', encoding='utf-8')
+
+    def escrever_documento(self, item):
+        self.arquivo.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+    def fechar(self):
+        self.arquivo.close()
+
+    def descartar(self):
+        self.arquivo.close()
+
+class EscritorHtml(EscritorRelatorio):
+    extensao = "html"
+
+    def __init__(self, caminho, caminho_banco=None):
+        super().__init__(caminho, caminho_banco)
+        self.arquivo = open(caminho, 'w', encoding='utf-8')
+        self.arquivo.write(
+            "<!DOCTYPE html>\n<html lang=\"pt-BR\">\n<head><meta charset=\"utf-8\"><title>PJ Docs</title></head>\n"
+            "<body>\n<h1>PJ Docs</h1>\n"
+        )
+
+    def iniciar_procedimento(self, procedimento):
+        self.arquivo.write(f"<section>\n<h2>Autos/expediente: {html.escape(str(procedimento))}</h2>\n")
+
+    def escrever_documento(self, item):
+        resumo = html.escape(item["resumo"] or "").replace("\n", "<br>\n")
+        self.arquivo.write(
+            "<article>\n"
+            f"<p><b>Data:</b> {html.escape(formatar_data(item['data']) or '')}</p>\n"
+            f"<p><b>Documento:</b> {html.escape(item['titulo'] or '')}</p>\n"
+            f"<p><b>Teor:</b> {resumo}</p>\n"
+            "</article>\n"
+        )
+
+    def finalizar_procedimento(self):
+        self.arquivo.write("</section>\n<hr>\n")
+
+    def fechar(self):
+        self.arquivo.write("</body>\n</html>\n")
+        self.arquivo.close()
+
+    def descartar(self):
+        self.arquivo.close()
+
+FORMATOS = {escritor.extensao: escritor for escritor in (EscritorDocx, EscritorCsv, EscritorJsonl, EscritorHtml)}
+
+# Exporta os documentos que atendem ao filtro, agrupando por procedimento em uma única passagem.
+# Retorna o caminho do relatório, ou None se nenhum documento atende ao filtro; os erros são
+# repassados a quem chamou. O relatório é gravado em um arquivo temporário que só substitui
+# o anterior ao final, para que uma falha não deixe um arquivo pela metade.
+def exportar_relatorio_sql(clausula="", parametros=(), formato="docx", pasta=None, caminho_banco=None):
+    pasta = pasta or utils.pasta_relatorios
+    caminho = os.path.join(pasta, f"relatorio_pj_docs.{formato}")
+    temporario = f"{caminho}.parcial"
+    escritor = None
+    concluido = False
+    try:
+        with perfilar(f"exportacao_{formato}"):
+            registros = iterar_registros(clausula, parametros, caminho_banco)
+            for procedimento, documentos in groupby(registros, key=lambda item: item["procedimento"]):
+                if escritor is None:
+                    escritor = FORMATOS[formato](temporario, caminho_banco)
+                escritor.iniciar_procedimento(procedimento)
+                for item in documentos:
+                    escritor.escrever_documento(item)
+                escritor.finalizar_procedimento()
+
+            if escritor is None:
+                return None  # Nenhum registro para exportar
+            escritor.fechar()
+            concluido = True
+            os.replace(temporario, caminho)
+        return caminho
+    finally:
+        if escritor is not None and not concluido:
+            escritor.descartar()
+        if os.path.exists(temporario):
+            os.remove(temporario)
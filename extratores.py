@@ -0,0 +1,216 @@
+import os
+import re
+import zipfile
+import email
+import email.policy
+from html.parser import HTMLParser
+from xml.etree.ElementTree import iterparse
+
+from utils import importar, iterar_paginas_pdf
+
+# Registro de extratores por extensão. Cada extrator recebe o caminho do arquivo e gera
+# o texto em trechos (páginas, parágrafos, blocos), consumidos pelo NormalizadorTexto
+# de utils à medida que são lidos. Para aceitar um novo formato, basta registrar uma
+# função com @registrar_extrator('.ext').
+EXTRATORES = {}
+
+TAMANHO_TRECHO = 64 * 1024
+
+def registrar_extrator(*extensoes):
+    def decorador(funcao):
+        for extensao in extensoes:
+            EXTRATORES[extensao.lower()] = funcao
+        return funcao
+    return decorador
+
+def obter_extrator(caminho_arquivo):
+    return EXTRATORES.get(os.path.splitext(caminho_arquivo)[1].lower())
+
+def extensoes_suportadas():
+    return tuple(sorted(EXTRATORES))
+
+# Filtro para os diálogos de seleção de arquivo, ex.: "Documentos (*.docx *.pdf ...)"
+def filtro_dialogo():
+    return f"Documentos ({' '.join('*' + extensao for extensao in extensoes_suportadas())})"
+
+# --- Formatos originais ---
+
+@registrar_extrator('.pdf')
+def extrair_pdf(caminho):
+    for pagina in iterar_paginas_pdf(caminho):
+        yield pagina + '\n'
+
+@registrar_extrator('.docx')
+def extrair_docx(caminho):
+    for paragrafo in importar('docx').Document(caminho).paragraphs:
+        yield paragrafo.text + '\n'
+
+@registrar_extrator('.txt')
+def extrair_txt(caminho):
+    with open(caminho, 'r', encoding='utf-8') as arquivo:
+        while trecho := arquivo.read(TAMANHO_TRECHO):
+            yield trecho
+
+# --- OpenDocument (.odt): parágrafos e títulos de content.xml, lidos incrementalmente ---
+
+_NS_TEXTO = '{urn:oasis:names:tc:opendocument:xmlns:text:1.0}'
+
+@registrar_extrator('.odt')
+def extrair_odt(caminho):
+    with zipfile.ZipFile(caminho) as pacote, pacote.open('content.xml') as conteudo:
+        for _, elemento in iterparse(conteudo, events=('end',)):
+            if elemento.tag in (f'{_NS_TEXTO}p', f'{_NS_TEXTO}h'):
+                yield ''.join(elemento.itertext()) + '\n'
+                elemento.clear()
+
+# --- HTML: texto visível, com quebra de linha nos elementos de bloco ---
+
+class _ExtratorHtml(HTMLParser):
+    BLOCOS = {'p', 'div', 'br', 'li', 'tr', 'td', 'th', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+              'section', 'article', 'header', 'footer', 'blockquote', 'pre', 'title'}
+    IGNORADOS = {'script', 'style', 'head'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.partes = []
+        self._ignorando = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.IGNORADOS:
+            self._ignorando += 1
+        elif tag in self.BLOCOS:
+            self.partes.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.IGNORADOS:
+            self._ignorando = max(0, self._ignorando - 1)
+        elif tag in self.BLOCOS:
+            self.partes.append('\n')
+
+    def handle_data(self, data):
+        if not self._ignorando:
+            self.partes.append(data)
+
+    def retirar(self):
+        trecho, self.partes = ''.join(self.partes), []
+        return trecho
+
+def html_em_trechos(trechos_html):
+    parser = _ExtratorHtml()
+    for trecho in trechos_html:
+        parser.feed(trecho)
+        yield parser.retirar()
+    parser.close()
+    yield parser.retirar()
+
+@registrar_extrator('.html', '.htm')
+def extrair_html(caminho):
+    with open(caminho, 'r', encoding='utf-8', errors='replace') as arquivo:
+        yield from html_em_trechos(iter(lambda: arquivo.read(TAMANHO_TRECHO), ''))
+
+# --- E-mail (.eml): cabeçalhos principais e corpo (texto simples ou, na falta, HTML) ---
+# Exceção à leitura em trechos: a estrutura MIME só é conhecida com a mensagem inteira
+# montada (anexos incluídos), então o tamanho do arquivo é limitado.
+
+MAX_BYTES_EML = 64 * 1024 * 1024
+
+@registrar_extrator('.eml')
+def extrair_eml(caminho):
+    tamanho = os.path.getsize(caminho)
+    if tamanho > MAX_BYTES_EML:
+        raise ValueError(f"E-mail com {tamanho // (1024 * 1024)} MB excede o limite de {MAX_BYTES_EML // (1024 * 1024)} MB")
+    with open(caminho, 'rb') as arquivo:
+        mensagem = email.message_from_binary_file(arquivo, policy=email.policy.default)
+
+    for rotulo, cabecalho in (('Assunto', 'subject'), ('De', 'from'), ('Para', 'to'), ('Data', 'date')):
+        if mensagem[cabecalho]:
+            yield f"{rotulo}: {mensagem[cabecalho]}\n"
+
+    corpo = mensagem.get_body(preferencelist=('plain', 'html'))
+    if corpo is None:
+        return
+    conteudo = corpo.get_content()
+    if corpo.get_content_subtype() == 'html':
+        yield from html_em_trechos([conteudo])
+    else:
+        yield conteudo
+
+# --- RTF: remove palavras de controle e grupos de destino (tabelas de fontes, cores, imagens) ---
+
+_TOKEN_RTF = re.compile(r"\\([a-z]{1,32})(-?\d{1,10})? ?|\\'([0-9a-f]{2})|\\([^a-z])|([{}])|[\r\n]+|(.)", re.I)
+_DESTINOS_RTF = {
+    'fonttbl', 'colortbl', 'stylesheet', 'info', 'pict', 'header', 'footer', 'headerl', 'headerr',
+    'footerl', 'footerr', 'listtable', 'listoverridetable', 'rsidtbl', 'generator', 'xmlnstbl',
+    'themedata', 'colorschememapping', 'latentstyles', 'datastore', 'object', 'fldinst',
+}
+_ESPECIAIS_RTF = {'par': '\n', 'line': '\n', 'sect': '\n', 'page': '\n', 'row': '\n',
+                  'tab': '\t', 'cell': '\t', 'emdash': '\u2014', 'endash': '\u2013',
+                  'lquote': '\u2018', 'rquote': '\u2019', 'ldblquote': '\u201c', 'rdblquote': '\u201d',
+                  'bullet': '\u2022'}
+MARGEM_RTF = 64  # Maior que o token mais longo (\ + 32 letras + argumento de 11 + espaço)
+
+# Tokens lidos em trechos: os que terminam perto do fim do trecho aguardam o seguinte,
+# pois poderiam continuar nele
+def _tokens_rtf(arquivo):
+    resto = ''
+    while True:
+        trecho = arquivo.read(TAMANHO_TRECHO)
+        conteudo = resto + trecho
+        limite = len(conteudo) - MARGEM_RTF if trecho else len(conteudo)
+        posicao = 0
+        for correspondencia in _TOKEN_RTF.finditer(conteudo):
+            if correspondencia.end() > limite:
+                break
+            posicao = correspondencia.end()
+            yield correspondencia.groups()
+        resto = conteudo[posicao:]
+        if not trecho:
+            return
+
+@registrar_extrator('.rtf')
+def extrair_rtf(caminho):
+    with open(caminho, 'r', encoding='latin-1') as arquivo:
+        yield from _texto_rtf(_tokens_rtf(arquivo))
+
+def _texto_rtf(tokens):
+    pilha = []
+    ignorar = False
+    pular = 0  # Caracteres alternativos que seguem um \uN (por padrão, um)
+    saida = []
+    for palavra, argumento, hexa, simbolo, chave, caractere in tokens:
+        if (hexa or caractere) and pular:
+            pular -= 1
+            continue
+        if chave == '{':
+            pilha.append(ignorar)
+        elif chave == '}':
+            ignorar = pilha.pop() if pilha else False
+        elif simbolo:
+            if simbolo == '*':
+                ignorar = True
+            elif not ignorar and simbolo in '{}\\':
+                saida.append(simbolo)
+            elif not ignorar and simbolo == '~':
+                saida.append('\u00a0')
+        elif palavra:
+            if palavra in _DESTINOS_RTF:
+                ignorar = True
+            elif not ignorar:
+                if palavra in _ESPECIAIS_RTF:
+                    saida.append(_ESPECIAIS_RTF[palavra])
+                elif palavra == 'u' and argumento:
+                    codigo = int(argumento)
+                    saida.append(chr(codigo + 65536 if codigo < 0 else codigo))
+                    pular = 1
+        elif hexa:
+            if not ignorar:
+                saida.append(bytes.fromhex(hexa).decode('cp1252', errors='replace'))
+        elif caractere and not ignorar:
+            saida.append(caractere)
+
+        # Entrega o texto a cada parágrafo, sem acumular o documento inteiro
+        if saida and saida[-1] == '\n':
+            yield ''.join(saida)
+            saida = []
+    if saida:
+        yield ''.join(saida)
@@ -0,0 +1,88 @@
+from datetime import date, timedelta
+
+from utils import montar_consulta_fts
+
+# Filtro dos registros de documentos, montado apenas com parâmetros vinculados (?)
+# Todos os critérios são opcionais e combinados com AND.
+class FiltroDocumentos:
+    def __init__(self, procedimentos=None, data_inicio=None, data_fim=None, texto_titulo=""):
+        self.procedimentos = list(procedimentos or [])
+        self.data_inicio = data_inicio   # datetime.date ou None
+        self.data_fim = data_fim         # datetime.date ou None (inclusiva)
+        self.texto_titulo = texto_titulo or ""
+
+    # Forma serializável (JSON), usada no modo cliente: o servidor monta a consulta a partir
+    # dos critérios, sem receber SQL
+    def como_dict(self):
+        return {
+            "procedimentos": self.procedimentos,
+            "data_inicio": self.data_inicio.isoformat() if self.data_inicio else None,
+            "data_fim": self.data_fim.isoformat() if self.data_fim else None,
+            "texto_titulo": self.texto_titulo,
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        dados = dados or {}
+        return cls(
+            procedimentos=[str(numero) for numero in dados.get("procedimentos") or []],
+            data_inicio=date.fromisoformat(dados["data_inicio"]) if dados.get("data_inicio") else None,
+            data_fim=date.fromisoformat(dados["data_fim"]) if dados.get("data_fim") else None,
+            texto_titulo=str(dados.get("texto_titulo") or "")
+        )
+
+    def vazio(self):
+        return not self.montar()[0]
+
+    def montar(self):
+        condicoes = []
+        parametros = []
+
+        if self.procedimentos:
+            marcadores = ", ".join("?" for _ in self.procedimentos)
+            condicoes.append(f"procedimento IN ({marcadores})")
+            parametros.extend(self.procedimentos)
+
+        # Comparação por texto ISO (AAAA-MM-DD), compatível com o índice em data_criacao
+        if self.data_inicio:
+            condicoes.append("data_criacao >= ?")
+            parametros.append(self.data_inicio.isoformat())
+        if self.data_fim:
+            condicoes.append("data_criacao < ?")
+            parametros.append((self.data_fim + timedelta(days=1)).isoformat())
+
+        # O texto do título é procurado no índice FTS5, restrito à coluna 'titulo'
+        consulta = montar_consulta_fts(self.texto_titulo)
+        if consulta:
+            condicoes.append("id IN (SELECT rowid FROM documentos_fts WHERE documentos_fts MATCH ?)")
+            parametros.append(f"titulo : ({consulta})")
+
+        return " AND ".join(condicoes), parametros
+
+# Plano de execução de uma consulta filtrada (usado para conferir o uso dos índices)
+def plano_de_consulta(conn, filtro, ordem="ORDER BY procedimento, data_criacao"):
+    clausula, parametros = filtro.montar()
+    sql = f"SELECT id FROM documentos {'WHERE ' + clausula if clausula else ''} {ordem}"
+    return [linha[3] for linha in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parametros)]
+
+# Só vale a busca pelo índice (SEARCH): uma varredura da tabela documentos, mesmo que
+# percorra um índice (SCAN ... USING COVERING INDEX), lê todas as linhas
+def usa_indice(conn, filtro):
+    detalhes = plano_de_consulta(conn, filtro)
+    varreduras = [detalhe for detalhe in detalhes if detalhe == "SCAN documentos" or detalhe.startswith("SCAN documentos ")]
+    return not varreduras and any(detalhe.startswith("SEARCH documentos ") for detalhe in detalhes)
+
+if __name__ == "__main__":
+    # Verificação rápida dos planos de consulta no banco local
+    from utils import conectar
+    conn = conectar()
+    exemplos = [
+        FiltroDocumentos(procedimentos=["0001"]),
+        FiltroDocumentos(procedimentos=["0001", "0002"], data_inicio=date(2025, 1, 1)),
+        FiltroDocumentos(data_inicio=date(2025, 1, 1), data_fim=date(2025, 12, 31)),
+    ]
+    for filtro in exemplos:
+        print(filtro.montar()[0], "->", "índice" if usa_indice(conn, filtro) else "varredura completa")
+        for detalhe in plano_de_consulta(conn, filtro):
+            print("   ", detalhe)
+    conn.close()
@@ -0,0 +1,251 @@
+import os
+import csv
+import json
+import codecs
+from datetime import datetime
+
+from utils import conectar
+
+# Importação em massa de procedimentos e documentos a partir de CSV (';' ou ',') ou JSONL,
+# no mesmo formato da exportação (procedimento, data, titulo, resumo). As linhas são
+# validadas, gravadas com executemany em transações de TAMANHO_BLOCO linhas e as rejeitadas
+# vão para um relatório ao lado do arquivo (<arquivo>.rejeitados.csv).
+#
+# Procedimentos: inseridos ou atualizados pelo número.
+# Documentos: a chave é (procedimento, data, titulo); um documento já existente tem o resumo
+# atualizado, e uma linha idêntica é ignorada, de modo que repetir a importação não duplica nada.
+
+TAMANHO_BLOCO = 5000
+LIMIAR_ADIAR_INDICES = 8 * 1024 * 1024  # Arquivos maiores que isto adiam índices e o gatilho do FTS
+FORMATOS_DATA = ("%Y-%m-%d", "%d/%m/%Y", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S")
+
+# Nomes alternativos aceitos nos cabeçalhos
+SINONIMOS = {"data_criacao": "data", "assunto": "titulo", "número": "numero", "descrição": "descricao"}
+
+# Índices secundários e gatilho refeitos ao final de uma carga grande (a definição é lida
+# do próprio banco, em sqlite_master, e reaplicada sem alterações)
+OBJETOS_ADIADOS = ("idx_documentos_data", "idx_documentos_hash_texto", "documentos_fts_insercao")
+
+# --- Leitura ---
+
+# CSV salvo pelo Excel no Windows costuma vir em cp1252. O arquivo é conferido inteiro, em
+# blocos, antes da leitura: um erro de decodificação no meio dele interromperia a importação
+# com parte das linhas já gravada.
+def detectar_codificacao(caminho):
+    decodificador = codecs.getincrementaldecoder("utf-8")()
+    try:
+        with open(caminho, "rb") as arquivo:
+            while bloco := arquivo.read(1 << 20):
+                decodificador.decode(bloco)
+            decodificador.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return "cp1252"
+    return "utf-8-sig"
+
+def _normalizar_chaves(registro):
+    normalizado = {}
+    for chave, valor in registro.items():
+        chave = (chave or "").strip().lower()
+        normalizado[SINONIMOS.get(chave, chave)] = valor.strip() if isinstance(valor, str) else valor
+    return normalizado
+
+# Gera (número da linha, registro ou None, erro)
+def ler_linhas(caminho, codificacao=None):
+    if os.path.splitext(caminho)[1].lower() in (".jsonl", ".ndjson"):
+        with open(caminho, encoding="utf-8-sig") as arquivo:
+            for numero, linha in enumerate(arquivo, start=1):
+                if not linha.strip():
+                    continue
+                try:
+                    registro = json.loads(linha)
+                except ValueError as e:
+                    yield numero, None, f"JSON inválido: {e}"
+                    continue
+                if not isinstance(registro, dict):
+                    yield numero, None, "A linha não contém um objeto JSON"
+                    continue
+                yield numero, _normalizar_chaves(registro), None
+    else:
+        with open(caminho, encoding=codificacao or detectar_codificacao(caminho), newline="") as arquivo:
+            cabecalho = arquivo.readline()
+            arquivo.seek(0)
+            delimitador = ";" if cabecalho.count(";") >= cabecalho.count(",") else ","
+            leitor = csv.DictReader(arquivo, delimiter=delimitador)
+            try:
+                for registro in leitor:
+                    yield leitor.line_num, _normalizar_chaves(registro), None
+            except csv.Error as e:
+                # O leitor não se recupera de um CSV malformado (caractere nulo, campo enorme)
+                raise ValueError(f"CSV inválido na linha {leitor.line_num}: {e}") from e
+
+def detectar_tipo(caminho, codificacao=None):
+    for _, registro, _ in ler_linhas(caminho, codificacao):
+        if registro is not None:
+            return "procedimentos" if "numero" in registro else "documentos"
+    return "documentos"
+
+# --- Validação ---
+
+def normalizar_data(valor):
+    if not valor:
+        return datetime.now().strftime("%Y-%m-%d")
+    for formato in FORMATOS_DATA:
+        try:
+            return datetime.strptime(str(valor), formato).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    raise ValueError(f"data inválida: {valor}")
+
+def validar_procedimento(registro):
+    numero = str(registro.get("numero") or "").strip()
+    if not numero:
+        raise ValueError("número do procedimento ausente")
+    return numero, str(registro.get("descricao") or "").strip() or None
+
+def validar_documento(registro, procedimentos, criar_procedimentos=False):
+    titulo = str(registro.get("titulo") or "").strip()
+    if not titulo:
+        raise ValueError("título ausente")
+    procedimento = str(registro.get("procedimento") or "").strip() or None
+    if procedimento is not None and procedimento not in procedimentos:
+        if not criar_procedimentos:
+            raise ValueError(f"procedimento não cadastrado: {procedimento}")
+    resumo = str(registro.get("resumo") or "").strip() or None
+    return procedimento, normalizar_data(registro.get("data")), titulo, resumo
+
+# --- Gravação ---
+
+# Como nos documentos, um número já cadastrado só conta como atualizado se a descrição mudar
+def _gravar_procedimentos(conn, linhas):
+    inseridos = conn.executemany("INSERT OR IGNORE INTO procedimentos (numero, descricao) VALUES (?, ?)", linhas).rowcount
+    atualizados = conn.executemany(
+        "UPDATE procedimentos SET descricao = ? WHERE numero = ? AND descricao IS NOT ?",
+        [(descricao, numero, descricao) for numero, descricao in linhas if descricao is not None]
+    ).rowcount
+    return inseridos, atualizados
+
+# Os documentos passam por uma tabela temporária: um UPDATE ... FROM e um INSERT ... SELECT
+# tratam o bloco inteiro, usando o índice (procedimento, data_criacao) para achar os existentes
+def _gravar_documentos(conn, linhas, novos_procedimentos):
+    if novos_procedimentos:
+        conn.executemany("INSERT OR IGNORE INTO procedimentos (numero) VALUES (?)", [(numero,) for numero in novos_procedimentos])
+    conn.executemany("INSERT INTO temp.importacao (procedimento, data, titulo, resumo) VALUES (?, ?, ?, ?)", linhas)
+    atualizados = conn.execute("""
+        UPDATE documentos AS d SET resumo = i.resumo FROM temp.importacao AS i
+        WHERE d.procedimento IS i.procedimento AND d.data_criacao = i.data AND d.titulo = i.titulo
+          AND d.resumo IS NOT i.resumo
+    """).rowcount
+    inseridos = conn.execute("""
+        INSERT INTO documentos (titulo, resumo, procedimento, data_criacao)
+        SELECT i.titulo, i.resumo, i.procedimento, i.data FROM temp.importacao AS i
+        WHERE NOT EXISTS (
+            SELECT 1 FROM documentos AS d
+            WHERE d.procedimento IS i.procedimento AND d.data_criacao = i.data AND d.titulo = i.titulo
+        )
+    """).rowcount
+    conn.execute("DELETE FROM temp.importacao")
+    return inseridos, atualizados
+
+def _adiar_objetos(conn):
+    definicoes = conn.execute(
+        f"SELECT name, type, sql FROM sqlite_master WHERE name IN ({', '.join('?' for _ in OBJETOS_ADIADOS)})",
+        OBJETOS_ADIADOS
+    ).fetchall()
+    with conn:
+        for nome, tipo, _ in definicoes:
+            conn.execute(f"DROP {tipo.upper()} IF EXISTS {nome}")
+    return [sql for _, _, sql in definicoes]
+
+def _restaurar_objetos(conn, definicoes, primeiro_id):
+    with conn:
+        # Documentos incluídos sem o gatilho entram no índice de busca de uma só vez
+        conn.execute("""
+            INSERT INTO documentos_fts (rowid, titulo, resumo)
+            SELECT id, titulo, resumo FROM documentos WHERE id > ?
+        """, (primeiro_id,))
+        for sql in definicoes:
+            conn.execute(sql)
+    conn.execute("ANALYZE")
+
+# Importa o arquivo e retorna um resumo com as contagens e o caminho do relatório de rejeitadas
+def importar_arquivo(caminho, tipo=None, criar_procedimentos=False, caminho_banco=None,
+                     tamanho_bloco=TAMANHO_BLOCO, adiar_indices=None, ao_progredir=None):
+    codificacao = None if os.path.splitext(caminho)[1].lower() in (".jsonl", ".ndjson") else detectar_codificacao(caminho)
+    tipo = tipo or detectar_tipo(caminho, codificacao)
+    if adiar_indices is None:
+        adiar_indices = tipo == "documentos" and os.path.getsize(caminho) >= LIMIAR_ADIAR_INDICES
+
+    conn = conectar(caminho_banco)
+    resumo = {"tipo": tipo, "lidas": 0, "inseridos": 0, "atualizados": 0, "ignorados": 0, "rejeitados": 0, "relatorio": None}
+    rejeitadas = []
+    definicoes = []
+    try:
+        procedimentos = {linha[0] for linha in conn.execute("SELECT numero FROM procedimentos")}
+        if tipo == "documentos":
+            conn.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS importacao (procedimento TEXT, data TEXT, titulo TEXT, resumo TEXT)
+            """)
+        primeiro_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM documentos").fetchone()[0]
+        if adiar_indices:
+            definicoes = _adiar_objetos(conn)
+
+        bloco, chaves, novos = [], {}, set()
+
+        def gravar_bloco():
+            with conn:
+                if tipo == "procedimentos":
+                    inseridos, atualizados = _gravar_procedimentos(conn, bloco)
+                else:
+                    inseridos, atualizados = _gravar_documentos(conn, bloco, novos)
+            procedimentos.update(novos)
+            resumo["inseridos"] += inseridos
+            resumo["atualizados"] += atualizados
+            resumo["ignorados"] += len(bloco) - inseridos - atualizados
+            bloco.clear()
+            chaves.clear()
+            novos.clear()
+            if ao_progredir:
+                ao_progredir(resumo["lidas"])
+
+        for numero_linha, registro, erro in ler_linhas(caminho, codificacao):
+            resumo["lidas"] += 1
+            try:
+                if erro:
+                    raise ValueError(erro)
+                if tipo == "procedimentos":
+                    linha = validar_procedimento(registro)
+                    chave = linha[0]
+                else:
+                    linha = validar_documento(registro, procedimentos, criar_procedimentos)
+                    chave = linha[:3]
+                    if linha[0] is not None and linha[0] not in procedimentos:
+                        novos.add(linha[0])
+            except ValueError as e:
+                rejeitadas.append((numero_linha, str(e), json.dumps(registro, ensure_ascii=False) if registro else ""))
+                continue
+            # Linhas repetidas dentro do mesmo bloco: vale a última
+            if chave in chaves:
+                bloco[chaves[chave]] = linha
+                resumo["ignorados"] += 1
+                continue
+            chaves[chave] = len(bloco)
+            bloco.append(linha)
+            if len(bloco) >= tamanho_bloco:
+                gravar_bloco()
+        if bloco:
+            gravar_bloco()
+    finally:
+        try:
+            if definicoes:
+                _restaurar_objetos(conn, definicoes, primeiro_id)
+        finally:
+            conn.close()
+
+    resumo["rejeitados"] = len(rejeitadas)
+    if rejeitadas:
+        resumo["relatorio"] = caminho + ".rejeitados.csv"
+        with open(resumo["relatorio"], "w", encoding="utf-8-sig", newline="") as arquivo:
+            escritor = csv.writer(arquivo, delimiter=";")
+            escritor.writerow(["linha", "motivo", "conteudo"])
+            escritor.writerows(rejeitadas)
+    return resumo
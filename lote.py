@@ -0,0 +1,183 @@
+import os
+import asyncio
+from datetime import datetime
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+import utils
+from extratores import extensoes_suportadas
+from utils import conectar, obter_texto_medido, analisar_conteudo_async, chave_cache, buscar_no_cache, gravar_no_cache
+from duplicatas import assinatura_minhash, buscar_quase_duplicata, registrar_assinatura
+from textos import guardar_texto, carregar_textos
+
+ERRO_LEITURA = "Não foi possível ler o arquivo"  # Início das mensagens de falha na extração
+
+# Expande pastas e filtra apenas os arquivos com extensões suportadas (registro de extratores)
+def listar_arquivos(caminhos):
+    extensoes = extensoes_suportadas()
+    arquivos = []
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            for raiz, _, nomes in os.walk(caminho):
+                for nome in sorted(nomes):
+                    if os.path.splitext(nome)[1].lower() in extensoes:
+                        arquivos.append(os.path.join(raiz, nome))
+        elif os.path.splitext(caminho)[1].lower() in extensoes:
+            arquivos.append(caminho)
+    return arquivos
+
+# Executada em cada processo: um arquivo ilegível (PDF corrompido ou protegido, .doc
+# renomeado) vira uma falha do próprio arquivo, sem interromper o lote.
+# Retorna (texto, tempo de extração em ms, mensagem de erro ou None).
+def extrair_texto_medido(arquivo, paralelo=True):
+    try:
+        texto, tempo = obter_texto_medido(arquivo, paralelo)
+    except Exception as e:
+        return "", None, f"{ERRO_LEITURA} ({type(e).__name__}: {e})."
+    return texto, tempo, None if texto else f"{ERRO_LEITURA}."
+
+# Extração do texto em paralelo (a leitura de PDF consome CPU e não se beneficia de threads).
+# Retorna os textos, os tempos de extração (ms) e os erros de cada arquivo (None se lido).
+def extrair_textos(arquivos, max_processos=None):
+    if len(arquivos) <= 1:
+        medidos = [extrair_texto_medido(arquivo) for arquivo in arquivos]
+    else:
+        # Cada processo lê um arquivo inteiro; o paralelismo interno do PDF é desativado
+        with ProcessPoolExecutor(max_workers=max_processos) as executor:
+            medidos = list(executor.map(partial(extrair_texto_medido, paralelo=False), arquivos))
+    return [texto for texto, _, _ in medidos], [tempo for _, tempo, _ in medidos], [erro for _, _, erro in medidos]
+
+# Análise concorrente pela IA, limitada por um semáforo
+async def _analisar_textos(textos, concorrencia, ao_progredir=None, tempos_extracao=None):
+    semaforo = asyncio.Semaphore(max(1, concorrencia))
+    concluidos = 0
+
+    async def analisar(texto, extracao_ms):
+        nonlocal concluidos
+        if not texto:
+            resultado = ("Erro", f"{ERRO_LEITURA}.")
+        else:
+            chave = chave_cache(texto, utils.modelo, utils.prompt)
+            # As consultas ao cache (sqlite3, bloqueantes) rodam em threads, para não
+            # serializar as análises que o semáforo deixa correr juntas
+            resultado = await asyncio.to_thread(buscar_no_cache, chave)
+            if resultado is None:
+                async with semaforo:
+                    resultado = await analisar_conteudo_async(
+                        texto, utils.prompt, utils.modelo, utils.api_key, extracao_ms
+                    )
+                if resultado[0] != "Erro":
+                    await asyncio.to_thread(gravar_no_cache, chave, utils.modelo, *resultado)
+        concluidos += 1
+        if ao_progredir:
+            ao_progredir(concluidos, len(textos))
+        return resultado
+
+    tempos_extracao = tempos_extracao or [None] * len(textos)
+    return await asyncio.gather(*(analisar(texto, tempo) for texto, tempo in zip(textos, tempos_extracao)))
+
+def analisar_textos(textos, concorrencia=None, ao_progredir=None, tempos_extracao=None):
+    concorrencia = utils.concorrencia_llm if concorrencia is None else concorrencia
+    return asyncio.run(_analisar_textos(textos, concorrencia, ao_progredir, tempos_extracao))
+
+# Inserção de todos os registros do lote em uma única transação.
+# Cada registro é (titulo, resumo, procedimento, data_criacao[, duplicata_de]);
+# as assinaturas e os textos originais, quando informados, são gravados na mesma transação.
+def inserir_documentos(registros, caminho_banco=None, assinaturas=None, textos=None):
+    conn = conectar(caminho_banco)
+    ids = []
+    try:
+        with conn:
+            for indice, registro in enumerate(registros):
+                hash_texto = guardar_texto(textos[indice], conn) if textos else None
+                cursor = conn.execute("""
+                    INSERT INTO documentos (titulo, resumo, procedimento, data_criacao, duplicata_de, hash_texto)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (tuple(registro) + (None,))[:5] + (hash_texto,))
+                ids.append(cursor.lastrowid)
+                if assinaturas and assinaturas[indice] is not None:
+                    registrar_assinatura(cursor.lastrowid, assinaturas[indice], conn)
+    finally:
+        conn.close()
+    return ids
+
+def processar_lote(caminhos, procedimento, concorrencia=None, max_processos=None, ao_progredir=None):
+    arquivos = listar_arquivos(caminhos)
+    textos, tempos_extracao, erros = extrair_textos(arquivos, max_processos)
+    assinaturas = [assinatura_minhash(texto) if texto else None for texto in textos]
+
+    # Quase duplicatas de documentos já cadastrados reaproveitam o resumo existente,
+    # sem nova chamada à IA, e ficam vinculadas ao documento original
+    originais = [buscar_quase_duplicata(assinatura) if assinatura is not None else None for assinatura in assinaturas]
+    pendentes = [indice for indice, (original, erro) in enumerate(zip(originais, erros)) if original is None and erro is None]
+    analisados = iter(analisar_textos(
+        [textos[indice] for indice in pendentes], concorrencia, ao_progredir,
+        [tempos_extracao[indice] for indice in pendentes]
+    ))
+
+    data_criacao = datetime.now().strftime("%Y-%m-%d")
+    registros = []
+    assinaturas_registros = []
+    textos_registros = []
+    falhas = []
+    for arquivo, texto, assinatura, original, erro in zip(arquivos, textos, assinaturas, originais, erros):
+        if erro is not None:
+            falhas.append((arquivo, erro))
+            continue
+        if original is not None:
+            titulo, resumo, duplicata_de = original['titulo'], original['resumo'], original['id']
+        else:
+            (titulo, resumo), duplicata_de = next(analisados), None
+        if titulo == "Erro":
+            falhas.append((arquivo, resumo))
+        else:
+            registros.append((titulo, resumo, procedimento or None, data_criacao, duplicata_de))
+            assinaturas_registros.append(assinatura)
+            textos_registros.append(texto)
+
+    if registros:
+        inserir_documentos(registros, assinaturas=assinaturas_registros, textos=textos_registros)
+    return len(registros), falhas
+
+# Refaz os resumos a partir dos textos guardados (por exemplo, após trocar o prompt ou o modelo),
+# sem reabrir os arquivos. Os textos são descomprimidos em blocos, e cada texto repetido é
+# analisado uma única vez. Retorna (documentos atualizados, hashes com falha).
+def refazer_resumos(clausula="", parametros=(), concorrencia=None, ao_progredir=None, tamanho_bloco=32):
+    conn = conectar()
+    try:
+        linhas = conn.execute(f"""
+            SELECT hash_texto, id FROM documentos
+            WHERE hash_texto IS NOT NULL {'AND (' + clausula + ')' if clausula else ''}
+            ORDER BY hash_texto
+        """, list(parametros)).fetchall()
+    finally:
+        conn.close()
+
+    ids_por_hash = {}
+    for chave, documento_id in linhas:
+        ids_por_hash.setdefault(chave, []).append(documento_id)
+    hashes = list(ids_por_hash)
+
+    atualizados = 0
+    falhas = []
+    for inicio in range(0, len(hashes), tamanho_bloco):
+        bloco = hashes[inicio:inicio + tamanho_bloco]
+        textos = carregar_textos(bloco)
+        progresso = (lambda concluidos, _, base=inicio: ao_progredir(base + concluidos, len(hashes))) if ao_progredir else None
+        resultados = analisar_textos([textos.get(chave) for chave in bloco], concorrencia, progresso)
+
+        alteracoes = []
+        for chave, (titulo, resumo) in zip(bloco, resultados):
+            if titulo == "Erro":
+                falhas.append((chave, resumo))
+            else:
+                alteracoes.extend((titulo, resumo, documento_id) for documento_id in ids_por_hash[chave])
+
+        conn = conectar()
+        try:
+            with conn:
+                conn.executemany("UPDATE documentos SET titulo = ?, resumo = ? WHERE id = ?", alteracoes)
+        finally:
+            conn.close()
+        atualizados += len(alteracoes)
+    return atualizados, falhas
@@ -1,16 +1,33 @@
 import sys
 import os
+import sqlite3
 
 from datetime import datetime
 
 from PySide6.QtWidgets import (QApplication, QMainWindow, QMessageBox, 
-                             QHeaderView, QDialog, QFileDialog)
-from PySide6.QtSql import QSqlDatabase, QSqlTableModel, QSqlQuery 
+                             QHeaderView, QDialog, QFileDialog, QPushButton, QMenu, QLineEdit,
+                             QWidget, QHBoxLayout, QLabel, QDateEdit, QComboBox, QDockWidget,
+                             QListWidget, QListWidgetItem, QTableWidget, QTableWidgetItem, QVBoxLayout)
+from PySide6.QtSql import QSqlDatabase, QSqlQuery 
+from PySide6.QtCore import Qt, QObject, QRunnable, QThreadPool, QTimer, QDate, Signal
 
 from ui.tela_principal import Ui_MainWindow
 from ui.tela_cadastro import Ui_Dialog
 
-from utils import gerar_titulo_e_resumo, exportar_relatorio 
+from utils import (obter_texto_medido, resumir_texto, criar_banco, buscar_documentos, aquecer_bibliotecas,
+                   conectar, CAMINHO_BANCO, PRAGMAS_CONEXAO)
+from lote import processar_lote, refazer_resumos
+from duplicatas import assinatura_minhash, buscar_quase_duplicata, registrar_assinatura
+from textos import guardar_texto
+from similares import abrir_indice
+from metricas import resumo_metricas
+from modelo_documentos import ModeloDocumentos, ModeloDocumentosRemoto
+from completador import CompletadorProcedimentos, CompletadorProcedimentosRemoto
+from cliente_servico import ClienteServico, ErroServico, servidor_pj_docs
+from filtros import FiltroDocumentos
+from exportacao import exportar_relatorio_sql, FORMATOS
+from importacao import importar_arquivo
+from extratores import filtro_dialogo
 
 # Classe da Janela de Cadastro de Procedimento
 class DialogCadastroProcedimento(QDialog, Ui_Dialog):
@@ -27,26 +44,171 @@ class DialogCadastroProcedimento(QDialog, Ui_Dialog):
         descricao = self.lineEdit_2.text()
         return numero, descricao
 
+# Sinais emitidos pela tarefa de resumo (QRunnable não herda de QObject)
+class SinaisResumo(QObject):
+    progresso = Signal(str)
+    concluido = Signal(str, str)
+    cancelado = Signal()
+    duplicata = Signal(object)
+
+# Tarefa executada fora da thread da interface: extração do texto e análise pela IA.
+# Antes da análise, procura um documento quase idêntico já cadastrado; se houver, a tarefa
+# para e avisa a janela, que pergunta se o resumo existente deve ser reaproveitado.
+class TarefaResumo(QRunnable):
+    def __init__(self, caminho_arquivo, texto=None, verificar_duplicatas=True):
+        super().__init__()
+        self.caminho_arquivo = caminho_arquivo
+        self.texto = texto
+        self.extracao_ms = None
+        self.verificar_duplicatas = verificar_duplicatas
+        self.assinatura = None
+        self.sinais = SinaisResumo()
+        self._cancelada = False
+
+    def cancelar(self):
+        # A chamada à IA não pode ser interrompida; o resultado apenas é descartado
+        self._cancelada = True
+
+    # Um erro (PDF protegido ou corrompido, .doc renomeado, falha ao consultar o banco) também
+    # encerra a tarefa com um sinal, para que a janela saia do estado "Extraindo texto..."
+    def run(self):
+        try:
+            self._executar()
+        except Exception as e:
+            if self._cancelada:
+                self.sinais.cancelado.emit()
+            else:
+                self.sinais.concluido.emit("Erro", f"Não foi possível processar o arquivo: {e}")
+
+    def _executar(self):
+        if self.texto is None:
+            self.sinais.progresso.emit("Extraindo texto do arquivo...")
+            self.texto, self.extracao_ms = obter_texto_medido(self.caminho_arquivo)
+        texto = self.texto
+        if self._cancelada:
+            self.sinais.cancelado.emit()
+            return
+        if not texto:
+            self.sinais.concluido.emit("Erro", "Não foi possível ler o arquivo.")
+            return
+
+        self.assinatura = assinatura_minhash(texto)
+        if self.verificar_duplicatas:
+            original = buscar_quase_duplicata(self.assinatura)
+            if original is not None:
+                self.sinais.duplicata.emit(original)
+                return
+
+        self.sinais.progresso.emit("Gerando resumo com a IA...")
+        titulo, resumo = resumir_texto(texto, self.extracao_ms)
+        if self._cancelada:
+            self.sinais.cancelado.emit()
+            return
+        self.sinais.concluido.emit(titulo, resumo)
+
+# Sinais e tarefa do processamento em lote (vários arquivos ou uma pasta inteira)
+class SinaisLote(QObject):
+    progresso = Signal(int, int)
+    concluido = Signal(int, object)
+
+class TarefaLote(QRunnable):
+    def __init__(self, caminhos, procedimento):
+        super().__init__()
+        self.caminhos = caminhos
+        self.procedimento = procedimento
+        self.sinais = SinaisLote()
+
+    # concluido é sempre emitido, para que a janela libere o botão do lote
+    def run(self):
+        try:
+            inseridos, falhas = processar_lote(
+                self.caminhos, self.procedimento, ao_progredir=self.sinais.progresso.emit
+            )
+        except Exception as e:
+            inseridos, falhas = 0, [(caminho, f"{type(e).__name__}: {e}") for caminho in self.caminhos]
+        self.sinais.concluido.emit(inseridos, falhas)
+
+# Refaz os resumos dos documentos filtrados a partir dos textos guardados no banco
+class TarefaRefazerResumos(QRunnable):
+    def __init__(self, clausula, parametros):
+        super().__init__()
+        self.clausula = clausula
+        self.parametros = parametros
+        self.sinais = SinaisLote()
+
+    def run(self):
+        try:
+            atualizados, falhas = refazer_resumos(
+                self.clausula, self.parametros, ao_progredir=self.sinais.progresso.emit
+            )
+        except Exception as e:
+            atualizados, falhas = 0, [(None, f"{type(e).__name__}: {e}")]
+        self.sinais.concluido.emit(atualizados, falhas)
+
+# Importação em massa de um CSV ou JSONL (procedimentos ou documentos)
+class TarefaImportacao(QRunnable):
+    def __init__(self, caminho):
+        super().__init__()
+        self.caminho = caminho
+        self.sinais = SinaisLote()
+
+    def run(self):
+        try:
+            resumo = importar_arquivo(self.caminho, ao_progredir=lambda lidas: self.sinais.progresso.emit(lidas, 0))
+        except (OSError, sqlite3.Error, ValueError) as e:  # ValueError: também CSV inválido e UnicodeDecodeError
+            resumo = {"erro": str(e)}
+        self.sinais.concluido.emit(resumo.get("inseridos", 0), resumo)
+
+# Abertura do índice de similares em segundo plano (carrega o arquivo salvo e sincroniza com o banco)
+class SinaisIndice(QObject):
+    pronto = Signal(object)
+
+class TarefaIndiceSimilares(QRunnable):
+    def __init__(self):
+        super().__init__()
+        self.sinais = SinaisIndice()
+
+    def run(self):
+        self.sinais.pronto.emit(abrir_indice())
+
 # Classe da Janela Principal
 class MainWindow(QMainWindow, Ui_MainWindow):
-    def __init__(self):
+    # Colunas da aba de estatísticas: (rótulo, chave em metricas.resumo_metricas)
+    COLUNAS_ESTATISTICAS = [
+        ("Operação", "operacao"), ("Modelo", "modelo"), ("Chamadas", "chamadas"), ("Erros", "erros"),
+        ("Latência p50 (s)", "latencia_p50_ms"), ("p90 (s)", "latencia_p90_ms"), ("p99 (s)", "latencia_p99_ms"),
+        ("Extração p50 (s)", "extracao_p50_ms"), ("Extração p90 (s)", "extracao_p90_ms"),
+        ("Tokens entrada", "tokens_prompt"), ("Tokens saída", "tokens_resposta"),
+        ("Custo (US$)", "custo"), ("Tentativas/chamada", "tentativas_por_chamada"),
+    ]
+
+    # Com um cliente (ClienteServico), procedimentos e documentos ficam no serviço de banco
+    # compartilhado; o banco local guarda apenas o cache de resumos e as métricas desta estação
+    def __init__(self, cliente=None):
         super().__init__()
         self.setupUi(self)
-        self.setWindowTitle("PJ Docs")
+        self.cliente = cliente
+        self.setWindowTitle(f"PJ Docs - {cliente.url}" if cliente else "PJ Docs")
 
         # Configuração do Banco de Dados 
-        self.db = QSqlDatabase.addDatabase("QSQLITE")
-        self.db.setDatabaseName("data/pj_docs.db")
+        if cliente is None:
+            self.db = QSqlDatabase.addDatabase("QSQLITE")
+            self.db.setDatabaseName(CAMINHO_BANCO)
 
-        if not self.db.open():
-            QMessageBox.critical(self, "Erro", "Não foi possível abrir o banco de dados.")
-            return
+            if not self.db.open():
+                QMessageBox.critical(self, "Erro", "Não foi possível abrir o banco de dados.")
+                return
+
+            # Mesmas configurações de desempenho usadas nas conexões sqlite3 (utils.conectar)
+            for pragma in PRAGMAS_CONEXAO:
+                QSqlQuery(pragma, self.db)
+        else:
+            self.db = None
 
         # Configuração do Modelo e TableView
-        self.model = QSqlTableModel(db=self.db)
-        self.model.setTable("documentos")
-        self.model.setEditStrategy(QSqlTableModel.OnFieldChange)
-        self.model.select()
+        # As linhas são buscadas em páginas à medida que a tabela é rolada
+        self.model = ModeloDocumentos(self.db) if cliente is None else ModeloDocumentosRemoto(cliente)
+        self.model.recarregar()
         self.tableView.setModel(self.model)
         
         # Ocultar ID e ajustar colunas
@@ -59,24 +221,131 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         # Conexão do Botão de Cadastro
         self.pushButtonCadastrar.clicked.connect(self.abrir_janela_cadastro)
 
-        # Inicializa os ComboBoxes
+        # ComboBoxes de procedimento: editáveis, com sugestões por prefixo buscadas no banco
+        self.completadores = []
+        for combo in (self.comboBoxProcedimentos, self.comboBoxProcedimentoSelecionado):
+            combo.setEditable(True)
+            combo.setInsertPolicy(QComboBox.NoInsert)
+            if cliente is None:
+                completador = CompletadorProcedimentos(self.db, parent=combo)
+            else:
+                completador = CompletadorProcedimentosRemoto(cliente, parent=combo)
+            combo.setCompleter(completador)
+            combo.lineEdit().textEdited.connect(completador.atualizar_prefixo)
+            self.completadores.append(completador)
         self.atualizar_comboboxes()
 
         # Conexão do Botão de Carregar Arquivo
         self.pushButtonCarregarArquivo.clicked.connect(self.selecionar_arquivo)
 
-        # Conexão do Botão de Gerar Resumo
+        # Botão de Processamento em Lote (arquivos ou pasta), ao lado do carregamento individual
+        self.tarefa_lote = None
+        self.pushButtonProcessarLote = QPushButton("Processar Lote", self.layoutWidget)
+        menu_lote = QMenu(self.pushButtonProcessarLote)
+        menu_lote.addAction("Selecionar arquivos...", self.selecionar_lote_arquivos)
+        menu_lote.addAction("Selecionar pasta...", self.selecionar_lote_pasta)
+        menu_lote.addSeparator()
+        menu_lote.addAction("Refazer resumos do filtro atual", self.refazer_resumos_filtro)
+        menu_lote.addAction("Importar procedimentos ou documentos (CSV/JSONL)...", self.importar_arquivo)
+        self.pushButtonProcessarLote.setMenu(menu_lote)
+        self.horizontalLayout_2.addWidget(self.pushButtonProcessarLote)
+
+        # Conexão do Botão de Gerar Resumo (o processamento ocorre em segundo plano)
+        self.pool_tarefas = QThreadPool.globalInstance()
+        self.tarefa_resumo = None
+        self.assinatura_atual = None  # Assinatura e texto do arquivo resumido, gravados ao salvar
+        self.texto_atual = None
+        self.duplicata_de = None      # Documento original cujo resumo foi reaproveitado
         self.pushButtonGerarResumo.clicked.connect(self.processar_resumo)
 
         # Conexão do Botão de Salvar Registro
         self.pushButtonSalvarRegistro.clicked.connect(self.salvar_registro)
 
-        # Filtragem por Procedimento
-        self.comboBoxProcedimentoSelecionado.currentTextChanged.connect(self.filtrar_por_procedimento)
-
-        # Conexão do Botão de Exportar Relatório
+        # Filtros combinados (procedimento, período e título), aplicados após uma breve pausa
+        # para que alterações seguidas resultem em uma única consulta
+        self.filtro = FiltroDocumentos()
+        self.ultimo_filtro = None
+        self.temporizador_filtro = QTimer(self)
+        self.temporizador_filtro.setSingleShot(True)
+        self.temporizador_filtro.setInterval(300)
+        self.temporizador_filtro.timeout.connect(self.aplicar_filtros)
+        self.comboBoxProcedimentoSelecionado.currentTextChanged.connect(self.agendar_filtro)
+
+        # Busca textual por título e resumo, ao lado da seleção de procedimento
+        self.lineEditBusca = QLineEdit(self.layoutWidget1)
+        self.lineEditBusca.setPlaceholderText("Pesquisar no título e no resumo...")
+        self.lineEditBusca.setClearButtonEnabled(True)
+        self.horizontalLayout_6.addWidget(self.lineEditBusca)
+        self.lineEditBusca.returnPressed.connect(self.aplicar_filtros)
+        self.lineEditBusca.textChanged.connect(self.agendar_filtro)
+
+        # Linha de filtros por período e por título, abaixo da seleção de procedimento
+        self.widgetFiltros = QWidget(self.widget_3)
+        self.widgetFiltros.setGeometry(20, 70, 671, 25)
+        layout_filtros = QHBoxLayout(self.widgetFiltros)
+        layout_filtros.setContentsMargins(0, 0, 0, 0)
+        self.dateEditInicio = self.criar_campo_data("Desde o início")
+        self.dateEditFim = self.criar_campo_data("Até hoje")
+        self.lineEditTitulo = QLineEdit(self.widgetFiltros)
+        self.lineEditTitulo.setPlaceholderText("Título contém...")
+        self.lineEditTitulo.setClearButtonEnabled(True)
+        self.lineEditTitulo.textChanged.connect(self.agendar_filtro)
+        layout_filtros.addWidget(QLabel("Período:", self.widgetFiltros))
+        layout_filtros.addWidget(self.dateEditInicio)
+        layout_filtros.addWidget(QLabel("a", self.widgetFiltros))
+        layout_filtros.addWidget(self.dateEditFim)
+        layout_filtros.addWidget(self.lineEditTitulo)
+
+        # Conexão do Botão de Exportar Relatório, com a escolha do formato logo acima
+        self.comboBoxFormato = QComboBox(self.widget_4)
+        self.comboBoxFormato.addItems([extensao.upper() for extensao in FORMATOS])
+        self.verticalLayout_5.insertWidget(self.verticalLayout_5.indexOf(self.pushButtonExportarRelatorio), self.comboBoxFormato)
         self.pushButtonExportarRelatorio.clicked.connect(self.preparar_relatorio)
 
+        # Painel de documentos similares ao selecionado na tabela (índice local, sem rede)
+        self.indice_similares = None
+        self.listaSimilares = QListWidget()
+        self.listaSimilares.itemDoubleClicked.connect(self.exibir_similar)
+        self.dockSimilares = QDockWidget("Documentos similares", self)
+        self.dockSimilares.setWidget(self.listaSimilares)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.dockSimilares)
+        self.tableView.selectionModel().currentRowChanged.connect(self.atualizar_similares)
+        self.model.dataChanged.connect(self.documento_editado)
+
+        # Aba de estatísticas das chamadas à IA (tabela metricas_llm), ao lado dos similares
+        painel_estatisticas = QWidget()
+        layout_estatisticas = QVBoxLayout(painel_estatisticas)
+        linha_periodo = QHBoxLayout()
+        self.comboBoxPeriodo = QComboBox()
+        for dias in (1, 7, 30, 90, 365):
+            self.comboBoxPeriodo.addItem(f"Últimos {dias} dia(s)", dias)
+        self.comboBoxPeriodo.setCurrentIndex(2)
+        self.comboBoxPeriodo.currentIndexChanged.connect(self.atualizar_estatisticas)
+        botao_atualizar = QPushButton("Atualizar")
+        botao_atualizar.clicked.connect(self.atualizar_estatisticas)
+        linha_periodo.addWidget(self.comboBoxPeriodo)
+        linha_periodo.addWidget(botao_atualizar)
+        layout_estatisticas.addLayout(linha_periodo)
+        self.tabelaEstatisticas = QTableWidget(0, len(self.COLUNAS_ESTATISTICAS))
+        self.tabelaEstatisticas.setHorizontalHeaderLabels([rotulo for rotulo, _ in self.COLUNAS_ESTATISTICAS])
+        self.tabelaEstatisticas.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout_estatisticas.addWidget(self.tabelaEstatisticas)
+        self.dockEstatisticas = QDockWidget("Estatísticas", self)
+        self.dockEstatisticas.setWidget(painel_estatisticas)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.dockEstatisticas)
+        self.tabifyDockWidget(self.dockSimilares, self.dockEstatisticas)
+        self.dockSimilares.raise_()
+        self.dockEstatisticas.visibilityChanged.connect(lambda visivel: visivel and self.atualizar_estatisticas())
+
+        # No modo cliente, lote, importação, refazer resumos, exportação e similares dependem do
+        # banco local e ficam a cargo do servidor (pj-docs no próprio servidor)
+        if cliente is not None:
+            for widget in (self.pushButtonProcessarLote, self.pushButtonExportarRelatorio, self.comboBoxFormato):
+                widget.setEnabled(False)
+                widget.setToolTip("Indisponível no modo cliente: use o pj-docs no servidor.")
+            self.dockSimilares.hide()
+            self.dockEstatisticas.raise_()
+
     def abrir_janela_cadastro(self):
         # 2. Instancia e exibe a janela de diálogo
         dialog = DialogCadastroProcedimento(self)
@@ -88,42 +357,65 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                 QMessageBox.warning(self, "Aviso", "Todos os campos são obrigatórios.")
                 return
 
-            # 3. Inserção no banco de dados
-            query = QSqlQuery(self.db)
-            query.prepare("INSERT INTO procedimentos (numero, descricao) VALUES (?, ?)")
-            query.addBindValue(numero)
-            query.addBindValue(descricao)
-
-            if query.exec():
-                QMessageBox.information(self, "Sucesso", "Procedimento cadastrado!")
-                
-                # --- Atualizações das comboboxes ---
-                self.atualizar_comboboxes() 
-                
-                # Define o item recém-criado como o selecionado no combo de cadastro
-                self.comboBoxProcedimentos.setCurrentText(numero)
-                
-            else:
-                QMessageBox.critical(self, "Erro", f"Erro ao inserir: {query.lastError().text()}")
+            # 3. Inserção no banco de dados (ou no serviço compartilhado)
+            try:
+                if self.cliente is not None:
+                    self.cliente.cadastrar_procedimento(numero, descricao)
+                else:
+                    self.gravar("INSERT INTO procedimentos (numero, descricao) VALUES (?, ?)", (numero, descricao))
+            except (sqlite3.Error, ErroServico) as e:
+                QMessageBox.critical(self, "Erro", f"Erro ao inserir: {e}")
+                return
+
+            QMessageBox.information(self, "Sucesso", "Procedimento cadastrado!")
+            
+            # --- Atualizações das comboboxes (sem recarregar as listas) ---
+            self.incluir_procedimento(numero)
+            
+            # Define o item recém-criado como o selecionado no combo de cadastro
+            self.comboBoxProcedimentos.setCurrentText(numero)
+
+    # As escritas usam o sqlite3 (utils.conectar), e não o QSqlDatabase: o Qt traz uma cópia
+    # própria do SQLite, e gravações feitas por ela nem sempre ficavam visíveis às conexões
+    # sqlite3 do mesmo processo (cache, duplicatas, textos guardados) até o fechamento da janela.
+    # A QSqlDatabase fica apenas com as leituras da tabela e das listas de procedimentos.
+    def gravar(self, sql, parametros=()):
+        conn = conectar()
+        try:
+            with conn:
+                return conn.execute(sql, parametros).lastrowid
+        finally:
+            conn.close()
 
     def atualizar_comboboxes(self):
-        # Preenche os ComboBoxes com os procedimentos do banco de dados
+        # As listas suspensas trazem apenas os procedimentos mais recentes; os demais
+        # são encontrados pelas sugestões ao digitar (CompletadorProcedimentos)
+        recentes = self.completadores[0].recentes()
         self.comboBoxProcedimentos.clear()
+        self.comboBoxProcedimentos.addItems(recentes)
         self.comboBoxProcedimentoSelecionado.clear()
         self.comboBoxProcedimentoSelecionado.addItem("Todos")
+        self.comboBoxProcedimentoSelecionado.addItems(recentes)
+
+    def incluir_procedimento(self, numero):
+        for completador in self.completadores:
+            completador.adicionar(numero)
+        self.comboBoxProcedimentos.insertItem(0, numero)
+        self.comboBoxProcedimentoSelecionado.insertItem(1, numero)
 
-        query = QSqlQuery("SELECT numero FROM procedimentos ORDER BY numero ASC", self.db)
-        while query.next():
-            num = query.value(0)
-            self.comboBoxProcedimentos.addItem(num)
-            self.comboBoxProcedimentoSelecionado.addItem(num)
+    # Procedimento digitado precisa estar cadastrado (os combos aceitam qualquer texto)
+    def validar_procedimento(self, procedimento):
+        if procedimento and not self.completadores[0].existe(procedimento):
+            QMessageBox.warning(self, "Aviso", f"Procedimento '{procedimento}' não cadastrado.")
+            return False
+        return True
 
     def selecionar_arquivo(self):
         # Obtém o caminho da pasta inicial do usuário (Home)
         pasta_inicial = os.path.expanduser("~")
 
-        # Filtro atualizado para aceitar apenas PDF, DOCX e TXT
-        filtro = "Documentos (*.pdf *.docx *.txt)"
+        # Filtro com os formatos do registro de extratores (PDF, DOCX, TXT, ODT, RTF, HTML, EML)
+        filtro = filtro_dialogo()
 
         # Abre a caixa de diálogo para seleção de um arquivo único
         caminho_arquivo, _ = QFileDialog.getOpenFileName(
@@ -147,16 +439,158 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         
         return None
     
+    def selecionar_lote_arquivos(self):
+        caminhos, _ = QFileDialog.getOpenFileNames(
+            self,
+            "Selecionar Arquivos",
+            os.path.expanduser("~"),
+            filtro_dialogo()
+        )
+        if caminhos:
+            self.processar_lote(caminhos)
+
+    def selecionar_lote_pasta(self):
+        pasta = QFileDialog.getExistingDirectory(self, "Selecionar Pasta", os.path.expanduser("~"))
+        if pasta:
+            self.processar_lote([pasta])
+
+    def processar_lote(self, caminhos):
+        if self.tarefa_lote is not None:
+            QMessageBox.warning(self, "Aviso", "Já existe um lote em processamento.")
+            return
+
+        procedimento = self.comboBoxProcedimentos.currentText()
+        if not self.validar_procedimento(procedimento):
+            return
+        self.tarefa_lote = TarefaLote(caminhos, procedimento)
+        self.tarefa_lote.sinais.progresso.connect(self.lote_progresso)
+        self.tarefa_lote.sinais.concluido.connect(self.lote_concluido)
+        self.pushButtonProcessarLote.setEnabled(False)
+        self.statusBar().showMessage("Extraindo textos do lote...")
+        self.pool_tarefas.start(self.tarefa_lote)
+
+    def lote_progresso(self, concluidos, total):
+        self.statusBar().showMessage(f"Lote: {concluidos} de {total} documentos analisados...")
+
+    def lote_concluido(self, inseridos, falhas):
+        self.tarefa_lote = None
+        self.pushButtonProcessarLote.setEnabled(True)
+        self.statusBar().clearMessage()
+        self.model.recarregar()  # Atualiza a exibição da tabela
+        if self.indice_similares is not None:
+            self.pool_tarefas.start(self.indice_similares.sincronizar)
+
+        mensagem = f"{inseridos} documento(s) registrado(s)."
+        if falhas:
+            arquivos = "\n".join(f"{os.path.basename(arquivo)}: {erro}" for arquivo, erro in falhas)
+            mensagem += f"\n\nFalha ao processar {len(falhas)} arquivo(s):\n{arquivos}"
+        QMessageBox.information(self, "Lote concluído", mensagem)
+
+    def importar_arquivo(self):
+        if self.tarefa_lote is not None:
+            QMessageBox.warning(self, "Aviso", "Já existe um lote em processamento.")
+            return
+        caminho, _ = QFileDialog.getOpenFileName(
+            self, "Importar procedimentos ou documentos", os.path.expanduser("~"),
+            "Planilhas e JSON Lines (*.csv *.jsonl *.ndjson)"
+        )
+        if not caminho:
+            return
+        self.tarefa_lote = TarefaImportacao(caminho)
+        self.tarefa_lote.sinais.progresso.connect(
+            lambda lidas, _: self.statusBar().showMessage(f"Importação: {lidas} linhas lidas...")
+        )
+        self.tarefa_lote.sinais.concluido.connect(self.importacao_concluida)
+        self.pushButtonProcessarLote.setEnabled(False)
+        self.statusBar().showMessage("Importando...")
+        self.pool_tarefas.start(self.tarefa_lote)
+
+    def importacao_concluida(self, _, resumo):
+        self.tarefa_lote = None
+        self.pushButtonProcessarLote.setEnabled(True)
+        self.statusBar().clearMessage()
+        if "erro" in resumo:
+            QMessageBox.critical(self, "Erro", f"Erro na importação: {resumo['erro']}")
+            return
+
+        self.model.recarregar()
+        for completador in self.completadores:
+            completador.descartar_resultados()
+        self.atualizar_comboboxes()
+        if self.indice_similares is not None:
+            self.pool_tarefas.start(self.indice_similares.sincronizar)
+
+        mensagem = (
+            f"{resumo['lidas']} linha(s) lida(s): {resumo['inseridos']} incluída(s), "
+            f"{resumo['atualizados']} atualizada(s) e {resumo['ignorados']} já existente(s)."
+        )
+        if resumo["rejeitados"]:
+            mensagem += f"\n\n{resumo['rejeitados']} linha(s) rejeitada(s); veja {resumo['relatorio']}"
+        QMessageBox.information(self, "Importação concluída", mensagem)
+
     def processar_resumo(self):
+        # Um segundo clique durante o processamento cancela a tarefa em andamento
+        if self.tarefa_resumo is not None:
+            self.tarefa_resumo.cancelar()
+            self.statusBar().showMessage("Cancelando...")
+            return
+
         caminho_arquivo = getattr(self, 'caminho_arquivo_selecionado', None)
         if not caminho_arquivo:
             QMessageBox.warning(self, "Aviso", "Nenhum arquivo selecionado.")
             return
 
-        titulo, resumo = gerar_titulo_e_resumo(caminho_arquivo)
+        # No modo cliente, a quase duplicata é vinculada pelo servidor ao salvar
+        self.iniciar_tarefa_resumo(TarefaResumo(caminho_arquivo, verificar_duplicatas=self.cliente is None))
+
+    def iniciar_tarefa_resumo(self, tarefa):
+        self.tarefa_resumo = tarefa
+        self.tarefa_resumo.sinais.progresso.connect(self.statusBar().showMessage)
+        self.tarefa_resumo.sinais.concluido.connect(self.resumo_concluido)
+        self.tarefa_resumo.sinais.cancelado.connect(self.resumo_cancelado)
+        self.tarefa_resumo.sinais.duplicata.connect(self.resumo_duplicado)
+        self.pushButtonGerarResumo.setText("Cancelar")
+        self.pool_tarefas.start(self.tarefa_resumo)
 
+    def resumo_concluido(self, titulo, resumo):
         self.lineEditAssunto.setText(titulo)
         self.textEditResumo.setPlainText(resumo)
+        self.assinatura_atual = self.tarefa_resumo.assinatura
+        self.texto_atual = self.tarefa_resumo.texto
+        self.duplicata_de = None
+        self.statusBar().showMessage("Resumo gerado.", 5000)
+        self.finalizar_tarefa_resumo()
+
+    def resumo_duplicado(self, original):
+        tarefa = self.tarefa_resumo
+        resposta = QMessageBox.question(
+            self, "Documento semelhante",
+            f"Este arquivo é {original['similaridade']:.0%} semelhante a um documento já cadastrado"
+            f"{' no procedimento ' + original['procedimento'] if original['procedimento'] else ''}:\n\n"
+            f"{original['titulo']}\n\n"
+            "Deseja reaproveitar o resumo existente? (Não: gerar um novo resumo com a IA)"
+        )
+        if resposta == QMessageBox.Yes:
+            self.lineEditAssunto.setText(original['titulo'])
+            self.textEditResumo.setPlainText(original['resumo'] or "")
+            self.assinatura_atual = tarefa.assinatura
+            self.texto_atual = tarefa.texto
+            self.duplicata_de = original['id']
+            self.statusBar().showMessage("Resumo reaproveitado de documento semelhante.", 5000)
+            self.finalizar_tarefa_resumo()
+        else:
+            # Reaproveita o texto já extraído e segue para a análise pela IA
+            nova = TarefaResumo(tarefa.caminho_arquivo, tarefa.texto, verificar_duplicatas=False)
+            nova.extracao_ms = tarefa.extracao_ms
+            self.iniciar_tarefa_resumo(nova)
+
+    def resumo_cancelado(self):
+        self.statusBar().showMessage("Geração do resumo cancelada.", 5000)
+        self.finalizar_tarefa_resumo()
+
+    def finalizar_tarefa_resumo(self):
+        self.tarefa_resumo = None
+        self.pushButtonGerarResumo.setText("Gerar Resumo")
 
     def salvar_registro(self):
         titulo = self.lineEditAssunto.text()
@@ -167,69 +601,259 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         if not titulo or not resumo:
             QMessageBox.warning(self, "Aviso", "Assunto e Resumo são obrigatórios.")
             return
+        if not self.validar_procedimento(procedimento):
+            return
 
-        query = QSqlQuery(self.db)
-        query.prepare("""
-            INSERT INTO documentos (titulo, resumo, procedimento, data_criacao) 
-            VALUES (?, ?, ?, ?)
-        """)
-        query.addBindValue(titulo)
-        query.addBindValue(resumo)
-        query.addBindValue(procedimento if procedimento != "" else None)
-        query.addBindValue(data_criacao)
-        if query.exec():
-            QMessageBox.information(self, "Sucesso", "Registro salvo com sucesso!")
-            self.model.select()  # Atualiza a exibição da tabela
-            # Limpa os campos após salvar
-            self.lineEditAssunto.clear()
-            self.textEditResumo.clear()
-
-            # Reseta o botão de carregar arquivo
-            self.pushButtonCarregarArquivo.setText("Carregar Arquivo")
-            fonte = self.pushButtonCarregarArquivo.font()
-            fonte.setBold(False)
-            self.pushButtonCarregarArquivo.setFont(fonte) 
+        try:
+            documento_id = self.gravar_documento(titulo, resumo, procedimento or None, data_criacao)
+        except (sqlite3.Error, ErroServico) as e:
+            QMessageBox.critical(self, "Erro", f"Erro ao salvar: {e}")
+            return
 
-            # Limpa a variável do caminho para evitar reprocessar o mesmo arquivo por engano
-            if hasattr(self, 'caminho_arquivo_selecionado'):
-                del self.caminho_arquivo_selecionado  
+        QMessageBox.information(self, "Sucesso", "Registro salvo com sucesso!")
+        self.model.inserir_registro(documento_id)  # Acrescenta a linha sem recarregar a tabela
+        self.reindexar_similares([documento_id])
+        self.assinatura_atual = None
+        self.texto_atual = None
+        self.duplicata_de = None
+
+        # Limpa os campos após salvar
+        self.lineEditAssunto.clear()
+        self.textEditResumo.clear()
+
+        # Reseta o botão de carregar arquivo
+        self.pushButtonCarregarArquivo.setText("Carregar Arquivo")
+        fonte = self.pushButtonCarregarArquivo.font()
+        fonte.setBold(False)
+        self.pushButtonCarregarArquivo.setFont(fonte) 
+
+        # Limpa a variável do caminho para evitar reprocessar o mesmo arquivo por engano
+        if hasattr(self, 'caminho_arquivo_selecionado'):
+            del self.caminho_arquivo_selecionado  
+
+    # O texto comprimido (para refazer o resumo depois) e a assinatura de duplicatas
+    # são gravados na mesma transação do documento (escrita pelo sqlite3, ver gravar)
+    def gravar_documento(self, titulo, resumo, procedimento, data_criacao):
+        if self.cliente is not None:
+            return self.cliente.inserir_documento(
+                titulo, resumo, procedimento, data_criacao, self.texto_atual, self.duplicata_de
+            )["id"]
+        conn = conectar()
+        try:
+            with conn:
+                hash_texto = guardar_texto(self.texto_atual, conn)
+                documento_id = conn.execute("""
+                    INSERT INTO documentos (titulo, resumo, procedimento, data_criacao, duplicata_de, hash_texto) 
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (titulo, resumo, procedimento, data_criacao, self.duplicata_de, hash_texto)).lastrowid
+                if self.assinatura_atual is not None:
+                    registrar_assinatura(documento_id, self.assinatura_atual, conn)
+        finally:
+            conn.close()
+        return documento_id
+
+    def criar_campo_data(self, texto_sem_limite):
+        # A data mínima é exibida como texto e significa "sem limite"
+        campo = QDateEdit(self.widgetFiltros)
+        campo.setCalendarPopup(True)
+        campo.setDisplayFormat("dd/MM/yyyy")
+        campo.setMinimumDate(QDate(2000, 1, 1))
+        campo.setSpecialValueText(texto_sem_limite)
+        campo.setDate(campo.minimumDate())
+        campo.dateChanged.connect(self.agendar_filtro)
+        return campo
+
+    def valor_data(self, campo):
+        if campo.date() == campo.minimumDate():
+            return None
+        return campo.date().toPython()
+
+    def agendar_filtro(self, *_):
+        self.temporizador_filtro.start()  # Reinicia a contagem a cada alteração
+
+    def aplicar_filtros(self):
+        self.temporizador_filtro.stop()
+
+        procedimento = self.comboBoxProcedimentoSelecionado.currentText()
+        self.filtro = FiltroDocumentos(
+            procedimentos=[procedimento] if procedimento and procedimento != "Todos" else [],
+            data_inicio=self.valor_data(self.dateEditInicio),
+            data_fim=self.valor_data(self.dateEditFim),
+            texto_titulo=self.lineEditTitulo.text()
+        )
+        clausula, parametros = self.filtro.montar()
+
+        termo = self.lineEditBusca.text().strip()
+        ids_por_relevancia = None
+        if termo:
+            try:
+                ids_por_relevancia = self.cliente.buscar(termo) if self.cliente else buscar_documentos(termo)
+            except ErroServico as e:
+                self.statusBar().showMessage(f"Erro na busca: {e}", 5000)
+                ids_por_relevancia = []
+
+        # Evita recarregar a tabela quando o resultado seria o mesmo
+        filtro_atual = (clausula, tuple(parametros), tuple(ids_por_relevancia or ()), termo)
+        if filtro_atual == self.ultimo_filtro:
+            return
+        self.ultimo_filtro = filtro_atual
 
-        else:
-            QMessageBox.critical(self, "Erro", f"Erro ao salvar: {query.lastError().text()}")
+        self.model.definir_filtro(clausula, parametros, ids_por_relevancia, self.filtro)
 
-    def filtrar_por_procedimento(self, texto):
-        if texto == "Todos":
-            self.model.setFilter("")  # Remove o filtro
-        else:
-            self.model.setFilter(f"procedimento = '{texto}'")
-        self.model.select()  # Atualiza a exibição da tabela
+    def indice_similares_pronto(self, indice):
+        self.indice_similares = indice
+        self.atualizar_similares(self.tableView.currentIndex())
+
+    # Atualiza no índice os documentos inseridos ou alterados (em segundo plano)
+    def reindexar_similares(self, ids):
+        if self.indice_similares is not None and ids:
+            self.pool_tarefas.start(lambda indice=self.indice_similares: indice.atualizar(ids))
+
+    def documento_editado(self, inicio, fim, *_):
+        if inicio.column() in (1, 2):  # Título ou resumo
+            registro = self.model.registro(inicio.row())
+            if registro:
+                self.reindexar_similares([registro["id"]])
+
+    def atualizar_similares(self, atual, *_):
+        self.listaSimilares.clear()
+        registro = self.model.registro(atual.row()) if atual.isValid() else None
+        if registro is None or self.cliente is not None:
+            return
+        if self.indice_similares is None:
+            self.listaSimilares.addItem("Carregando o índice de similares...")
+            return
+
+        resultados = self.indice_similares.similares([registro["id"]], k=10).get(registro["id"], [])
+        if not resultados:
+            self.listaSimilares.addItem("Nenhum documento semelhante.")
+            return
+        ids = [documento_id for documento_id, _ in resultados]
+        conn = conectar()
+        try:
+            dados = {linha[0]: linha[1:] for linha in conn.execute(
+                f"SELECT id, titulo, resumo, procedimento, data_criacao FROM documentos "
+                f"WHERE id IN ({', '.join('?' for _ in ids)})", ids
+            )}
+        finally:
+            conn.close()
+        for documento_id, pontuacao in resultados:
+            if documento_id not in dados:
+                continue
+            titulo, resumo, procedimento, data = dados[documento_id]
+            item = QListWidgetItem(f"{pontuacao:.0%}  {procedimento or '-'} · {data or ''}\n{titulo}")
+            item.setData(Qt.UserRole, (titulo, resumo))
+            self.listaSimilares.addItem(item)
+
+    def exibir_similar(self, item):
+        dados = item.data(Qt.UserRole)
+        if dados:
+            titulo, resumo = dados
+            QMessageBox.information(self, titulo, resumo or "")
+
+    def atualizar_estatisticas(self, *_):
+        resumo = resumo_metricas(self.comboBoxPeriodo.currentData())
+        self.tabelaEstatisticas.setRowCount(len(resumo))
+        for linha, grupo in enumerate(resumo):
+            for coluna, (_, chave) in enumerate(self.COLUNAS_ESTATISTICAS):
+                valor = grupo[chave]
+                if valor is None:
+                    texto = "-"
+                elif chave.endswith("_ms"):
+                    texto = f"{valor / 1000:.2f}"
+                elif chave == "custo":
+                    texto = f"{valor:.4f}"
+                else:
+                    texto = str(valor)
+                item = QTableWidgetItem(texto)
+                if chave == "erros" and grupo["erros_por_classe"]:
+                    item.setToolTip("\n".join(f"{classe}: {total}" for classe, total in grupo["erros_por_classe"].items()))
+                self.tabelaEstatisticas.setItem(linha, coluna, item)
+        self.tabelaEstatisticas.resizeColumnsToContents()
+
+    def closeEvent(self, evento):
+        if self.indice_similares is not None and self.indice_similares.alterado:
+            self.indice_similares.salvar()
+        if self.cliente is not None:
+            self.cliente.fechar()
+        super().closeEvent(evento)
+
+    # Condição SQL de todos os registros do filtro atual (não apenas as linhas já carregadas na tabela)
+    def clausula_filtro_atual(self):
+        condicoes = [self.model.filtro] if self.model.filtro else []
+        parametros = list(self.model.parametros)
+        if self.model.ids_por_relevancia is not None:
+            ids = self.model.ids_por_relevancia or [None]
+            condicoes.append(f"id IN ({', '.join('?' for _ in ids)})")
+            parametros.extend(ids)
+        return " AND ".join(condicoes), parametros
+
+    def refazer_resumos_filtro(self):
+        if self.tarefa_lote is not None:
+            QMessageBox.warning(self, "Aviso", "Já existe um lote em processamento.")
+            return
+        resposta = QMessageBox.question(
+            self, "Refazer resumos",
+            "Os títulos e resumos dos documentos filtrados serão substituídos por novos, "
+            "gerados a partir dos textos guardados no banco. Continuar?"
+        )
+        if resposta != QMessageBox.Yes:
+            return
+
+        self.clausula_refazer = self.clausula_filtro_atual()
+        self.tarefa_lote = TarefaRefazerResumos(*self.clausula_refazer)
+        self.tarefa_lote.sinais.progresso.connect(self.lote_progresso)
+        self.tarefa_lote.sinais.concluido.connect(self.refazer_resumos_concluido)
+        self.pushButtonProcessarLote.setEnabled(False)
+        self.statusBar().showMessage("Refazendo resumos...")
+        self.pool_tarefas.start(self.tarefa_lote)
+
+    def refazer_resumos_concluido(self, atualizados, falhas):
+        self.tarefa_lote = None
+        self.pushButtonProcessarLote.setEnabled(True)
+        self.statusBar().clearMessage()
+        self.model.recarregar()
+        clausula, parametros = self.clausula_refazer
+        conn = conectar()
+        try:
+            ids = [linha[0] for linha in conn.execute(
+                f"SELECT id FROM documentos {'WHERE ' + clausula if clausula else ''}", parametros
+            )]
+        finally:
+            conn.close()
+        self.reindexar_similares(ids)
+
+        mensagem = f"{atualizados} documento(s) atualizado(s)."
+        if falhas:
+            erros = "\n".join(sorted({erro for _, erro in falhas}))
+            mensagem += f"\n\nFalha ao analisar {len(falhas)} texto(s):\n{erros}"
+        QMessageBox.information(self, "Resumos refeitos", mensagem)
 
     def preparar_relatorio(self):
-        dados_para_relatorio = []
-        
-        # Percorre apenas as linhas que estão visíveis após o filtro
-        for row in range(self.model.rowCount()):
-            linha = {
-                "procedimento": self.model.record(row).value("procedimento"),
-                "data": self.model.record(row).value("data_criacao"),
-                "titulo": self.model.record(row).value("titulo"),
-                "resumo": self.model.record(row).value("resumo")
-            }
-            dados_para_relatorio.append(linha)
-
-        if not dados_para_relatorio:
-            QMessageBox.warning(self, "Aviso", "Não há dados para exportar com o filtro atual.")
+        formato = self.comboBoxFormato.currentText().lower()
+        try:
+            caminho = exportar_relatorio_sql(*self.clausula_filtro_atual(), formato)
+        except Exception as e:
+            QMessageBox.critical(self, "Erro", f"Erro ao gerar o relatório: {e}")
             return
 
-        # Chama a sua função utilitária (importada de utils)
-        sucesso = exportar_relatorio(dados_para_relatorio)
-        
-        if sucesso:
-            QMessageBox.information(self, "Sucesso", "Relatório gerado com sucesso!")
+        if caminho is None:
+            QMessageBox.warning(self, "Aviso", "Não há dados para exportar com o filtro atual.")
+            return
+        QMessageBox.information(self, "Sucesso", f"Relatório gerado com sucesso!\n{caminho}")
 
 if __name__ == "__main__":
+    criar_banco()  # Garante que as tabelas existam antes de abrir a janela
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
-    window = MainWindow()
+    # Modo cliente: servidor_pj_docs no .env aponta para o serviço de banco compartilhado
+    window = MainWindow(ClienteServico() if servidor_pj_docs else None)
     window.show()
+    # Carrega litellm, python-docx e PyPDF2 em segundo plano, depois que a janela aparece
+    QTimer.singleShot(0, lambda: QThreadPool.globalInstance().start(aquecer_bibliotecas))
+    # Abre o índice de similares também em segundo plano
+    if not servidor_pj_docs:
+        tarefa_indice = TarefaIndiceSimilares()
+        tarefa_indice.sinais.pronto.connect(window.indice_similares_pronto)
+        QTimer.singleShot(0, lambda: QThreadPool.globalInstance().start(tarefa_indice))
     sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,187 @@
+import os
+import time
+import sqlite3
+import cProfile
+import threading
+import statistics
+import tracemalloc
+from contextlib import contextmanager
+
+from utils import conectar, importar
+
+# Métricas das chamadas à IA (tabela metricas_llm) e perfis opcionais dos trechos mais
+# pesados. A gravação nunca interrompe a análise: falhas são apenas informadas.
+
+# Perfis de desempenho, ativados no .env: perfil_desempenho=cpu, memoria ou cpu,memoria
+perfil_desempenho = {modo.strip() for modo in os.getenv('perfil_desempenho', '').lower().split(',') if modo.strip()}
+PASTA_PERFIS = os.path.join("data", "perfis")
+
+# --- Registro das chamadas ---
+
+def custo_estimado(resultado):
+    try:
+        return importar('litellm').completion_cost(completion_response=resultado)
+    except Exception:
+        return None  # Modelo sem preço conhecido ou resposta sem dados de uso
+
+def registrar_chamada(operacao, modelo, latencia_ms, resultado=None, extracao_ms=None, tentativas=1, erro=None):
+    uso = getattr(resultado, 'usage', None)
+    try:
+        conn = conectar()
+        try:
+            with conn:
+                conn.execute("""
+                    INSERT INTO metricas_llm (operacao, modelo, latencia_ms, extracao_ms, tokens_prompt,
+                                              tokens_resposta, custo, tentativas, erro)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    operacao, modelo, latencia_ms, extracao_ms,
+                    getattr(uso, 'prompt_tokens', None), getattr(uso, 'completion_tokens', None),
+                    custo_estimado(resultado) if resultado is not None else None,
+                    tentativas, erro
+                ))
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"Erro ao registrar métricas: {e}")
+
+# Mede a chamada do bloco; o resultado e o erro são informados por quem chama:
+#   with MedicaoChamada("resumo", modelo) as medicao:
+#       medicao.resultado = litellm.completion(...)
+class MedicaoChamada:
+    def __init__(self, operacao, modelo, extracao_ms=None):
+        self.operacao = operacao
+        self.modelo = modelo
+        self.extracao_ms = extracao_ms
+        self.resultado = None
+        self.tentativas = 1
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, erro, rastreamento):
+        registrar_chamada(
+            self.operacao, self.modelo, (time.perf_counter() - self._inicio) * 1000,
+            self.resultado, self.extracao_ms, self.tentativas, tipo.__name__ if tipo else None
+        )
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, tipo, erro, rastreamento):
+        return self.__exit__(tipo, erro, rastreamento)
+
+# --- Estatísticas ---
+
+def percentis(valores, pontos=(50, 90, 99)):
+    valores = sorted(valor for valor in valores if valor is not None)
+    if not valores:
+        return {ponto: None for ponto in pontos}
+    if len(valores) == 1:
+        return {ponto: valores[0] for ponto in pontos}
+    cortes = statistics.quantiles(valores, n=100, method='inclusive')
+    return {ponto: cortes[ponto - 1] for ponto in pontos}
+
+# Resumo por operação e modelo dos últimos dias: chamadas, erros, percentis de latência
+# e de extração, tokens e custo acumulados
+def resumo_metricas(dias=30, caminho_banco=None):
+    conn = conectar(caminho_banco)
+    try:
+        linhas = conn.execute("""
+            SELECT operacao, modelo, latencia_ms, extracao_ms, tokens_prompt, tokens_resposta,
+                   custo, tentativas, erro
+            FROM metricas_llm WHERE criado_em >= datetime('now', ?)
+            ORDER BY operacao, modelo
+        """, (f"-{int(dias)} days",)).fetchall()
+    finally:
+        conn.close()
+
+    grupos = {}
+    for operacao, modelo, latencia, extracao, prompt, resposta, custo, tentativas, erro in linhas:
+        grupo = grupos.setdefault((operacao, modelo or ""), {
+            "latencias": [], "extracoes": [], "tokens_prompt": 0, "tokens_resposta": 0,
+            "custo": 0.0, "tentativas": 0, "erros": {},
+        })
+        grupo["latencias"].append(latencia)
+        grupo["extracoes"].append(extracao)
+        grupo["tokens_prompt"] += prompt or 0
+        grupo["tokens_resposta"] += resposta or 0
+        grupo["custo"] += custo or 0.0
+        grupo["tentativas"] += tentativas or 1
+        if erro:
+            grupo["erros"][erro] = grupo["erros"].get(erro, 0) + 1
+
+    resumo = []
+    for (operacao, modelo), grupo in grupos.items():
+        chamadas = len(grupo["latencias"])
+        latencia = percentis(grupo["latencias"])
+        extracao = percentis(grupo["extracoes"])
+        resumo.append({
+            "operacao": operacao,
+            "modelo": modelo,
+            "chamadas": chamadas,
+            "erros": sum(grupo["erros"].values()),
+            "erros_por_classe": grupo["erros"],
+            "latencia_p50_ms": latencia[50],
+            "latencia_p90_ms": latencia[90],
+            "latencia_p99_ms": latencia[99],
+            "extracao_p50_ms": extracao[50],
+            "extracao_p90_ms": extracao[90],
+            "tokens_prompt": grupo["tokens_prompt"],
+            "tokens_resposta": grupo["tokens_resposta"],
+            "custo": round(grupo["custo"], 6),
+            "tentativas_por_chamada": round(grupo["tentativas"] / chamadas, 2),
+        })
+    return resumo
+
+# --- Perfis opcionais (cProfile e tracemalloc) ---
+
+_trava_memoria = threading.Lock()
+_rastreamentos_ativos = 0
+_rastreamento_proprio = False  # Se o tracemalloc foi iniciado aqui (e não por outra ferramenta)
+
+@contextmanager
+def perfilar(nome):
+    if not perfil_desempenho:
+        yield
+        return
+
+    global _rastreamentos_ativos, _rastreamento_proprio
+    os.makedirs(PASTA_PERFIS, exist_ok=True)
+    base = os.path.join(PASTA_PERFIS, f"{nome}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{threading.get_ident()}")
+
+    perfil = cProfile.Profile() if 'cpu' in perfil_desempenho else None
+    memoria = 'memoria' in perfil_desempenho
+    if memoria:
+        with _trava_memoria:
+            # O tracemalloc é global: só é iniciado e parado pelo primeiro e pelo último trecho ativo
+            if _rastreamentos_ativos == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+                _rastreamento_proprio = True
+            _rastreamentos_ativos += 1
+        tracemalloc.reset_peak()
+        antes = tracemalloc.take_snapshot()
+    if perfil:
+        try:
+            perfil.enable()
+        except ValueError:
+            perfil = None  # Outro trecho já está sendo perfilado (um perfilador por vez no processo)
+    try:
+        yield
+    finally:
+        if perfil:
+            perfil.disable()
+            perfil.dump_stats(base + ".prof")  # Abrir com: python -m pstats arquivo.prof
+        if memoria:
+            _, pico = tracemalloc.get_traced_memory()
+            diferencas = tracemalloc.take_snapshot().compare_to(antes, 'lineno')[:15]
+            with open(base + "_memoria.txt", "w", encoding="utf-8") as arquivo:
+                arquivo.write(f"Pico de memória rastreada: {pico / 1024 / 1024:.1f} MiB\n\n")
+                arquivo.writelines(f"{diferenca}\n" for diferenca in diferencas)
+            with _trava_memoria:
+                _rastreamentos_ativos -= 1
+                if _rastreamentos_ativos == 0 and _rastreamento_proprio:
+                    tracemalloc.stop()
+                    _rastreamento_proprio = False
@@ -0,0 +1,265 @@
+import sqlite3
+from collections import OrderedDict
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PySide6.QtSql import QSqlQuery
+
+from utils import conectar
+
+# Colunas exibidas na tabela, na mesma ordem da tabela 'documentos'
+COLUNAS = ("id", "titulo", "resumo", "data_criacao", "procedimento")
+
+# Modelo da tabela de documentos carregado sob demanda, em páginas (paginação por chave)
+# Apenas as páginas acessadas mais recentemente ficam em memória; as demais são
+# descartadas e buscadas novamente quando voltam a ficar visíveis.
+class ModeloDocumentos(QAbstractTableModel):
+    def __init__(self, db, tamanho_pagina=200, max_paginas=50, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.tamanho_pagina = tamanho_pagina
+        self.max_paginas = max_paginas
+
+        self.filtro = ""
+        self.parametros = []
+        self.ids_por_relevancia = None
+        self.filtro_documentos = None  # Critérios do filtro (FiltroDocumentos), usados no modo cliente
+
+        self._paginas = OrderedDict()  # índice da página -> linhas (ordem de uso, LRU)
+        self._limites = []             # último id de cada página (chave da paginação)
+        self._total = 0
+        self._fim = False
+
+    # --- Consultas ---
+
+    def _executar(self, sql, parametros):
+        query = QSqlQuery(self.db)
+        query.prepare(sql)
+        for valor in parametros:
+            query.addBindValue(valor)
+        if not query.exec():
+            print(f"Erro na consulta de documentos: {query.lastError().text()}")
+            return []
+        linhas = []
+        while query.next():
+            linhas.append([query.value(i) for i in range(len(COLUNAS))])
+        return linhas
+
+    def _consultar_pagina(self, indice):
+        colunas = ", ".join(COLUNAS)
+        if self.ids_por_relevancia is not None:
+            fatia = self.ids_por_relevancia[indice * self.tamanho_pagina:(indice + 1) * self.tamanho_pagina]
+            if not fatia:
+                return []
+            marcadores = ", ".join("?" for _ in fatia)
+            linhas = self._executar(f"SELECT {colunas} FROM documentos WHERE id IN ({marcadores})", fatia)
+            posicoes = {id_doc: posicao for posicao, id_doc in enumerate(fatia)}
+            return sorted(linhas, key=lambda linha: posicoes[linha[0]])
+
+        anterior = self._limites[indice - 1] if indice > 0 else 0
+        condicoes = ["id > ?"] + ([f"({self.filtro})"] if self.filtro else [])
+        return self._executar(
+            f"SELECT {colunas} FROM documentos WHERE {' AND '.join(condicoes)} ORDER BY id LIMIT ?",
+            [anterior] + self.parametros + [self.tamanho_pagina]
+        )
+
+    def _guardar_pagina(self, indice, linhas):
+        self._paginas[indice] = linhas
+        self._paginas.move_to_end(indice)
+        while len(self._paginas) > self.max_paginas:
+            self._paginas.popitem(last=False)
+
+    def _linha(self, row):
+        indice = row // self.tamanho_pagina
+        pagina = self._paginas.get(indice)
+        if pagina is None:
+            pagina = self._consultar_pagina(indice)
+            self._guardar_pagina(indice, pagina)
+        else:
+            self._paginas.move_to_end(indice)
+        posicao = row % self.tamanho_pagina
+        return pagina[posicao] if posicao < len(pagina) else None
+
+    # --- Filtro e recarga ---
+
+    def definir_filtro(self, filtro="", parametros=(), ids_por_relevancia=None, filtro_documentos=None):
+        self.filtro = filtro
+        self.parametros = list(parametros)
+        self.filtro_documentos = filtro_documentos
+        self.ids_por_relevancia = None
+
+        # Resultados da busca textual: mantém a ordem de relevância, restrita ao filtro
+        if ids_por_relevancia is not None and ids_por_relevancia:
+            filtrados = self._filtrar_ids(ids_por_relevancia)
+            self.ids_por_relevancia = [id_doc for id_doc in ids_por_relevancia if id_doc in filtrados]
+        elif ids_por_relevancia is not None:
+            self.ids_por_relevancia = []
+
+        self.recarregar()
+
+    # Ids, entre os informados, que atendem ao filtro atual
+    def _filtrar_ids(self, ids):
+        marcadores = ", ".join("?" for _ in ids)
+        condicao = f"id IN ({marcadores})" + (f" AND ({self.filtro})" if self.filtro else "")
+        query = QSqlQuery(self.db)
+        query.prepare(f"SELECT id FROM documentos WHERE {condicao}")
+        for valor in list(ids) + self.parametros:
+            query.addBindValue(valor)
+        query.exec()
+        filtrados = set()
+        while query.next():
+            filtrados.add(query.value(0))
+        return filtrados
+
+    def recarregar(self):
+        self.beginResetModel()
+        self._paginas.clear()
+        self._limites = []
+        self._total = 0
+        self._fim = False
+        self.endResetModel()
+        if self.canFetchMore():
+            self.fetchMore()
+
+    # Acrescenta um documento recém-inserido sem recarregar a tabela
+    def inserir_registro(self, id_doc):
+        # Enquanto houver páginas por buscar, o novo id (o maior) virá na última delas
+        if self.ids_por_relevancia is not None or not self._fim:
+            return
+        linhas = self._buscar_registro(id_doc)
+        if not linhas:
+            return
+
+        indice = self._total // self.tamanho_pagina
+        self.beginInsertRows(QModelIndex(), self._total, self._total)
+        if indice == len(self._limites):
+            self._limites.append(id_doc)
+            self._guardar_pagina(indice, linhas)
+        else:
+            self._limites[indice] = id_doc
+            if indice in self._paginas:
+                self._paginas[indice].append(linhas[0])
+        self._total += 1
+        self.endInsertRows()
+
+    def _buscar_registro(self, id_doc):
+        condicoes = ["id = ?"] + ([f"({self.filtro})"] if self.filtro else [])
+        return self._executar(
+            f"SELECT {', '.join(COLUNAS)} FROM documentos WHERE {' AND '.join(condicoes)}",
+            [id_doc] + self.parametros
+        )
+
+    def registro(self, row):
+        linha = self._linha(row)
+        return dict(zip(COLUNAS, linha)) if linha else None
+
+    # --- Interface do QAbstractTableModel ---
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._total
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUNAS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._fim
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        indice = len(self._limites)
+        linhas = self._consultar_pagina(indice)
+        if len(linhas) < self.tamanho_pagina:
+            self._fim = True
+        if not linhas:
+            return
+        self.beginInsertRows(QModelIndex(), self._total, self._total + len(linhas) - 1)
+        self._guardar_pagina(indice, linhas)
+        self._limites.append(linhas[-1][0])
+        self._total += len(linhas)
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        linha = self._linha(index.row())
+        return linha[index.column()] if linha else None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return COLUNAS[section]
+        return section + 1
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid() and index.column() != 0:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    # Edição direta na tabela, gravada imediatamente (como o OnFieldChange anterior).
+    # A gravação usa o sqlite3, como as demais escritas (ver MainWindow.salvar_registro).
+    def setData(self, index, valor, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole or index.column() == 0:
+            return False
+        linha = self._linha(index.row())
+        if linha is None:
+            return False
+
+        if not self._gravar_campo(linha[0], COLUNAS[index.column()], valor):
+            return False
+
+        linha[index.column()] = valor
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        return True
+
+    def _gravar_campo(self, id_doc, coluna, valor):
+        conn = conectar(self.db.databaseName())
+        try:
+            with conn:
+                conn.execute(f"UPDATE documentos SET {coluna} = ? WHERE id = ?", (valor, id_doc))
+        except sqlite3.Error as e:
+            print(f"Erro ao atualizar documento: {e}")
+            return False
+        finally:
+            conn.close()
+        return True
+
+# Modo cliente: as mesmas páginas, buscadas no serviço de banco compartilhado (servico.py)
+class ModeloDocumentosRemoto(ModeloDocumentos):
+    def __init__(self, cliente, tamanho_pagina=200, max_paginas=50, parent=None):
+        super().__init__(None, tamanho_pagina, max_paginas, parent)
+        self.cliente = cliente
+
+    def _pagina_remota(self, **argumentos):
+        from cliente_servico import ErroServico
+        try:
+            return self.cliente.pagina(self.filtro_documentos, **argumentos)
+        except ErroServico as e:
+            print(f"Erro na consulta de documentos: {e}")
+            return []
+
+    def _consultar_pagina(self, indice):
+        if self.ids_por_relevancia is not None:
+            fatia = self.ids_por_relevancia[indice * self.tamanho_pagina:(indice + 1) * self.tamanho_pagina]
+            if not fatia:
+                return []
+            posicoes = {id_doc: posicao for posicao, id_doc in enumerate(fatia)}
+            return sorted(self._pagina_remota(ids=fatia), key=lambda linha: posicoes[linha[0]])
+        anterior = self._limites[indice - 1] if indice > 0 else 0
+        return self._pagina_remota(apos_id=anterior, limite=self.tamanho_pagina)
+
+    def _filtrar_ids(self, ids):
+        return {linha[0] for linha in self._pagina_remota(ids=list(ids))}
+
+    def _buscar_registro(self, id_doc):
+        return self._pagina_remota(ids=[id_doc])
+
+    def _gravar_campo(self, id_doc, coluna, valor):
+        from cliente_servico import ErroServico
+        try:
+            self.cliente.alterar_documento(id_doc, **{coluna: valor})
+        except ErroServico as e:
+            print(f"Erro ao atualizar documento: {e}")
+            return False
+        return True
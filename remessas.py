@@ -0,0 +1,404 @@
+import os
+import json
+import shutil
+import hashlib
+from datetime import datetime
+
+import utils
+from utils import conectar, importar, montar_mensagens, contar_tokens_texto, chave_cache, buscar_no_cache, gravar_no_cache
+from lote import listar_arquivos, extrair_textos, inserir_documentos
+from duplicatas import assinatura_minhash, buscar_quase_duplicata, registrar_assinatura
+from textos import guardar_texto, carregar_textos, hash_texto
+
+# Remessas à API de lotes do provedor, para grandes volumes sem pressa: os pedidos são
+# gravados em arquivos JSONL (um por linha, com as mesmas mensagens de analisar_conteudo),
+# enviados de uma vez e conferidos depois; o provedor responde em até 24 h, pela metade do
+# preço e sem os limites por minuto. O andamento fica nas tabelas remessas e itens_remessa:
+#
+#   preparar   -> remessa 'preparada' (arquivo JSONL em data/remessas)
+#   enviar     -> 'enviada' (lote_externo = identificador do lote no provedor)
+#   acompanhar -> ao terminar, os resultados viram documentos e a remessa fica 'reconciliada'
+#
+# Textos já resumidos (cache) e quase duplicatas são registrados na preparação, sem ir à
+# remessa; textos repetidos geram uma única requisição. Documentos acima de
+# max_tokens_documento precisam do resumo em partes e ficam para o "pj-docs ingerir".
+#
+# As mensagens começam pelas instruções fixas (sistema, prompt, formato e orientações) e
+# terminam no texto do documento, de modo que todas as requisições compartilham o mesmo
+# prefixo, aproveitado pelo cache de prompts do provedor; prompt_cache_key agrupa as
+# requisições com esse prefixo no mesmo servidor.
+#
+# endpoint_lotes no .env: "openai" (padrão) ou uma pasta, para o simulador local
+# (benchmarks/lotes_simulados.py), que lê e grava os arquivos no formato do provedor.
+
+endpoint_lotes = os.getenv('endpoint_lotes', 'openai')
+PASTA_REMESSAS = os.path.join("data", "remessas")
+ROTA = "/v1/chat/completions"
+MAX_REQUISICOES = 50000               # Limites de um arquivo de lote na OpenAI
+MAX_BYTES = 190 * 1024 * 1024         # (200 MB), com folga
+
+ESTADOS_CONCLUIDOS = ("completed",)
+ESTADOS_ENCERRADOS = ("failed", "expired", "cancelled")
+ERRO_SEM_TEXTO = "Texto original não encontrado no banco; processe o arquivo novamente"
+
+# --- Requisições ---
+
+def nome_modelo(modelo):
+    # No arquivo de lote vai o nome do modelo no provedor, sem o prefixo do litellm ("openai/...")
+    return modelo.split("/", 1)[1] if modelo and "/" in modelo else modelo
+
+def chave_prefixo(modelo, prompt):
+    prefixo = montar_mensagens("", prompt)
+    return hashlib.sha256(json.dumps([modelo, prefixo], ensure_ascii=False).encode('utf-8')).hexdigest()[:32]
+
+def montar_requisicao(custom_id, texto, modelo, prompt, prefixo=None):
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": ROTA,
+        "body": {
+            "model": nome_modelo(modelo),
+            "messages": montar_mensagens(texto, prompt),
+            "response_format": {"type": "json_object"},
+            "prompt_cache_key": prefixo or chave_prefixo(modelo, prompt),
+        },
+    }
+
+# --- Preparação ---
+
+def _novo_id(conn):
+    base = datetime.now().strftime("%Y%m%d-%H%M%S")
+    sequencia = conn.execute("SELECT COUNT(*) FROM remessas WHERE id LIKE ?", (base + "%",)).fetchone()[0]
+    return f"{base}-{sequencia + 1}"
+
+def _gravar_remessa(conn, pasta, modelo, requisicoes, itens):
+    remessa_id = _novo_id(conn)
+    arquivo = os.path.join(pasta, f"{remessa_id}.jsonl")
+    with open(arquivo, "w", encoding="utf-8") as saida:
+        saida.writelines(requisicoes)
+    with conn:
+        conn.execute(
+            "INSERT INTO remessas (id, modelo, arquivo, requisicoes) VALUES (?, ?, ?, ?)",
+            (remessa_id, modelo, arquivo, len(requisicoes))
+        )
+        for custom_id, arquivo_origem, procedimento, data_criacao, texto, chave in itens:
+            conn.execute("""
+                INSERT INTO itens_remessa (remessa_id, custom_id, arquivo, procedimento, data_criacao, hash_texto, chave_cache)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (remessa_id, custom_id, arquivo_origem, procedimento, data_criacao, guardar_texto(texto, conn), chave))
+    return remessa_id
+
+# Extrai os textos e grava as remessas; retorna (ids das remessas, documentos registrados
+# sem a IA, falhas). Cada arquivo JSONL respeita os limites de requisições e de tamanho.
+def preparar_remessas(caminhos, procedimento, pasta=None, max_processos=None,
+                      max_requisicoes=MAX_REQUISICOES, max_bytes=MAX_BYTES):
+    modelo, prompt = utils.modelo, utils.prompt
+    pasta = pasta or PASTA_REMESSAS
+    os.makedirs(pasta, exist_ok=True)
+    arquivos = listar_arquivos(caminhos)
+    textos, _, erros = extrair_textos(arquivos, max_processos)
+    data_criacao = datetime.now().strftime("%Y-%m-%d")
+    prefixo = chave_prefixo(modelo, prompt)
+
+    imediatos, assinaturas_imediatos, textos_imediatos = [], [], []
+    falhas = []
+    pendentes = {}  # custom_id -> [itens]; textos repetidos vão uma única vez
+    for arquivo, texto, erro in zip(arquivos, textos, erros):
+        if erro is not None:
+            falhas.append((arquivo, erro))
+            continue
+        assinatura = assinatura_minhash(texto)
+        original = buscar_quase_duplicata(assinatura)
+        chave = chave_cache(texto, modelo, prompt)
+        em_cache = buscar_no_cache(chave) if original is None else None
+        if original is not None or em_cache is not None:
+            titulo, resumo = (original['titulo'], original['resumo']) if original else em_cache
+            imediatos.append((titulo, resumo, procedimento or None, data_criacao, original['id'] if original else None))
+            assinaturas_imediatos.append(assinatura)
+            textos_imediatos.append(texto)
+            continue
+        custom_id = hash_texto(texto)
+        if custom_id not in pendentes and contar_tokens_texto(texto, modelo) > utils.max_tokens_documento:
+            falhas.append((arquivo, "Documento extenso: use o pj-docs ingerir (resumo em partes)."))
+            continue
+        pendentes.setdefault(custom_id, []).append((custom_id, arquivo, procedimento or None, data_criacao, texto, chave))
+
+    if imediatos:
+        inserir_documentos(imediatos, assinaturas=assinaturas_imediatos, textos=textos_imediatos)
+
+    remessas = []
+    conn = conectar()
+    try:
+        requisicoes, itens, tamanho = [], [], 0
+        for custom_id, itens_texto in pendentes.items():
+            linha = json.dumps(montar_requisicao(custom_id, itens_texto[0][4], modelo, prompt, prefixo), ensure_ascii=False) + "\n"
+            bytes_linha = len(linha.encode('utf-8'))
+            if requisicoes and (len(requisicoes) >= max_requisicoes or tamanho + bytes_linha > max_bytes):
+                remessas.append(_gravar_remessa(conn, pasta, modelo, requisicoes, itens))
+                requisicoes, itens, tamanho = [], [], 0
+            requisicoes.append(linha)
+            itens.extend(itens_texto)
+            tamanho += bytes_linha
+        if requisicoes:
+            remessas.append(_gravar_remessa(conn, pasta, modelo, requisicoes, itens))
+    finally:
+        conn.close()
+    return remessas, len(imediatos), falhas
+
+# Monta uma nova remessa com os itens que falharam (os textos já estão no banco);
+# os itens antigos ficam marcados como 'reenviado'. Itens cujo texto não está mais no banco
+# ficam como 'sem_texto' e são retornados para aviso: (id da remessa ou None, [(arquivo, erro)])
+def repetir_falhas(pasta=None):
+    modelo, prompt = utils.modelo, utils.prompt
+    pasta = pasta or PASTA_REMESSAS
+    os.makedirs(pasta, exist_ok=True)
+    conn = conectar()
+    remessa_id, perdidos = None, []
+    try:
+        falhas = conn.execute("""
+            SELECT id, custom_id, arquivo, procedimento, data_criacao, hash_texto FROM itens_remessa
+            WHERE estado = 'falha' AND hash_texto IS NOT NULL ORDER BY id
+        """).fetchall()
+        if not falhas:
+            return None, []
+        textos = carregar_textos({linha[5] for linha in falhas}, conn)
+        prefixo = chave_prefixo(modelo, prompt)
+        requisicoes, itens, reenviados = {}, [], []
+        for item_id, custom_id, arquivo, procedimento, data_criacao, chave_texto in falhas:
+            texto = textos.get(chave_texto)
+            if texto is None:
+                perdidos.append((item_id, arquivo))
+                continue
+            if custom_id not in requisicoes:
+                requisicoes[custom_id] = json.dumps(montar_requisicao(custom_id, texto, modelo, prompt, prefixo), ensure_ascii=False) + "\n"
+            itens.append((custom_id, arquivo, procedimento, data_criacao, texto, chave_cache(texto, modelo, prompt)))
+            reenviados.append(item_id)
+        if itens:
+            remessa_id = _gravar_remessa(conn, pasta, modelo, list(requisicoes.values()), itens)
+        with conn:
+            conn.executemany("UPDATE itens_remessa SET estado = 'reenviado' WHERE id = ?", [(item_id,) for item_id in reenviados])
+            conn.executemany(
+                "UPDATE itens_remessa SET estado = 'sem_texto', erro = ? WHERE id = ?",
+                [(ERRO_SEM_TEXTO, item_id) for item_id, _ in perdidos]
+            )
+    finally:
+        conn.close()
+    return remessa_id, [(arquivo, ERRO_SEM_TEXTO) for _, arquivo in perdidos]
+
+# --- Provedores ---
+
+class EndpointOpenAI:
+    def __init__(self, provedor="openai"):
+        self.provedor = provedor
+
+    def enviar(self, arquivo):
+        litellm = importar('litellm')
+        with open(arquivo, "rb") as entrada:
+            enviado = litellm.create_file(file=entrada, purpose="batch", custom_llm_provider=self.provedor, api_key=utils.api_key)
+        lote = litellm.create_batch(
+            completion_window="24h", endpoint=ROTA, input_file_id=enviado.id,
+            custom_llm_provider=self.provedor, api_key=utils.api_key
+        )
+        return lote.id
+
+    def consultar(self, lote_id):
+        lote = importar('litellm').retrieve_batch(batch_id=lote_id, custom_llm_provider=self.provedor, api_key=utils.api_key)
+        contagens = lote.request_counts
+        return {
+            "estado": lote.status, "saida": lote.output_file_id, "erros": lote.error_file_id,
+            "concluidas": getattr(contagens, "completed", None), "falhas": getattr(contagens, "failed", None),
+        }
+
+    def baixar(self, arquivo_id):
+        conteudo = importar('litellm').file_content(file_id=arquivo_id, custom_llm_provider=self.provedor, api_key=utils.api_key)
+        return conteudo.content.decode("utf-8")
+
+# Simulador local: o "envio" copia o arquivo para <pasta>/entrada e cria o estado em
+# <pasta>/lotes/<lote>.json; quem processa é benchmarks/lotes_simulados.py
+class EndpointArquivos:
+    def __init__(self, pasta):
+        self.pasta = pasta
+        for subpasta in ("entrada", "lotes", "saida"):
+            os.makedirs(os.path.join(pasta, subpasta), exist_ok=True)
+
+    def _estado(self, lote_id):
+        return os.path.join(self.pasta, "lotes", f"{lote_id}.json")
+
+    def enviar(self, arquivo):
+        lote_id = "batch_" + os.path.splitext(os.path.basename(arquivo))[0]
+        shutil.copyfile(arquivo, os.path.join(self.pasta, "entrada", f"{lote_id}.jsonl"))
+        with open(self._estado(lote_id), "w", encoding="utf-8") as saida:
+            json.dump({"id": lote_id, "status": "validating", "output_file_id": None, "error_file_id": None,
+                       "request_counts": {"total": 0, "completed": 0, "failed": 0}}, saida)
+        return lote_id
+
+    def consultar(self, lote_id):
+        with open(self._estado(lote_id), encoding="utf-8") as entrada:
+            lote = json.load(entrada)
+        return {
+            "estado": lote["status"], "saida": lote.get("output_file_id"), "erros": lote.get("error_file_id"),
+            "concluidas": lote["request_counts"].get("completed"), "falhas": lote["request_counts"].get("failed"),
+        }
+
+    def baixar(self, arquivo_id):
+        with open(os.path.join(self.pasta, "saida", arquivo_id), encoding="utf-8") as entrada:
+            return entrada.read()
+
+def obter_endpoint(destino=None):
+    destino = destino or endpoint_lotes
+    if destino in ("openai", "azure"):
+        return EndpointOpenAI(destino)
+    return EndpointArquivos(destino)
+
+# --- Envio e acompanhamento ---
+
+def _alterar_remessa(conn, remessa_id, **campos):
+    atribuicoes = ", ".join(f"{campo} = ?" for campo in campos)
+    with conn:
+        conn.execute(
+            f"UPDATE remessas SET {atribuicoes}, atualizado_em = CURRENT_TIMESTAMP WHERE id = ?",
+            (*campos.values(), remessa_id)
+        )
+
+def enviar_remessas(endpoint=None, ao_evento=None):
+    endpoint = endpoint or obter_endpoint()
+    ao_evento = ao_evento or (lambda evento, **dados: None)
+    conn = conectar()
+    enviadas = 0
+    try:
+        for remessa_id, arquivo in conn.execute("SELECT id, arquivo FROM remessas WHERE estado = 'preparada' ORDER BY id").fetchall():
+            try:
+                lote_id = endpoint.enviar(arquivo)
+            except Exception as e:
+                ao_evento("falha", remessa=remessa_id, erro=f"{type(e).__name__}: {e}")
+                continue
+            _alterar_remessa(conn, remessa_id, estado="enviada", lote_externo=lote_id)
+            ao_evento("enviada", remessa=remessa_id, lote=lote_id)
+            enviadas += 1
+    finally:
+        conn.close()
+    return enviadas
+
+def interpretar_linha(linha):
+    # Linha do arquivo de resultados: (custom_id, (assunto, resumo) ou None, erro, uso)
+    registro = json.loads(linha)
+    resposta = registro.get("response") or {}
+    corpo = resposta.get("body") or {}
+    if registro.get("error") or resposta.get("status_code") != 200:
+        erro = registro.get("error") or corpo.get("error") or {}
+        return registro["custom_id"], None, erro.get("message") or f"HTTP {resposta.get('status_code')}", corpo.get("usage")
+    from cliente_llm import carregar_json, RespostaInvalida
+    try:
+        dados = carregar_json(corpo["choices"][0]["message"]["content"])
+    except (RespostaInvalida, KeyError, IndexError, TypeError) as e:
+        return registro["custom_id"], None, f"Resposta inválida: {e}", corpo.get("usage")
+    resumo = (dados.get('assunto', 'Assunto não identificado'), dados.get('resumo', 'Resumo não gerado'))
+    return registro["custom_id"], resumo, None, corpo.get("usage")
+
+# Grava os resultados de uma remessa. Só os itens ainda pendentes são alterados, cada
+# resultado em uma transação com o documento: repetir a conciliação não duplica nada.
+def conciliar(conn, remessa_id, modelo, linhas):
+    totais = {"concluidos": 0, "falhas": 0, "tokens_prompt": 0, "tokens_cache": 0, "tokens_resposta": 0}
+    for linha in linhas:
+        if not linha.strip():
+            continue
+        custom_id, resumo, erro, uso = interpretar_linha(linha)
+        itens = conn.execute(
+            "SELECT id, procedimento, data_criacao, hash_texto, chave_cache FROM itens_remessa "
+            "WHERE remessa_id = ? AND custom_id = ? AND estado = 'pendente'",
+            (remessa_id, custom_id)
+        ).fetchall()
+        if not itens:
+            continue  # Já conciliado
+        if uso:
+            totais["tokens_prompt"] += uso.get("prompt_tokens") or 0
+            totais["tokens_resposta"] += uso.get("completion_tokens") or 0
+            totais["tokens_cache"] += (uso.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        if resumo is None:
+            with conn:
+                conn.execute("UPDATE itens_remessa SET estado = 'falha', erro = ? "
+                             "WHERE remessa_id = ? AND custom_id = ? AND estado = 'pendente'",
+                             (erro, remessa_id, custom_id))
+            totais["falhas"] += len(itens)
+            continue
+
+        texto = carregar_textos([itens[0][3]], conn).get(itens[0][3])
+        assinatura = assinatura_minhash(texto) if texto else None
+        with conn:
+            for item_id, procedimento, data_criacao, chave_texto, _ in itens:
+                cursor = conn.execute("""
+                    INSERT INTO documentos (titulo, resumo, procedimento, data_criacao, hash_texto)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (*resumo, procedimento, data_criacao, chave_texto))
+                if assinatura is not None:
+                    registrar_assinatura(cursor.lastrowid, assinatura, conn)
+                conn.execute(
+                    "UPDATE itens_remessa SET estado = 'concluido', documento_id = ?, erro = NULL WHERE id = ?",
+                    (cursor.lastrowid, item_id)
+                )
+        if itens[0][4]:
+            gravar_no_cache(itens[0][4], modelo, *resumo)
+        totais["concluidos"] += len(itens)
+    return totais
+
+def acompanhar_remessas(endpoint=None, ao_evento=None):
+    endpoint = endpoint or obter_endpoint()
+    ao_evento = ao_evento or (lambda evento, **dados: None)
+    conn = conectar()
+    try:
+        remessas = conn.execute(
+            "SELECT id, modelo, lote_externo FROM remessas WHERE estado = 'enviada' ORDER BY id"
+        ).fetchall()
+        for remessa_id, modelo, lote_id in remessas:
+            try:
+                lote = endpoint.consultar(lote_id)
+            except Exception as e:
+                ao_evento("falha", remessa=remessa_id, erro=f"{type(e).__name__}: {e}")
+                continue
+            if lote["estado"] not in ESTADOS_CONCLUIDOS + ESTADOS_ENCERRADOS:
+                ao_evento("andamento", remessa=remessa_id, estado=lote["estado"],
+                          concluidas=lote["concluidas"], falhas=lote["falhas"])
+                continue
+
+            # Lotes expirados ou cancelados podem ter resultados parciais
+            totais = {"concluidos": 0, "falhas": 0, "tokens_prompt": 0, "tokens_cache": 0, "tokens_resposta": 0}
+            try:
+                for arquivo_id in (lote["saida"], lote["erros"]):
+                    if arquivo_id:
+                        parcial = conciliar(conn, remessa_id, modelo, endpoint.baixar(arquivo_id).splitlines())
+                        for chave, valor in parcial.items():
+                            totais[chave] += valor
+            except Exception as e:
+                ao_evento("falha", remessa=remessa_id, erro=f"{type(e).__name__}: {e}")
+                continue
+            with conn:
+                sem_resposta = conn.execute(
+                    "UPDATE itens_remessa SET estado = 'falha', erro = ? WHERE remessa_id = ? AND estado = 'pendente'",
+                    (f"Sem resposta no lote ({lote['estado']})", remessa_id)
+                ).rowcount
+            totais["falhas"] += sem_resposta
+            _alterar_remessa(
+                conn, remessa_id,
+                estado="reconciliada" if lote["estado"] in ESTADOS_CONCLUIDOS else lote["estado"],
+                tokens_prompt=totais["tokens_prompt"], tokens_cache=totais["tokens_cache"],
+                tokens_resposta=totais["tokens_resposta"]
+            )
+            ao_evento("reconciliada", remessa=remessa_id, estado=lote["estado"], **totais)
+    finally:
+        conn.close()
+
+def listar_remessas():
+    conn = conectar()
+    try:
+        linhas = conn.execute("""
+            SELECT r.id, r.criado_em, r.modelo, r.estado, r.lote_externo, r.requisicoes,
+                   COUNT(i.id), SUM(i.estado = 'concluido'), SUM(i.estado = 'falha'),
+                   r.tokens_prompt, r.tokens_cache, r.tokens_resposta
+            FROM remessas r LEFT JOIN itens_remessa i ON i.remessa_id = r.id
+            GROUP BY r.id ORDER BY r.id
+        """).fetchall()
+    finally:
+        conn.close()
+    campos = ("id", "criado_em", "modelo", "estado", "lote", "requisicoes", "itens", "concluidos", "falhas",
+              "tokens_prompt", "tokens_cache", "tokens_resposta")
+    return [dict(zip(campos, linha)) for linha in linhas]
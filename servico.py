@@ -0,0 +1,388 @@
+import os
+import hmac
+import json
+import sqlite3
+import ipaddress
+import asyncio
+import argparse
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+
+import utils
+from utils import conectar, criar_banco, montar_consulta_fts
+from filtros import FiltroDocumentos
+
+# Serviço local de banco compartilhado: várias estações acessam os procedimentos e documentos
+# por HTTP/JSON, e apenas este processo abre o arquivo do SQLite (em disco local, não em uma
+# pasta de rede). As leituras usam um conjunto de conexões em WAL, uma por thread; as
+# escritas passam por uma fila e são gravadas por uma única conexão, agrupando as que chegam
+# juntas em uma só transação (cada uma em seu SAVEPOINT, de modo que a falha de uma não
+# desfaz as demais). Os clientes enviam critérios de filtro, nunca SQL.
+#
+# Por padrão o serviço só atende na própria máquina (127.0.0.1). Para atender às estações,
+# é preciso informar --permitir-rede e definir token_servico no .env, no servidor e nas
+# estações: as requisições sem esse token são recusadas (401).
+#
+#   python servico.py --host 0.0.0.0 --permitir-rede --porta 8470 --leitores 8
+#
+# Nas estações: servidor_pj_docs=http://servidor:8470 no .env (ver cliente_servico.py)
+
+token_servico = os.getenv('token_servico')
+
+HOST_PADRAO = "127.0.0.1"
+PORTA_PADRAO = 8470
+MAX_CORPO = 16 * 1024 * 1024
+MAX_ESCRITAS_POR_TRANSACAO = 64
+LIMITE_PAGINA = 1000
+COLUNAS = ("id", "titulo", "resumo", "data_criacao", "procedimento")  # As de modelo_documentos, sem importar o Qt
+CAMPOS_EDITAVEIS = ("titulo", "resumo", "data_criacao", "procedimento")
+
+class ErroRequisicao(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+# --- Leituras (executadas no conjunto de leitores) ---
+
+def ler_procedimentos(conn, prefixo="", limite=50):
+    if prefixo:
+        linhas = conn.execute(
+            "SELECT numero FROM procedimentos WHERE numero >= ? AND numero < ? ORDER BY numero LIMIT ?",
+            (prefixo, prefixo + "\U0010ffff", limite)
+        )
+    else:
+        linhas = conn.execute("SELECT numero FROM procedimentos ORDER BY numero LIMIT ?", (limite,))
+    return [linha[0] for linha in linhas]
+
+def ler_recentes(conn, limite=20):
+    return [linha[0] for linha in conn.execute("SELECT numero FROM procedimentos ORDER BY id DESC LIMIT ?", (limite,))]
+
+def existe_procedimento(conn, numero):
+    return conn.execute("SELECT 1 FROM procedimentos WHERE numero = ?", (numero,)).fetchone() is not None
+
+# Página por chave (id > apos_id), como o ModeloDocumentos local
+def ler_pagina(conn, filtro, apos_id=0, limite=200, ids=None):
+    clausula, parametros = FiltroDocumentos.de_dict(filtro).montar()
+    condicoes = [f"({clausula})"] if clausula else []
+    if ids is not None:
+        if not ids:
+            return []
+        condicoes.append(f"id IN ({', '.join('?' for _ in ids)})")
+        parametros = parametros + list(ids)
+    else:
+        condicoes.append("id > ?")
+        parametros = parametros + [apos_id]
+    sql = f"SELECT {', '.join(COLUNAS)} FROM documentos WHERE {' AND '.join(condicoes)} ORDER BY id"
+    if ids is None:
+        sql += " LIMIT ?"
+        parametros.append(min(limite, LIMITE_PAGINA))
+    return [list(linha) for linha in conn.execute(sql, parametros)]
+
+def buscar_ids(conn, termo, limite=200):
+    consulta = montar_consulta_fts(termo)
+    if not consulta:
+        return []
+    return [linha[0] for linha in conn.execute(
+        "SELECT rowid FROM documentos_fts WHERE documentos_fts MATCH ? ORDER BY rank LIMIT ?", (consulta, limite)
+    )]
+
+# --- Escritas (executadas pela conexão única de escrita, dentro da transação do lote) ---
+
+def gravar_procedimento(conn, numero, descricao):
+    if not numero or not descricao:
+        raise ErroRequisicao(400, "Número e descrição são obrigatórios.")
+    try:
+        conn.execute("INSERT INTO procedimentos (numero, descricao) VALUES (?, ?)", (numero, descricao))
+    except sqlite3.IntegrityError:
+        raise ErroRequisicao(409, f"Procedimento '{numero}' já cadastrado.")
+    return {"numero": numero}
+
+# O servidor guarda o texto e a assinatura (calculada antes, fora da fila de escrita)
+# e vincula a quase duplicata, se houver
+def gravar_documento(conn, dados, assinatura=None):
+    from textos import guardar_texto
+    from duplicatas import buscar_quase_duplicata, registrar_assinatura
+
+    titulo, resumo = dados.get("titulo"), dados.get("resumo")
+    if not titulo or not resumo:
+        raise ErroRequisicao(400, "Assunto e Resumo são obrigatórios.")
+    procedimento = dados.get("procedimento") or None
+    if procedimento and not existe_procedimento(conn, procedimento):
+        raise ErroRequisicao(400, f"Procedimento '{procedimento}' não cadastrado.")
+    texto = dados.get("texto")
+    duplicata_de = dados.get("duplicata_de")
+    if duplicata_de is None and assinatura is not None:
+        original = buscar_quase_duplicata(assinatura, conn=conn)
+        duplicata_de = original["id"] if original else None
+    documento_id = conn.execute("""
+        INSERT INTO documentos (titulo, resumo, procedimento, data_criacao, duplicata_de, hash_texto)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (titulo, resumo, procedimento, dados.get("data_criacao") or datetime.now().strftime("%Y-%m-%d"),
+          duplicata_de, guardar_texto(texto, conn))).lastrowid
+    if assinatura is not None:
+        registrar_assinatura(documento_id, assinatura, conn)
+    return {"id": documento_id, "duplicata_de": duplicata_de}
+
+def alterar_documento(conn, documento_id, campos):
+    campos = {campo: valor for campo, valor in campos.items() if campo in CAMPOS_EDITAVEIS}
+    if not campos:
+        raise ErroRequisicao(400, f"Campos editáveis: {', '.join(CAMPOS_EDITAVEIS)}.")
+    cursor = conn.execute(
+        f"UPDATE documentos SET {', '.join(f'{campo} = ?' for campo in campos)} WHERE id = ?",
+        [*campos.values(), documento_id]
+    )
+    if cursor.rowcount == 0:
+        raise ErroRequisicao(404, f"Documento {documento_id} não encontrado.")
+    return {"id": documento_id}
+
+# --- Acesso ao banco ---
+
+class Banco:
+    def __init__(self, caminho_banco=None, leitores=8, max_escritas=MAX_ESCRITAS_POR_TRANSACAO):
+        self.caminho_banco = caminho_banco or utils.CAMINHO_BANCO
+        self.max_escritas = max_escritas
+        self._local = threading.local()
+        self._leitores = ThreadPoolExecutor(max_workers=leitores, thread_name_prefix="leitor")
+        self._escritor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="escritor")
+        self._conn_escrita = None
+        self._fila = None
+        self._tarefa_escrita = None
+
+    def iniciar(self):
+        self._fila = asyncio.Queue()
+        self._tarefa_escrita = asyncio.create_task(self._laco_escrita())
+
+    async def encerrar(self):
+        if self._tarefa_escrita:
+            self._tarefa_escrita.cancel()
+        self._leitores.shutdown()
+        self._escritor.shutdown()
+
+    def _conexao_leitura(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = conectar(self.caminho_banco)
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    async def ler(self, funcao, *argumentos):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._leitores, lambda: funcao(self._conexao_leitura(), *argumentos)
+        )
+
+    async def escrever(self, funcao, *argumentos):
+        futuro = asyncio.get_running_loop().create_future()
+        await self._fila.put((funcao, argumentos, futuro))
+        return await futuro
+
+    async def _laco_escrita(self):
+        laco = asyncio.get_running_loop()
+        while True:
+            pedidos = [await self._fila.get()]
+            while len(pedidos) < self.max_escritas and not self._fila.empty():
+                pedidos.append(self._fila.get_nowait())
+            try:
+                resultados = await laco.run_in_executor(self._escritor, self._gravar, pedidos)
+            except Exception as e:  # Falha da própria transação (disco cheio, banco bloqueado...)
+                resultados = [(False, e)] * len(pedidos)
+            for (_, _, futuro), (sucesso, valor) in zip(pedidos, resultados):
+                if futuro.done():
+                    continue
+                if sucesso:
+                    futuro.set_result(valor)
+                else:
+                    futuro.set_exception(valor)
+
+    def _gravar(self, pedidos):
+        if self._conn_escrita is None:
+            self._conn_escrita = conectar(self.caminho_banco)
+            self._conn_escrita.isolation_level = None  # Transações controladas aqui
+        conn = self._conn_escrita
+        resultados = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for funcao, argumentos, _ in pedidos:
+                conn.execute("SAVEPOINT pedido")
+                try:
+                    resultados.append((True, funcao(conn, *argumentos)))
+                except Exception as e:  # Desfaz só este pedido; os demais do lote seguem
+                    conn.execute("ROLLBACK TO pedido")
+                    resultados.append((False, e))
+                conn.execute("RELEASE pedido")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return resultados
+
+# --- HTTP ---
+
+def _inteiro(consulta, nome, padrao):
+    try:
+        return int(consulta.get(nome, [padrao])[0])
+    except ValueError:
+        raise ErroRequisicao(400, f"Parâmetro '{nome}' inválido.")
+
+class Servico:
+    def __init__(self, banco, token=None):
+        self.banco = banco
+        self.token = token
+        self.rotas = {
+            ("GET", "/saude"): self.saude,
+            ("GET", "/procedimentos"): self.procedimentos,
+            ("GET", "/procedimentos/recentes"): self.recentes,
+            ("GET", "/procedimentos/existe"): self.existe,
+            ("POST", "/procedimentos"): self.cadastrar_procedimento,
+            ("POST", "/documentos/pagina"): self.pagina,
+            ("GET", "/documentos/busca"): self.busca,
+            ("POST", "/documentos"): self.inserir_documento,
+        }
+
+    async def saude(self, consulta, corpo):
+        return {"ok": True, "versao": await self.banco.ler(lambda conn: conn.execute("PRAGMA user_version").fetchone()[0])}
+
+    async def procedimentos(self, consulta, corpo):
+        return await self.banco.ler(
+            ler_procedimentos, consulta.get("prefixo", [""])[0], min(_inteiro(consulta, "limite", 50), LIMITE_PAGINA)
+        )
+
+    async def recentes(self, consulta, corpo):
+        return await self.banco.ler(ler_recentes, min(_inteiro(consulta, "limite", 20), LIMITE_PAGINA))
+
+    async def existe(self, consulta, corpo):
+        return await self.banco.ler(existe_procedimento, consulta.get("numero", [""])[0])
+
+    async def cadastrar_procedimento(self, consulta, corpo):
+        return await self.banco.escrever(gravar_procedimento, corpo.get("numero"), corpo.get("descricao"))
+
+    async def pagina(self, consulta, corpo):
+        try:
+            return await self.banco.ler(
+                ler_pagina, corpo.get("filtro"), int(corpo.get("apos_id") or 0),
+                int(corpo.get("limite") or 200), corpo.get("ids")
+            )
+        except (TypeError, ValueError) as e:
+            raise ErroRequisicao(400, f"Filtro inválido: {e}")
+
+    async def busca(self, consulta, corpo):
+        return await self.banco.ler(buscar_ids, consulta.get("termo", [""])[0], min(_inteiro(consulta, "limite", 200), LIMITE_PAGINA))
+
+    async def inserir_documento(self, consulta, corpo):
+        from duplicatas import assinatura_minhash
+        texto = corpo.get("texto")
+        assinatura = await asyncio.to_thread(assinatura_minhash, texto) if texto else None
+        return await self.banco.escrever(gravar_documento, corpo, assinatura)
+
+    async def alterar_documento(self, documento_id, corpo):
+        return await self.banco.escrever(alterar_documento, documento_id, corpo)
+
+    async def despachar(self, metodo, caminho, consulta, corpo):
+        manipulador = self.rotas.get((metodo, caminho))
+        if manipulador:
+            return await manipulador(consulta, corpo)
+        partes = caminho.strip("/").split("/")
+        if metodo == "PATCH" and len(partes) == 2 and partes[0] == "documentos" and partes[1].isdigit():
+            return await self.alterar_documento(int(partes[1]), corpo)
+        raise ErroRequisicao(404, f"Rota desconhecida: {metodo} {caminho}")
+
+    # Uma conexão pode levar várias requisições (HTTP/1.1 com keep-alive)
+    async def atender(self, leitor, escritor):
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                try:
+                    metodo, alvo, _ = linha.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    break
+                cabecalhos = {}
+                while (cabecalho := await leitor.readline()) not in (b"\r\n", b"\n", b""):
+                    nome, _, valor = cabecalho.decode("latin-1").partition(":")
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+                tamanho = int(cabecalhos.get("content-length", 0) or 0)
+                manter = cabecalhos.get("connection", "").lower() != "close"
+
+                try:
+                    if tamanho > MAX_CORPO:
+                        raise ErroRequisicao(413, "Requisição muito grande.")
+                    bruto = await leitor.readexactly(tamanho) if tamanho else b""
+                    if self.token and not hmac.compare_digest(
+                            cabecalhos.get("authorization", "").encode("latin-1"), f"Bearer {self.token}".encode("utf-8")):
+                        raise ErroRequisicao(401, "Token do serviço ausente ou inválido.")
+                    corpo = json.loads(bruto) if bruto else {}
+                    if not isinstance(corpo, dict):
+                        raise ErroRequisicao(400, "O corpo da requisição deve ser um objeto JSON.")
+                    endereco = urlsplit(alvo)
+                    resultado = await self.despachar(metodo.upper(), endereco.path.rstrip("/") or "/",
+                                                     parse_qs(endereco.query), corpo)
+                    status, resposta = 200, {"resultado": resultado}
+                except ErroRequisicao as e:
+                    status, resposta = e.status, {"erro": str(e)}
+                except (ValueError, sqlite3.Error) as e:
+                    status, resposta = 400 if isinstance(e, ValueError) else 500, {"erro": str(e)}
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    status, resposta = 500, {"erro": f"Erro interno: {e}"}
+
+                dados = json.dumps(resposta, ensure_ascii=False).encode("utf-8")
+                escritor.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Erro'}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(dados)}\r\n"
+                    f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n".encode("latin-1") + dados
+                )
+                await escritor.drain()
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+async def servir(host=HOST_PADRAO, porta=PORTA_PADRAO, leitores=8, caminho_banco=None, pronto=None, token=None):
+    banco = Banco(caminho_banco, leitores)
+    banco.iniciar()
+    servico = Servico(banco, token)
+    servidor = await asyncio.start_server(servico.atender, host, porta)
+    print(f"Serviço PJ Docs em http://{host}:{porta} (banco: {banco.caminho_banco})")
+    if pronto:
+        pronto(servidor)
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        await banco.encerrar()
+
+def somente_local(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False  # Nome de máquina: pode atender a outras interfaces
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço de banco compartilhado do PJ Docs")
+    parser.add_argument("--host", default=HOST_PADRAO)
+    parser.add_argument("--permitir-rede", action="store_true",
+                        help="Necessário para atender em outra interface além da local (exige token_servico no .env)")
+    parser.add_argument("--porta", type=int, default=int(os.getenv("porta_servico", PORTA_PADRAO)))
+    parser.add_argument("--leitores", type=int, default=8, help="Conexões de leitura simultâneas")
+    args = parser.parse_args(argv)
+    if not somente_local(args.host):
+        if not args.permitir_rede:
+            parser.error(f"--host {args.host} expõe o banco na rede; informe também --permitir-rede")
+        if not token_servico:
+            parser.error("defina token_servico no .env para atender na rede")
+    criar_banco()
+    try:
+        asyncio.run(servir(args.host, args.porta, args.leitores, token=token_servico))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import os
+import re
+import zlib
+import threading
+
+import utils
+from utils import conectar, importar
+from textos import descomprimir
+
+# Índice local de documentos semelhantes (TF-IDF com vetores esparsos), sem rede nem GPU.
+# Os termos são mapeados por hash para um número fixo de colunas, de modo que novos
+# documentos entram sem reconstruir um vocabulário. A matriz de frequências fica salva
+# ao lado do banco e é sincronizada com ele ao ser carregada: o banco é a fonte da verdade.
+
+DIMENSAO = 1 << 18
+TAMANHO_BUFFER = 256       # Documentos novos ou excluídos acumulados antes de refazer a matriz principal
+LIMITE_TEXTO = 20000       # Caracteres do texto original considerados (além de título e resumo)
+_TERMOS = re.compile(r'\w{3,}')
+_IRRELEVANTES = set(
+    "que para com por uma dos das nos nas não como mais mas foi ser são está pelo pela "
+    "aos este esta esse essa isso sua seu suas seus também quando sobre entre após até "
+    "pois ter tem há ao à às se na no da do de em os as um é ou the and".split()
+)
+
+def termos(texto):
+    return [termo for termo in _TERMOS.findall(texto.lower()) if termo not in _IRRELEVANTES]
+
+def caminho_indice(caminho_banco=None):
+    return os.path.splitext(caminho_banco or utils.CAMINHO_BANCO)[0] + "_similares.npz"
+
+# Conteúdo indexado de cada documento: título, resumo e o início do texto original, se guardado
+CONSULTA_CONTEUDO = """
+    SELECT d.id, d.titulo, d.resumo, t.conteudo
+    FROM documentos d LEFT JOIN textos_originais t ON t.hash = d.hash_texto
+"""
+
+def conteudo_indexado(titulo, resumo, texto=None):
+    return "\n".join(parte for parte in (titulo, resumo, (texto or "")[:LIMITE_TEXTO]) if parte)
+
+class IndiceSimilares:
+    def __init__(self, caminho_banco=None):
+        self.caminho_banco = caminho_banco
+        self.caminho = caminho_indice(caminho_banco)
+        self._trava = threading.RLock()
+        np = importar('numpy')
+        sparse = importar('scipy.sparse')
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.frequencias = sparse.csr_matrix((0, DIMENSAO), dtype=np.float32)
+        self._posicoes = {}        # id -> posição: linhas da matriz principal, depois as novas
+        self._removidas = set()    # Posições excluídas, ainda presentes nas matrizes
+        self._ids_novos = []
+        self._frequencias_novas = sparse.csr_matrix((0, DIMENSAO), dtype=np.float32)
+        self._ponderada_nova = sparse.csr_matrix((0, DIMENSAO), dtype=np.float32)
+        self._atualizar_ponderacao()
+        self.alterado = False
+
+    def __len__(self):
+        return len(self._posicoes)
+
+    def _vetorizar(self, textos):
+        np = importar('numpy')
+        sparse = importar('scipy.sparse')
+        indptr, indices, dados = [0], [], []
+        for texto in textos:
+            colunas = np.fromiter(
+                (zlib.crc32(termo.encode('utf-8')) & (DIMENSAO - 1) for termo in termos(texto)), dtype=np.int64
+            )
+            unicos, contagens = np.unique(colunas, return_counts=True)
+            indices.append(unicos)
+            dados.append(contagens)
+            indptr.append(indptr[-1] + len(unicos))
+        return sparse.csr_matrix(
+            (np.concatenate(dados).astype(np.float32) if dados else [],
+             np.concatenate(indices) if indices else [], indptr),
+            shape=(len(textos), DIMENSAO)
+        )
+
+    # Pondera com o IDF da última consolidação, de modo que as linhas novas e as da matriz
+    # principal continuem comparáveis entre si
+    def _ponderar(self, frequencias):
+        np = importar('numpy')
+        sparse = importar('scipy.sparse')
+        matriz = frequencias.copy()
+        matriz.data = 1 + np.log(matriz.data)        # Frequência sublinear
+        matriz = matriz.multiply(self._idf).tocsr()
+        normas = np.sqrt(np.asarray(matriz.multiply(matriz).sum(axis=1)).ravel())
+        normas[normas == 0] = 1
+        return (sparse.diags(1 / normas) @ matriz).tocsr()
+
+    def _atualizar_ponderacao(self):
+        np = importar('numpy')
+        self.df = np.bincount(self.frequencias.indices, minlength=DIMENSAO).astype(np.int32)
+        self._idf = np.log((1 + len(self.ids)) / (1 + self.df)).astype(np.float32) + 1
+        self._ponderada = self._ponderar(self.frequencias)
+
+    # Salvar um documento não copia a matriz inteira nem refaz o TF-IDF de todo o acervo:
+    # as linhas novas ficam à parte (já ponderadas) e as excluídas apenas marcadas. A cada
+    # TAMANHO_BUFFER alterações, tudo é reunido na matriz principal e o IDF é recalculado,
+    # na thread que fez a alteração (tarefas em segundo plano, nunca a da interface).
+    def _consolidar(self):
+        np = importar('numpy')
+        sparse = importar('scipy.sparse')
+        frequencias, ids = self.frequencias, self.ids
+        if self._ids_novos:
+            frequencias = sparse.vstack([frequencias, self._frequencias_novas], format='csr')
+            ids = np.concatenate([ids, np.array(self._ids_novos, dtype=np.int64)])
+        if self._removidas:
+            manter = np.ones(len(ids), dtype=bool)
+            manter[list(self._removidas)] = False
+            frequencias, ids = frequencias[manter], ids[manter]
+        self.frequencias, self.ids = frequencias, ids
+        self._posicoes = {int(documento_id): posicao for posicao, documento_id in enumerate(ids)}
+        self._removidas = set()
+        self._ids_novos = []
+        self._frequencias_novas = sparse.csr_matrix((0, DIMENSAO), dtype=np.float32)
+        self._ponderada_nova = sparse.csr_matrix((0, DIMENSAO), dtype=np.float32)
+        self._atualizar_ponderacao()
+
+    def _consolidar_se_preciso(self):
+        if len(self._ids_novos) + len(self._removidas) >= TAMANHO_BUFFER:
+            self._consolidar()
+
+    # Acrescenta (ou substitui) documentos: pares (id, texto)
+    def adicionar(self, documentos):
+        sparse = importar('scipy.sparse')
+        documentos = list(documentos)
+        if not documentos:
+            return
+        with self._trava:
+            self.remover([documento_id for documento_id, _ in documentos if documento_id in self._posicoes])
+            novas = self._vetorizar([texto for _, texto in documentos])
+            for documento_id, _ in documentos:
+                self._posicoes[documento_id] = len(self.ids) + len(self._ids_novos)
+                self._ids_novos.append(documento_id)
+            self._frequencias_novas = sparse.vstack([self._frequencias_novas, novas], format='csr')
+            self._ponderada_nova = sparse.vstack([self._ponderada_nova, self._ponderar(novas)], format='csr')
+            self.alterado = True
+            self._consolidar_se_preciso()
+
+    def remover(self, documento_ids):
+        with self._trava:
+            posicoes = [self._posicoes.pop(documento_id) for documento_id in documento_ids if documento_id in self._posicoes]
+            if not posicoes:
+                return
+            self._removidas.update(posicoes)
+            self.alterado = True
+            self._consolidar_se_preciso()
+
+    def _id(self, posicao):
+        return int(self.ids[posicao]) if posicao < len(self.ids) else self._ids_novos[posicao - len(self.ids)]
+
+    def _linhas(self, posicoes):
+        sparse = importar('scipy.sparse')
+        principal = len(self.ids)
+        return sparse.vstack([
+            self._ponderada[posicao] if posicao < principal else self._ponderada_nova[posicao - principal]
+            for posicao in posicoes
+        ], format='csr')
+
+    # Pontuação das consultas contra todas as posições (principal e novas); excluídas valem -1
+    def _pontuar(self, consultas):
+        np = importar('numpy')
+        pontuacoes = np.hstack([(consultas @ self._ponderada.T).toarray(), (consultas @ self._ponderada_nova.T).toarray()])
+        if self._removidas:
+            pontuacoes[:, list(self._removidas)] = -1
+        return pontuacoes
+
+    # Os k documentos mais parecidos com cada um dos informados, calculados em um único
+    # produto de matrizes: {id: [(id_similar, pontuação), ...]}
+    def similares(self, documento_ids, k=10):
+        np = importar('numpy')
+        with self._trava:
+            presentes = [documento_id for documento_id in documento_ids if documento_id in self._posicoes]
+            if not presentes:
+                return {}
+            linhas = [self._posicoes[documento_id] for documento_id in presentes]
+            pontuacoes = self._pontuar(self._linhas(linhas))
+            pontuacoes[np.arange(len(linhas)), linhas] = -1  # O próprio documento não conta
+            return {
+                documento_id: self._melhores(pontuacoes[indice], k)
+                for indice, documento_id in enumerate(presentes)
+            }
+
+    # Semelhantes a um texto qualquer (por exemplo, um arquivo ainda não cadastrado)
+    def similares_texto(self, texto, k=10):
+        with self._trava:
+            if not self._posicoes:
+                return []
+            return self._melhores(self._pontuar(self._ponderar(self._vetorizar([texto])))[0], k)
+
+    def _melhores(self, pontuacoes, k):
+        np = importar('numpy')
+        k = min(k, len(pontuacoes))
+        if k <= 0:
+            return []
+        candidatos = np.argpartition(-pontuacoes, k - 1)[:k]
+        candidatos = candidatos[np.argsort(-pontuacoes[candidatos])]
+        return [(self._id(i), float(pontuacoes[i])) for i in candidatos if pontuacoes[i] > 0]
+
+    # --- Persistência ao lado do banco ---
+
+    def salvar(self):
+        np = importar('numpy')
+        with self._trava:
+            if self._ids_novos or self._removidas:
+                self._consolidar()
+            temporario = self.caminho + ".tmp.npz"
+            np.savez(
+                temporario, ids=self.ids, indptr=self.frequencias.indptr, indices=self.frequencias.indices,
+                dados=self.frequencias.data, df=self.df, dimensao=DIMENSAO
+            )
+            os.replace(temporario, self.caminho)  # Troca atômica: um índice pela metade nunca é lido
+            self.alterado = False
+
+    def carregar(self):
+        np = importar('numpy')
+        sparse = importar('scipy.sparse')
+        if not os.path.exists(self.caminho):
+            return False
+        try:
+            with np.load(self.caminho) as arquivo:
+                if int(arquivo['dimensao']) != DIMENSAO:
+                    return False
+                ids = arquivo['ids']
+                frequencias = sparse.csr_matrix(
+                    (arquivo['dados'], arquivo['indices'], arquivo['indptr']), shape=(len(ids), DIMENSAO)
+                )
+        except Exception as e:
+            print(f"Índice de similares descartado ({e}); será reconstruído.")
+            return False
+        with self._trava:
+            self.ids, self.frequencias = ids, frequencias
+            self._ids_novos, self._removidas = [], set()
+            self._consolidar()
+            self.alterado = False
+        return True
+
+    # Inclui os documentos que faltam no índice e retira os excluídos do banco
+    def sincronizar(self, tamanho_lote=500):
+        conn = conectar(self.caminho_banco)
+        try:
+            no_banco = {linha[0] for linha in conn.execute("SELECT id FROM documentos")}
+            faltantes = sorted(no_banco - self._posicoes.keys())
+            self.remover([documento_id for documento_id in self._posicoes if documento_id not in no_banco])
+            for inicio in range(0, len(faltantes), tamanho_lote):
+                lote = faltantes[inicio:inicio + tamanho_lote]
+                linhas = conn.execute(
+                    f"{CONSULTA_CONTEUDO} WHERE d.id IN ({', '.join('?' for _ in lote)})", lote
+                ).fetchall()
+                self.adicionar(
+                    (documento_id, conteudo_indexado(titulo, resumo, descomprimir(texto) if texto else None))
+                    for documento_id, titulo, resumo, texto in linhas
+                )
+        finally:
+            conn.close()
+
+    # Reindexa documentos cujo título, resumo ou texto mudaram
+    def atualizar(self, documento_ids):
+        documento_ids = list(documento_ids)
+        if not documento_ids:
+            return
+        conn = conectar(self.caminho_banco)
+        try:
+            linhas = conn.execute(
+                f"{CONSULTA_CONTEUDO} WHERE d.id IN ({', '.join('?' for _ in documento_ids)})", documento_ids
+            ).fetchall()
+        finally:
+            conn.close()
+        self.adicionar(
+            (documento_id, conteudo_indexado(titulo, resumo, descomprimir(texto) if texto else None))
+            for documento_id, titulo, resumo, texto in linhas
+        )
+
+def abrir_indice(caminho_banco=None):
+    indice = IndiceSimilares(caminho_banco)
+    indice.carregar()
+    indice.sincronizar()
+    if indice.alterado:
+        indice.salvar()
+    return indice
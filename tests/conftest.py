@@ -0,0 +1,11 @@
+import pytest
+
+from utils import conectar, aplicar_migracoes
+
+# Banco temporário com todas as migrações aplicadas
+@pytest.fixture
+def banco(tmp_path):
+    conn = conectar(str(tmp_path / "pj_docs.db"))
+    aplicar_migracoes(conn)
+    yield conn
+    conn.close()
@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+import cli
+import lote
+import utils
+import remessas
+import importacao
+
+@pytest.fixture(autouse=True)
+def banco_padrao(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "CAMINHO_BANCO", str(tmp_path / "dados" / "pj_docs.db"))
+
+def falhar(*args, **kwargs):
+    raise RuntimeError("Circuito aberto: serviço de IA indisponível")
+
+@pytest.mark.parametrize("argv, modulo, funcao", [
+    (["ingerir", "0001/2025", "pasta"], lote, "processar_lote"),
+    (["refazer"], lote, "refazer_resumos"),
+    (["importar", "documentos.csv"], importacao, "importar_arquivo"),
+    (["remessa", "repetir"], remessas, "repetir_falhas"),
+])
+def test_erro_vira_evento_de_falha(capsys, monkeypatch, argv, modulo, funcao):
+    monkeypatch.setattr(modulo, funcao, falhar)
+
+    assert cli.main(argv) == 2
+
+    eventos = [json.loads(linha) for linha in capsys.readouterr().out.splitlines()]
+    assert eventos[-1]["evento"] == "falha" and "Circuito aberto" in eventos[-1]["erro"]
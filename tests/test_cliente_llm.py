@@ -0,0 +1,161 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import cliente_llm
+from cliente_llm import BaldeFichas, Disjuntor, CircuitoAberto, RespostaInvalida, carregar_json, espera_backoff
+
+class Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(time, "monotonic", relogio)
+    return relogio
+
+# --- Balde de fichas ---
+
+def test_balde_sem_limite_nao_espera():
+    balde = BaldeFichas(0)
+    assert all(balde.reservar(1000) == 0.0 for _ in range(10))
+
+def test_balde_informa_a_espera_e_repoe_as_fichas(relogio):
+    balde = BaldeFichas(60)  # Uma ficha por segundo
+    assert balde.reservar(60) == 0.0
+    assert balde.reservar(1) == pytest.approx(1.0)
+    assert balde.reservar(2) == pytest.approx(3.0)  # O saldo negativo acumula
+
+    relogio.agora += 13.0  # Repõe 13 fichas: saldo 10
+    assert balde.reservar(10) == 0.0
+    relogio.agora += 1000.0  # Nunca passa da capacidade
+    assert balde.reservar(60) == 0.0
+    assert balde.reservar(1) == pytest.approx(1.0)
+
+def test_balde_pedido_maior_que_o_limite_passa_sozinho(relogio):
+    balde = BaldeFichas(60)
+    assert balde.reservar(500) == 0.0
+    assert balde.reservar(1) == pytest.approx(1.0)
+
+# --- Disjuntor ---
+
+def test_disjuntor_abre_testa_e_fecha(relogio):
+    disjuntor = Disjuntor(falhas_para_abrir=3, segundos_aberto=30)
+    for _ in range(2):
+        disjuntor.falha()
+    assert disjuntor.estado == "fechado"
+    disjuntor.permitir()
+
+    disjuntor.falha()
+    assert disjuntor.estado == "aberto"
+    with pytest.raises(CircuitoAberto):
+        disjuntor.permitir()
+
+    relogio.agora += 30
+    assert disjuntor.estado == "meio-aberto"
+    disjuntor.permitir()  # Chamada de teste
+    with pytest.raises(CircuitoAberto):
+        disjuntor.permitir()  # As demais são recusadas enquanto ela não termina
+
+    disjuntor.sucesso()
+    assert disjuntor.estado == "fechado"
+    disjuntor.permitir()
+
+def test_disjuntor_falha_no_teste_reabre(relogio):
+    disjuntor = Disjuntor(falhas_para_abrir=1, segundos_aberto=30)
+    disjuntor.falha()
+    relogio.agora += 30
+    disjuntor.permitir()
+    disjuntor.falha()
+    assert disjuntor.estado == "aberto"
+    relogio.agora += 29
+    with pytest.raises(CircuitoAberto):
+        disjuntor.permitir()
+
+# --- Espera entre tentativas ---
+
+def test_espera_backoff_aleatoria_e_limitada(monkeypatch):
+    monkeypatch.setattr(cliente_llm.random, "uniform", lambda inicio, fim: fim)
+    assert [espera_backoff(tentativa) for tentativa in range(3)] == [1.0, 2.0, 4.0]
+    assert espera_backoff(20) == cliente_llm.ESPERA_MAXIMA
+
+    monkeypatch.setattr(cliente_llm.random, "uniform", lambda inicio, fim: inicio)
+    assert espera_backoff(5) == 0.0
+
+def test_espera_backoff_respeita_retry_after(monkeypatch):
+    monkeypatch.setattr(cliente_llm.random, "uniform", lambda inicio, fim: fim)
+    erro = SimpleNamespace(litellm_response_headers={"retry-after": "12"})
+    assert espera_backoff(0, erro) == 12.0
+    assert espera_backoff(5, erro) == 32.0  # A espera exponencial, se maior, prevalece
+    erro.litellm_response_headers = {"retry-after": "Wed, 21 Oct 2026 07:28:00 GMT"}
+    assert espera_backoff(0, erro) == 1.0
+
+# --- Reparo de JSON ---
+
+@pytest.mark.parametrize("conteudo", [
+    '{"assunto": "Laudo", "resumo": "Texto"}',
+    '```json\n{"assunto": "Laudo", "resumo": "Texto"}\n```',
+    'Segue o resultado: {"assunto": "Laudo", "resumo": "Texto"} Espero ter ajudado.',
+    '{"assunto": "Laudo", "resumo": "Texto",}',
+])
+def test_carregar_json_repara_respostas_comuns(conteudo):
+    assert carregar_json(conteudo) == {"assunto": "Laudo", "resumo": "Texto"}
+
+@pytest.mark.parametrize("conteudo", ["Não consegui resumir o documento.", "", None, '{"assunto": '])
+def test_carregar_json_sem_conserto(conteudo):
+    with pytest.raises(RespostaInvalida):
+        carregar_json(conteudo)
+
+# --- Novas tentativas ---
+
+class ErroServico(Exception):
+    pass
+
+@pytest.fixture
+def litellm_falso(monkeypatch):
+    respostas = []
+
+    def completion(**kwargs):
+        resposta = respostas.pop(0)
+        if isinstance(resposta, Exception):
+            raise resposta
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=resposta))])
+
+    litellm = SimpleNamespace(
+        completion=completion,
+        **dict.fromkeys(("RateLimitError", "Timeout", "APIConnectionError", "ServiceUnavailableError",
+                         "InternalServerError", "BadGatewayError"), ErroServico)
+    )
+    monkeypatch.setattr(cliente_llm, "importar", lambda nome: litellm)
+    monkeypatch.setattr(cliente_llm, "configurar_sessao", lambda: None)
+    monkeypatch.setattr(cliente_llm, "_tokens_estimados", lambda kwargs: 0)
+    monkeypatch.setattr(cliente_llm, "disjuntor", Disjuntor(falhas_para_abrir=2))
+    monkeypatch.setattr(cliente_llm, "max_tentativas_llm", 4)
+    monkeypatch.setattr(time, "sleep", lambda segundos: None)
+    return respostas
+
+def validar(resultado):
+    return carregar_json(resultado.choices[0].message.content)
+
+def test_resposta_invalida_e_repetida_sem_abrir_o_disjuntor(litellm_falso):
+    litellm_falso.extend(["sem JSON", "sem JSON", "sem JSON", '{"assunto": "Laudo"}'])
+    valor, _, tentativas = cliente_llm.completar(validar=validar, model="gpt-4o-mini", messages=[])
+    assert valor == {"assunto": "Laudo"}
+    assert tentativas == 4
+    assert cliente_llm.disjuntor.estado == "fechado"
+
+def test_falhas_do_servico_abrem_o_disjuntor(litellm_falso):
+    litellm_falso.extend([ErroServico("503"), ErroServico("503"), '{"assunto": "Laudo"}'])
+    with pytest.raises(CircuitoAberto):
+        cliente_llm.completar(validar=validar, model="gpt-4o-mini", messages=[])
+    assert cliente_llm.disjuntor.estado == "aberto"
+
+def test_ultima_tentativa_repassa_o_erro(litellm_falso):
+    litellm_falso.extend(["sem JSON"] * 4)
+    with pytest.raises(RespostaInvalida):
+        cliente_llm.completar(validar=validar, model="gpt-4o-mini", messages=[])
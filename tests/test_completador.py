@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PySide6.QtWidgets")
+from PySide6.QtSql import QSqlDatabase, QSqlQuery
+
+from completador import CompletadorProcedimentos
+
+@pytest.fixture
+def banco_qt(tmp_path):
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    db = QSqlDatabase.addDatabase("QSQLITE", "teste_completador")
+    db.setDatabaseName(str(tmp_path / "procedimentos.db"))
+    assert db.open()
+    yield db
+    db.close()
+    del db
+    QSqlDatabase.removeDatabase("teste_completador")
+    app.processEvents()
+
+def test_falha_na_consulta_nao_e_guardada(banco_qt):
+    completador = CompletadorProcedimentos(banco_qt)
+    # Sem a tabela procedimentos, a consulta falha
+    assert completador.buscar("00") == []
+    assert completador.recentes() == []
+    assert not completador.existe("0001/2025")
+
+    consulta = QSqlQuery(banco_qt)
+    assert consulta.exec("CREATE TABLE procedimentos (id INTEGER PRIMARY KEY, numero TEXT UNIQUE)")
+    assert consulta.exec("INSERT INTO procedimentos (numero) VALUES ('0001/2025')")
+    del consulta
+    assert completador.buscar("00") == ["0001/2025"]
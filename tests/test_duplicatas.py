@@ -0,0 +1,24 @@
+import numpy as np
+
+from duplicatas import (
+    NUM_PERMUTACOES, assinatura_minhash, baldes_lsh, buscar_quase_duplicata,
+    consulta_candidatos, registrar_assinatura,
+)
+
+TEXTO = " ".join(f"palavra{i}" for i in range(200))
+
+def test_candidatos_buscam_cada_faixa_pela_chave(banco):
+    sql, parametros = consulta_candidatos(baldes_lsh(np.zeros(NUM_PERMUTACOES, dtype=np.uint32)))
+    detalhes = [linha[3] for linha in banco.execute(f"EXPLAIN QUERY PLAN {sql}", parametros)]
+    buscas = [detalhe for detalhe in detalhes if detalhe.startswith("SEARCH faixas_lsh ")]
+    assert buscas and all("(faixa=? AND balde=?)" in detalhe for detalhe in buscas), detalhes
+    assert not any(detalhe.startswith("SCAN faixas_lsh") for detalhe in detalhes), detalhes
+
+def test_encontra_quase_duplicata(banco):
+    banco.execute("INSERT INTO documentos (titulo) VALUES ('Original')")
+    documento_id = banco.execute("SELECT id FROM documentos").fetchone()[0]
+    registrar_assinatura(documento_id, assinatura_minhash(TEXTO), conn=banco)
+
+    encontrado = buscar_quase_duplicata(assinatura_minhash(TEXTO + " carimbo"), conn=banco)
+    assert encontrado and encontrado["id"] == documento_id
+    assert buscar_quase_duplicata(assinatura_minhash("outro assunto inteiramente diverso " * 20), conn=banco) is None
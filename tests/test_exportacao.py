@@ -0,0 +1,103 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import exportacao
+from exportacao import exportar_relatorio_sql, EscritorDocx
+
+@pytest.fixture
+def caminho_banco(banco, tmp_path):
+    banco.execute("INSERT INTO documentos (titulo, resumo, procedimento) VALUES ('Laudo', 'Resumo do laudo', '0001/2025')")
+    banco.commit()
+    return str(tmp_path / "pj_docs.db")
+
+def test_exporta_csv(caminho_banco, tmp_path):
+    caminho = exportar_relatorio_sql(formato="csv", pasta=str(tmp_path), caminho_banco=caminho_banco)
+    assert caminho == str(tmp_path / "relatorio_pj_docs.csv")
+    with open(caminho, encoding="utf-8-sig") as arquivo:
+        assert "Laudo" in arquivo.read()
+    assert not os.path.exists(f"{caminho}.parcial")
+
+def test_sem_registros_retorna_none(caminho_banco, tmp_path):
+    assert exportar_relatorio_sql("procedimento = ?", ["9999/2025"], "csv", str(tmp_path), caminho_banco) is None
+
+def test_erro_e_repassado_sem_arquivo_parcial(caminho_banco, tmp_path, monkeypatch):
+    anterior = tmp_path / "relatorio_pj_docs.csv"
+    anterior.write_text("relatório anterior", encoding="utf-8")
+
+    def falhar(self, item):
+        raise OSError("disco cheio")
+    monkeypatch.setattr(exportacao.EscritorCsv, "escrever_documento", falhar)
+
+    with pytest.raises(OSError, match="disco cheio"):
+        exportar_relatorio_sql(formato="csv", pasta=str(tmp_path), caminho_banco=caminho_banco)
+    assert not (tmp_path / "relatorio_pj_docs.csv.parcial").exists()
+    assert anterior.read_text(encoding="utf-8") == "relatório anterior"
+
+# --- DOCX em seções reaproveitadas ---
+
+def textos_docx(caminho):
+    import docx
+    return [paragrafo.text for paragrafo in docx.Document(caminho).paragraphs]
+
+@pytest.fixture
+def secoes_montadas(monkeypatch):
+    montadas = []
+    original = exportacao.montar_secoes
+
+    def montar_secoes(secoes):
+        montadas.extend(procedimento for procedimento, _ in secoes)
+        return original(secoes)
+    monkeypatch.setattr(exportacao, "montar_secoes", montar_secoes)
+    return montadas
+
+def test_docx_remonta_apenas_as_secoes_alteradas(banco, tmp_path, secoes_montadas):
+    caminho_banco = str(tmp_path / "pj_docs.db")
+    for numero in ("0001/2025", "0002/2025", "0003/2025"):
+        banco.execute("INSERT INTO documentos (titulo, resumo, procedimento, data_criacao) VALUES (?, ?, ?, '2025-03-10')",
+                      (f"Laudo {numero}", f"Resumo de {numero}", numero))
+    banco.commit()
+
+    caminho = exportar_relatorio_sql(formato="docx", pasta=str(tmp_path), caminho_banco=caminho_banco)
+    assert secoes_montadas == ["0001/2025", "0002/2025", "0003/2025"]
+    primeira = textos_docx(caminho)
+
+    secoes_montadas.clear()
+    exportar_relatorio_sql(formato="docx", pasta=str(tmp_path), caminho_banco=caminho_banco)
+    assert secoes_montadas == []
+    assert textos_docx(caminho) == primeira
+
+    banco.execute("UPDATE documentos SET resumo = 'Resumo corrigido' WHERE procedimento = '0002/2025'")
+    banco.commit()
+    exportar_relatorio_sql(formato="docx", pasta=str(tmp_path), caminho_banco=caminho_banco)
+    assert secoes_montadas == ["0002/2025"]
+    textos = textos_docx(caminho)
+    assert any("Resumo corrigido" in texto for texto in textos)
+    assert not any("Resumo de 0002/2025" in texto for texto in textos)
+    inalteradas = lambda textos: [texto for texto in textos if "0001/2025" in texto or "0003/2025" in texto]
+    assert inalteradas(textos) == inalteradas(primeira)
+
+def test_docx_monta_as_secoes_durante_a_leitura(banco, tmp_path, secoes_montadas, monkeypatch):
+    monkeypatch.setattr(exportacao, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(exportacao, "SECOES_POR_CONSULTA", 4)
+    monkeypatch.setattr(exportacao, "SECOES_POR_MONTAGEM", 4)
+    monkeypatch.setattr(exportacao, "SECOES_POR_TAREFA", 2)
+    monkeypatch.setattr(exportacao, "MAX_DOCUMENTOS_RETIDOS", 6)
+    escritor = EscritorDocx(str(tmp_path / "relatorio.docx"), str(tmp_path / "pj_docs.db"), max_processos=1)
+
+    for indice in range(20):
+        escritor.iniciar_procedimento(f"{indice:04d}/2025")
+        for documento in range(2):
+            escritor.escrever_documento({"data": "2025-03-10", "titulo": f"Documento {indice}.{documento}", "resumo": "Teor"})
+        escritor.finalizar_procedimento()
+        # Nunca mais que MAX_DOCUMENTOS_RETIDOS documentos à espera
+        assert escritor._retidos < 6 and sum(len(documentos) for _, documentos in escritor.montar.values()) < 6
+        assert len(escritor._tarefas) <= 2
+    gravadas = banco.execute("SELECT COUNT(*) FROM fragmentos_relatorio").fetchone()[0]
+    assert gravadas >= 12  # Montadas e gravadas antes do fechamento
+
+    escritor.fechar()
+    assert sorted(secoes_montadas) == [f"{indice:04d}/2025" for indice in range(20)]
+    titulos = [texto for texto in textos_docx(str(tmp_path / "relatorio.docx")) if "Documento " in texto]
+    assert [titulo.rsplit("Documento ", 1)[1] for titulo in titulos] == [f"{indice}.{documento}" for indice in range(20) for documento in range(2)]
@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+import extratores
+from utils import NormalizadorTexto, limpar_texto, normalizar_trechos
+
+TEXTOS = [
+    "  Petição \t inicial \n\n  com  pedido\t\tde tutela  \n urgência \t",
+    "linha única sem quebras " * 50,
+    "a \t\n\t b\n \n\tc  d\t \te",
+    "\n\n   \t\n",
+]
+
+def dividir(texto, tamanhos):
+    trechos, inicio = [], 0
+    for tamanho in tamanhos:
+        trechos.append(texto[inicio:inicio + tamanho])
+        inicio += tamanho
+    return trechos + [texto[inicio:]]
+
+@pytest.mark.parametrize("texto", TEXTOS)
+@pytest.mark.parametrize("tamanho", [1, 2, 3, 7])
+def test_normalizacao_em_trechos_igual_a_de_uma_vez(texto, tamanho):
+    trechos = [texto[inicio:inicio + tamanho] for inicio in range(0, len(texto), tamanho)]
+    assert "\n".join(normalizar_trechos(trechos)) == limpar_texto(texto)
+
+def test_normalizacao_com_divisas_aleatorias():
+    aleatorio = random.Random(7)
+    for _ in range(200):
+        texto = "".join(aleatorio.choice("ab  \t\t\n") for _ in range(aleatorio.randint(0, 60)))
+        tamanhos = [aleatorio.randint(0, 5) for _ in range(aleatorio.randint(0, 15))]
+        assert "\n".join(normalizar_trechos(dividir(texto, tamanhos))) == limpar_texto(texto), repr(texto)
+
+def test_linha_longa_nao_e_reprocessada():
+    normalizador = NormalizadorTexto()
+    for _ in range(1000):
+        assert list(normalizador.alimentar("palavra  ")) == []
+    assert len(normalizador._pendente) == 1000
+    assert list(normalizador.finalizar()) == [" ".join(["palavra"] * 1000)]
+
+RTF = (r"{\rtf1\ansi{\fonttbl{\f0 Arial;}}{\colortbl;\red0\green0\blue0;}"
+       r"\f0 Peti\'e7\'e3o inicial\par Pedido de tutela \u8212? urg\u234?ncia\par "
+       r"{\*\generator Teste;}Conclus\'e3o \{final\}\par}")
+
+def test_rtf_em_trechos_pequenos_igual_ao_arquivo_inteiro(tmp_path, monkeypatch):
+    caminho = tmp_path / "documento.rtf"
+    caminho.write_text(RTF * 20, encoding="latin-1")
+    inteiro = "".join(extratores.extrair_rtf(str(caminho)))
+    monkeypatch.setattr(extratores, "TAMANHO_TRECHO", 5)
+    assert "".join(extratores.extrair_rtf(str(caminho))) == inteiro
+    assert inteiro.startswith("Petição inicial\nPedido de tutela — urgência\nConclusão {final}\n")
+
+def test_eml_acima_do_limite_e_recusado(tmp_path, monkeypatch):
+    caminho = tmp_path / "mensagem.eml"
+    caminho.write_bytes(b"Subject: Teste\r\n\r\nCorpo da mensagem.\r\n")
+    assert "Assunto: Teste\n" in list(extratores.extrair_eml(str(caminho)))
+    monkeypatch.setattr(extratores, "MAX_BYTES_EML", 10)
+    with pytest.raises(ValueError, match="excede o limite"):
+        list(extratores.extrair_eml(str(caminho)))
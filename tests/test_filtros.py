@@ -0,0 +1,27 @@
+from datetime import date
+
+import pytest
+
+from filtros import FiltroDocumentos, plano_de_consulta, usa_indice
+
+FILTROS_INDEXADOS = {
+    "procedimento": FiltroDocumentos(procedimentos=["0001/2025"]),
+    "procedimentos_e_data": FiltroDocumentos(procedimentos=["0001/2025", "0002/2025"], data_inicio=date(2025, 1, 1)),
+    "periodo": FiltroDocumentos(data_inicio=date(2025, 1, 1), data_fim=date(2025, 12, 31)),
+    "titulo": FiltroDocumentos(texto_titulo="laudo"),
+}
+
+@pytest.mark.parametrize("filtro", FILTROS_INDEXADOS.values(), ids=FILTROS_INDEXADOS.keys())
+def test_filtros_buscam_pelo_indice(banco, filtro):
+    detalhes = plano_de_consulta(banco, filtro)
+    assert any(detalhe.startswith("SEARCH documentos ") for detalhe in detalhes), detalhes
+    assert not any(detalhe.startswith("SCAN documentos ") or detalhe == "SCAN documentos" for detalhe in detalhes), detalhes
+    assert usa_indice(banco, filtro)
+
+def test_procedimento_usa_indice_composto(banco):
+    detalhes = plano_de_consulta(banco, FILTROS_INDEXADOS["procedimentos_e_data"])
+    assert any("idx_documentos_procedimento_data" in detalhe for detalhe in detalhes), detalhes
+
+def test_filtro_vazio_e_varredura_completa(banco):
+    # Sem critérios, o plano percorre o índice inteiro (SCAN ... USING COVERING INDEX)
+    assert not usa_indice(banco, FiltroDocumentos())
@@ -0,0 +1,83 @@
+import pytest
+
+from importacao import importar_arquivo, detectar_tipo, detectar_codificacao, OBJETOS_ADIADOS
+
+@pytest.fixture
+def caminho_banco(banco, tmp_path):
+    banco.execute("INSERT INTO procedimentos (numero) VALUES ('0001/2025')")
+    banco.commit()
+    return str(tmp_path / "pj_docs.db")
+
+def escrever(tmp_path, nome, conteudo, encoding="utf-8"):
+    caminho = tmp_path / nome
+    caminho.write_text(conteudo, encoding=encoding)
+    return str(caminho)
+
+@pytest.mark.parametrize("delimitador", [";", ","])
+def test_detecta_delimitador_e_tipo(tmp_path, caminho_banco, banco, delimitador):
+    documentos = escrever(tmp_path, "documentos.csv", delimitador.join(["procedimento", "data", "titulo", "resumo"]) + "\n"
+                          + delimitador.join(["0001/2025", "10/03/2025", "Laudo", "Resumo do laudo"]) + "\n")
+    procedimentos = escrever(tmp_path, "procedimentos.csv", f"Número{delimitador}Descrição\n0002/2025{delimitador}Obra\n")
+    assert detectar_tipo(documentos) == "documentos"
+    assert detectar_tipo(procedimentos) == "procedimentos"
+
+    assert importar_arquivo(documentos, caminho_banco=caminho_banco)["inseridos"] == 1
+    assert importar_arquivo(procedimentos, caminho_banco=caminho_banco)["inseridos"] == 1
+    assert banco.execute("SELECT data_criacao, titulo FROM documentos").fetchall() == [("2025-03-10", "Laudo")]
+    assert banco.execute("SELECT descricao FROM procedimentos WHERE numero = '0002/2025'").fetchone() == ("Obra",)
+
+def test_linhas_invalidas_vao_para_o_relatorio(tmp_path, caminho_banco):
+    caminho = escrever(tmp_path, "documentos.csv", (
+        "procedimento;data;titulo;resumo\n"
+        "0001/2025;2025-03-10;Laudo;Resumo\n"
+        "0001/2025;2025-03-10;;Sem título\n"
+        "9999/2025;2025-03-10;Ofício;Procedimento inexistente\n"
+        "0001/2025;31/02/2025;Parecer;Data inválida\n"
+    ))
+    resumo = importar_arquivo(caminho, caminho_banco=caminho_banco)
+
+    assert (resumo["lidas"], resumo["inseridos"], resumo["rejeitados"]) == (4, 1, 3)
+    with open(resumo["relatorio"], encoding="utf-8-sig") as relatorio:
+        conteudo = relatorio.read()
+    for motivo in ("título ausente", "procedimento não cadastrado: 9999/2025", "data inválida: 31/02/2025"):
+        assert motivo in conteudo
+
+def test_reimportar_conta_inclusoes_e_atualizacoes(tmp_path, caminho_banco):
+    caminho = escrever(tmp_path, "procedimentos.csv", "numero;descricao\n0001/2025;Reforma\n0002/2025;Obra\n0003/2025;\n")
+    resumo = importar_arquivo(caminho, caminho_banco=caminho_banco)
+    assert (resumo["inseridos"], resumo["atualizados"], resumo["ignorados"]) == (2, 1, 0)
+
+    resumo = importar_arquivo(caminho, caminho_banco=caminho_banco)
+    assert (resumo["inseridos"], resumo["atualizados"], resumo["ignorados"]) == (0, 0, 3)
+
+    caminho = escrever(tmp_path, "procedimentos.csv", "numero;descricao\n0002/2025;Obra nova\n0003/2025;\n")
+    resumo = importar_arquivo(caminho, caminho_banco=caminho_banco)
+    assert (resumo["inseridos"], resumo["atualizados"], resumo["ignorados"]) == (0, 1, 1)
+
+def test_csv_do_excel_em_cp1252(tmp_path, caminho_banco, banco):
+    caminho = escrever(tmp_path, "documentos.csv", "procedimento;data;titulo;resumo\n0001/2025;2025-03-10;Petição;Ação de cobrança\n",
+                       encoding="cp1252")
+    assert detectar_codificacao(caminho) == "cp1252"
+    assert importar_arquivo(caminho, caminho_banco=caminho_banco)["inseridos"] == 1
+    assert banco.execute("SELECT titulo, resumo FROM documentos").fetchone() == ("Petição", "Ação de cobrança")
+
+def test_csv_malformado_e_informado(tmp_path, caminho_banco):
+    caminho = escrever(tmp_path, "documentos.csv", 'procedimento;data;titulo;resumo\n0001/2025;2025-03-10;Laudo;"' + "x" * 200000 + '"\n')
+    with pytest.raises(ValueError, match="CSV inválido na linha"):
+        importar_arquivo(caminho, caminho_banco=caminho_banco)
+
+def test_carga_grande_refaz_indices_e_busca(tmp_path, caminho_banco, banco):
+    linhas = "".join(f"0001/2025;2025-03-{dia:02d};Laudo {dia};Vistoria da obra\n" for dia in range(1, 29))
+    caminho = escrever(tmp_path, "documentos.csv", "procedimento;data;titulo;resumo\n" + linhas)
+
+    resumo = importar_arquivo(caminho, caminho_banco=caminho_banco, tamanho_bloco=10, adiar_indices=True)
+
+    assert resumo["inseridos"] == 28
+    objetos = {nome for nome, in banco.execute("SELECT name FROM sqlite_master")}
+    assert set(OBJETOS_ADIADOS) <= objetos
+    assert banco.execute("SELECT COUNT(*) FROM documentos_fts WHERE documentos_fts MATCH 'vistoria'").fetchone()[0] == 28
+
+    # O gatilho restaurado volta a indexar as inclusões seguintes
+    banco.execute("INSERT INTO documentos (titulo, resumo) VALUES ('Ofício', 'Vistoria extra')")
+    banco.commit()
+    assert banco.execute("SELECT COUNT(*) FROM documentos_fts WHERE documentos_fts MATCH 'vistoria'").fetchone()[0] == 29
@@ -0,0 +1,53 @@
+import pytest
+
+import lote
+import utils
+
+@pytest.fixture
+def arquivos(tmp_path):
+    legivel = tmp_path / "peticao.txt"
+    legivel.write_text("Petição inicial com pedido de tutela de urgência.", encoding="utf-8")
+    corrompido = tmp_path / "corrompido.pdf"
+    corrompido.write_bytes(b"isto nao e um PDF")
+    return [str(legivel), str(corrompido)]
+
+@pytest.mark.parametrize("max_processos", [1, 2])
+def test_arquivo_ilegivel_vira_falha_do_proprio_arquivo(arquivos, max_processos):
+    textos, tempos, erros = lote.extrair_textos(arquivos, max_processos)
+    assert "tutela de urgência" in textos[0] and erros[0] is None and tempos[0] is not None
+    assert textos[1] == "" and erros[1].startswith("Não foi possível ler o arquivo (")
+
+def test_lote_registra_os_legiveis_e_devolve_as_falhas(banco, tmp_path, arquivos, monkeypatch):
+    monkeypatch.setattr(utils, "CAMINHO_BANCO", str(tmp_path / "pj_docs.db"))
+    analisados = []
+
+    def analisar(textos, *args):
+        analisados.extend(textos)
+        return [("Petição", "Resumo da petição.") for _ in textos]
+    monkeypatch.setattr(lote, "analisar_textos", analisar)
+
+    inseridos, falhas = lote.processar_lote(arquivos, None)
+
+    assert inseridos == 1 and len(analisados) == 1
+    assert [arquivo for arquivo, _ in falhas] == [arquivos[1]]
+    assert banco.execute("SELECT titulo FROM documentos").fetchall() == [("Petição",)]
+
+def test_analise_usa_o_cache_fora_do_laco_de_eventos(banco, tmp_path, monkeypatch):
+    import threading
+    monkeypatch.setattr(utils, "CAMINHO_BANCO", str(tmp_path / "pj_docs.db"))
+    principal = threading.get_ident()
+    threads = []
+    buscar = lote.buscar_no_cache
+
+    def buscar_registrando(chave):
+        threads.append(threading.get_ident())
+        return buscar(chave)
+    monkeypatch.setattr(lote, "buscar_no_cache", buscar_registrando)
+
+    async def analisar(texto, *args):
+        return ("Petição", "Resumo da petição.")
+    monkeypatch.setattr(lote, "analisar_conteudo_async", analisar)
+
+    assert lote.analisar_textos(["texto um", "texto dois"], 2) == [("Petição", "Resumo da petição.")] * 2
+    assert lote.analisar_textos(["texto um"], 2) == [("Petição", "Resumo da petição.")]  # Do cache
+    assert threads and principal not in threads
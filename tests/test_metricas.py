@@ -0,0 +1,46 @@
+import pytest
+
+import utils
+from metricas import MedicaoChamada, percentis, resumo_metricas
+
+def test_percentis():
+    assert percentis([]) == {50: None, 90: None, 99: None}
+    assert percentis([None, 7.0]) == {50: 7.0, 90: 7.0, 99: 7.0}
+    valores = percentis(range(1, 102))
+    assert (valores[50], valores[90], valores[99]) == (51, 91, 100)
+
+def inserir(banco, operacao, modelo, latencia, criado_em="now", **campos):
+    banco.execute("""
+        INSERT INTO metricas_llm (criado_em, operacao, modelo, latencia_ms, extracao_ms, tokens_prompt,
+                                  tokens_resposta, custo, tentativas, erro)
+        VALUES (datetime(?), ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (criado_em, operacao, modelo, latencia, campos.get("extracao"), campos.get("prompt"),
+          campos.get("resposta"), campos.get("custo"), campos.get("tentativas", 1), campos.get("erro")))
+    banco.commit()
+
+def test_resumo_por_operacao_e_modelo(banco, tmp_path):
+    inserir(banco, "resumo", "gpt-4o-mini", 100.0, extracao=10.0, prompt=1000, resposta=200, custo=0.001)
+    inserir(banco, "resumo", "gpt-4o-mini", 300.0, extracao=30.0, prompt=500, resposta=100, custo=0.002, tentativas=3)
+    inserir(banco, "resumo", "gpt-4o-mini", 900.0, tentativas=2, erro="Timeout")
+    inserir(banco, "fragmento", "gpt-4o-mini", 50.0)
+    inserir(banco, "resumo", "gpt-4o-mini", 9999.0, criado_em="-40 days")  # Fora do período
+
+    resumo = {grupo["operacao"]: grupo for grupo in resumo_metricas(30, str(tmp_path / "pj_docs.db"))}
+
+    assert set(resumo) == {"resumo", "fragmento"}
+    grupo = resumo["resumo"]
+    assert (grupo["chamadas"], grupo["erros"], grupo["erros_por_classe"]) == (3, 1, {"Timeout": 1})
+    assert (grupo["latencia_p50_ms"], grupo["extracao_p50_ms"]) == (300.0, 20.0)
+    assert (grupo["tokens_prompt"], grupo["tokens_resposta"]) == (1500, 300)
+    assert grupo["custo"] == pytest.approx(0.003)
+    assert grupo["tentativas_por_chamada"] == 2.0
+
+def test_medicao_registra_a_classe_do_erro(banco, tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "CAMINHO_BANCO", str(tmp_path / "pj_docs.db"))
+    with pytest.raises(TimeoutError):
+        with MedicaoChamada("resumo", "gpt-4o-mini", extracao_ms=12.5) as medicao:
+            medicao.tentativas = 2
+            raise TimeoutError("tempo esgotado")
+
+    linha = banco.execute("SELECT operacao, extracao_ms, tentativas, erro, latencia_ms FROM metricas_llm").fetchone()
+    assert linha[:4] == ("resumo", 12.5, 2, "TimeoutError") and linha[4] >= 0
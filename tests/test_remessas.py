@@ -0,0 +1,179 @@
+import json
+
+import pytest
+
+import utils
+import remessas
+from textos import guardar_texto
+
+TEXTO = "Petição inicial com pedido de liminar."
+
+@pytest.fixture
+def banco_padrao(banco, tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "CAMINHO_BANCO", str(tmp_path / "pj_docs.db"))
+    monkeypatch.setattr(utils, "modelo", "gpt-4o-mini")
+    banco.execute("INSERT INTO remessas (id, modelo, arquivo) VALUES ('r1', 'modelo', 'r1.jsonl')")
+    banco.commit()
+    return banco
+
+def inserir_item(banco, custom_id, arquivo, chave_texto, estado="falha"):
+    banco.execute(
+        "INSERT INTO itens_remessa (remessa_id, custom_id, arquivo, procedimento, hash_texto, estado) "
+        "VALUES ('r1', ?, ?, '0001/2025', ?, ?)", (custom_id, arquivo, chave_texto, estado)
+    )
+    banco.commit()
+
+def texto_existe(banco, chave_texto):
+    return banco.execute("SELECT 1 FROM textos_originais WHERE hash = ?", (chave_texto,)).fetchone() is not None
+
+def test_texto_de_item_com_falha_sobrevive_a_exclusao_do_documento(banco_padrao):
+    banco = banco_padrao
+    chave_texto = guardar_texto(TEXTO, banco)
+    inserir_item(banco, chave_texto, "a.pdf", chave_texto)
+    banco.execute("INSERT INTO documentos (titulo, hash_texto) VALUES ('Petição', ?)", (chave_texto,))
+    banco.execute("DELETE FROM documentos")
+    banco.commit()
+    assert texto_existe(banco, chave_texto)
+
+    banco.execute("UPDATE itens_remessa SET estado = 'concluido'")
+    banco.execute("INSERT INTO documentos (titulo, hash_texto) VALUES ('Petição', ?)", (chave_texto,))
+    banco.execute("DELETE FROM documentos")
+    banco.commit()
+    assert not texto_existe(banco, chave_texto)
+
+def test_repetir_falhas_ignora_itens_sem_texto(banco_padrao, tmp_path):
+    banco = banco_padrao
+    chave_texto = guardar_texto(TEXTO, banco)
+    inserir_item(banco, chave_texto, "a.pdf", chave_texto)
+    # Texto já excluído (bancos anteriores à migração 10)
+    banco.execute("PRAGMA foreign_keys = OFF")
+    inserir_item(banco, "perdido", "b.pdf", "perdido")
+
+    remessa_id, perdidos = remessas.repetir_falhas(str(tmp_path / "remessas"))
+
+    assert perdidos == [("b.pdf", remessas.ERRO_SEM_TEXTO)]
+    estados = dict(banco.execute("SELECT arquivo, estado FROM itens_remessa WHERE remessa_id = 'r1'"))
+    assert estados == {"a.pdf": "reenviado", "b.pdf": "sem_texto"}
+    arquivo = banco.execute("SELECT arquivo FROM remessas WHERE id = ?", (remessa_id,)).fetchone()[0]
+    with open(arquivo, encoding="utf-8") as entrada:
+        assert [json.loads(linha)["custom_id"] for linha in entrada] == [chave_texto]
+
+# --- Conciliação e acompanhamento ---
+
+def resultado(custom_id, conteudo=None, status=200):
+    if status != 200:
+        return json.dumps({"custom_id": custom_id, "error": None, "response": {
+            "status_code": status, "body": {"error": {"message": "Erro interno"}}}})
+    return json.dumps({"custom_id": custom_id, "error": None, "response": {"status_code": 200, "body": {
+        "choices": [{"message": {"content": conteudo}}],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 10, "prompt_tokens_details": {"cached_tokens": 64}},
+    }}})
+
+RESPOSTA = json.dumps({"assunto": "Petição", "resumo": "Resumo da petição"})
+
+def estados_itens(banco, remessa_id="r1"):
+    return dict(banco.execute("SELECT arquivo, estado FROM itens_remessa WHERE remessa_id = ?", (remessa_id,)))
+
+def test_conciliar_grava_resultados_e_falhas_uma_unica_vez(banco_padrao):
+    banco = banco_padrao
+    for custom_id, arquivo in (("c1", "a.pdf"), ("c1", "a_copia.pdf"), ("c2", "b.pdf"), ("c3", "c.pdf")):
+        inserir_item(banco, custom_id, arquivo, guardar_texto(f"Texto de {custom_id}", banco), estado="pendente")
+    linhas = [resultado("c1", RESPOSTA), "", resultado("c2", status=500), resultado("c3", "isto não é JSON")]
+
+    totais = remessas.conciliar(banco, "r1", "gpt-4o-mini", linhas)
+
+    assert totais == {"concluidos": 2, "falhas": 2, "tokens_prompt": 200, "tokens_cache": 128, "tokens_resposta": 20}
+    assert estados_itens(banco) == {"a.pdf": "concluido", "a_copia.pdf": "concluido", "b.pdf": "falha", "c.pdf": "falha"}
+    erros = dict(banco.execute("SELECT arquivo, erro FROM itens_remessa WHERE estado = 'falha'"))
+    assert erros["b.pdf"] == "Erro interno"
+    assert erros["c.pdf"].startswith("Resposta inválida")
+    assert banco.execute("SELECT COUNT(*) FROM documentos WHERE titulo = 'Petição'").fetchone()[0] == 2
+
+    # Repetir a conciliação (ex.: após uma queda no meio do acompanhamento) não altera nada
+    assert remessas.conciliar(banco, "r1", "gpt-4o-mini", linhas)["concluidos"] == 0
+    assert banco.execute("SELECT COUNT(*) FROM documentos").fetchone()[0] == 2
+
+def preparar_remessa_enviada(banco, tmp_path, endpoint, textos):
+    arquivo = tmp_path / "r2.jsonl"
+    with open(arquivo, "w", encoding="utf-8") as saida:
+        for nome, texto in textos.items():
+            chave_texto = guardar_texto(texto, banco)
+            saida.write(json.dumps(remessas.montar_requisicao(chave_texto, texto, "gpt-4o-mini", None)) + "\n")
+            banco.execute(
+                "INSERT INTO itens_remessa (remessa_id, custom_id, arquivo, hash_texto) VALUES ('r2', ?, ?, ?)",
+                (chave_texto, nome, chave_texto)
+            )
+    banco.execute("INSERT INTO remessas (id, modelo, arquivo, requisicoes) VALUES ('r2', 'gpt-4o-mini', ?, ?)",
+                  (str(arquivo), len(textos)))
+    banco.commit()
+    assert remessas.enviar_remessas(endpoint) == 1
+    return banco.execute("SELECT lote_externo FROM remessas WHERE id = 'r2'").fetchone()[0]
+
+def acompanhar(endpoint):
+    eventos = []
+    remessas.acompanhar_remessas(endpoint, lambda evento, **dados: eventos.append((evento, dados)))
+    return eventos
+
+def test_lote_expirado_marca_itens_sem_resposta_e_repeticao_conclui(banco_padrao, tmp_path):
+    from benchmarks.lotes_simulados import processar_lote, processar_pendentes
+    banco = banco_padrao
+    pasta = str(tmp_path / "simulador")
+    endpoint = remessas.EndpointArquivos(pasta)
+    lote_id = preparar_remessa_enviada(banco, tmp_path, endpoint, {"a.pdf": "Texto A", "b.pdf": "Texto B"})
+
+    processar_lote(pasta, lote_id, taxa_sem_resposta=1.0)
+    eventos = acompanhar(endpoint)
+
+    assert [evento for evento, _ in eventos] == ["reconciliada"]
+    assert eventos[0][1]["estado"] == "expired" and eventos[0][1]["falhas"] == 2
+    assert banco.execute("SELECT estado FROM remessas WHERE id = 'r2'").fetchone()[0] == "expired"
+    assert estados_itens(banco, "r2") == {"a.pdf": "falha", "b.pdf": "falha"}
+    assert {erro for erro, in banco.execute("SELECT erro FROM itens_remessa")} == {"Sem resposta no lote (expired)"}
+
+    nova, perdidos = remessas.repetir_falhas(str(tmp_path / "remessas"))
+    assert perdidos == []
+    assert estados_itens(banco, "r2") == {"a.pdf": "reenviado", "b.pdf": "reenviado"}
+    assert estados_itens(banco, nova) == {"a.pdf": "pendente", "b.pdf": "pendente"}
+    assert remessas.repetir_falhas(str(tmp_path / "remessas")) == (None, [])
+
+    assert remessas.enviar_remessas(endpoint) == 1
+    processar_pendentes(pasta)
+    assert [evento for evento, _ in acompanhar(endpoint)] == ["reconciliada"]
+    assert estados_itens(banco, nova) == {"a.pdf": "concluido", "b.pdf": "concluido"}
+    assert banco.execute("SELECT estado FROM remessas WHERE id = ?", (nova,)).fetchone()[0] == "reconciliada"
+
+class EndpointInstavel(remessas.EndpointArquivos):
+    # Falha na primeira consulta e no primeiro download, como uma queda de rede
+    def __init__(self, pasta):
+        super().__init__(pasta)
+        self.falhas = {"consultar", "baixar"}
+
+    def consultar(self, lote_id):
+        if "consultar" in self.falhas:
+            self.falhas.discard("consultar")
+            raise ConnectionError("sem rede")
+        return super().consultar(lote_id)
+
+    def baixar(self, arquivo_id):
+        if "baixar" in self.falhas:
+            self.falhas.discard("baixar")
+            raise ConnectionError("sem rede")
+        return super().baixar(arquivo_id)
+
+def test_erros_de_rede_mantem_a_remessa_enviada_ate_conseguir(banco_padrao, tmp_path):
+    from benchmarks.lotes_simulados import processar_lote
+    banco = banco_padrao
+    pasta = str(tmp_path / "simulador")
+    endpoint = EndpointInstavel(pasta)
+    lote_id = preparar_remessa_enviada(banco, tmp_path, endpoint, {"a.pdf": "Texto A"})
+    processar_lote(pasta, lote_id)
+
+    for _ in range(2):
+        eventos = acompanhar(endpoint)
+        assert eventos == [("falha", {"remessa": "r2", "erro": "ConnectionError: sem rede"})]
+        assert banco.execute("SELECT estado FROM remessas WHERE id = 'r2'").fetchone()[0] == "enviada"
+        assert estados_itens(banco, "r2") == {"a.pdf": "pendente"}
+
+    eventos = acompanhar(endpoint)
+    assert eventos[0][0] == "reconciliada" and eventos[0][1]["concluidos"] == 1
+    assert estados_itens(banco, "r2") == {"a.pdf": "concluido"}
@@ -0,0 +1,77 @@
+import json
+import asyncio
+
+import pytest
+
+import servico
+from servico import Banco, Servico, gravar_procedimento
+
+TOKEN = "segredo"
+
+@pytest.fixture
+def caminho_banco(banco, tmp_path):
+    return str(tmp_path / "pj_docs.db")
+
+def falhar(conn):
+    raise AttributeError("'list' object has no attribute 'items'")
+
+def test_falha_de_um_pedido_nao_desfaz_o_lote(caminho_banco, banco):
+    pedidos = [
+        (gravar_procedimento, ("0001/2025", "Primeiro"), None),
+        (falhar, (), None),
+        (gravar_procedimento, ("0002/2025", "Segundo"), None),
+    ]
+    resultados = Banco(caminho_banco)._gravar(pedidos)
+
+    assert [sucesso for sucesso, _ in resultados] == [True, False, True]
+    assert isinstance(resultados[1][1], AttributeError)
+    assert [linha[0] for linha in banco.execute("SELECT numero FROM procedimentos ORDER BY numero")] == ["0001/2025", "0002/2025"]
+
+async def requisitar(porta, metodo, caminho, corpo=None, token=TOKEN):
+    leitor, escritor = await asyncio.open_connection("127.0.0.1", porta)
+    dados = json.dumps(corpo).encode("utf-8") if corpo is not None else b""
+    cabecalhos = f"{metodo} {caminho} HTTP/1.1\r\nContent-Length: {len(dados)}\r\nConnection: close\r\n"
+    if token:
+        cabecalhos += f"Authorization: Bearer {token}\r\n"
+    escritor.write(cabecalhos.encode("latin-1") + b"\r\n" + dados)
+    await escritor.drain()
+    resposta = await leitor.read()
+    escritor.close()
+    cabecalho, _, conteudo = resposta.partition(b"\r\n\r\n")
+    return int(cabecalho.split()[1]), json.loads(conteudo)
+
+def executar_no_servico(caminho_banco, *requisicoes):
+    async def executar():
+        banco = Banco(caminho_banco, leitores=2)
+        banco.iniciar()
+        servidor = await asyncio.start_server(Servico(banco, TOKEN).atender, "127.0.0.1", 0)
+        porta = servidor.sockets[0].getsockname()[1]
+        try:
+            return [await requisitar(porta, *requisicao) for requisicao in requisicoes]
+        finally:
+            servidor.close()
+            await servidor.wait_closed()
+            await banco.encerrar()
+    return asyncio.run(executar())
+
+def test_respostas_http(caminho_banco):
+    sem_token, lista, procedimento, saude = executar_no_servico(
+        caminho_banco,
+        ("GET", "/saude", None, None),
+        ("PATCH", "/documentos/1", ["titulo"]),
+        ("POST", "/procedimentos", {"numero": "0001/2025", "descricao": "Primeiro"}),
+        ("GET", "/saude"),
+    )
+    assert sem_token[0] == 401
+    assert lista[0] == 400 and "objeto JSON" in lista[1]["erro"]
+    assert procedimento == (200, {"resultado": {"numero": "0001/2025"}})
+    assert saude[0] == 200
+
+def test_rede_exige_permissao_e_token(monkeypatch):
+    monkeypatch.setattr(servico, "token_servico", None)
+    with pytest.raises(SystemExit):
+        servico.main(["--host", "0.0.0.0"])
+    with pytest.raises(SystemExit):
+        servico.main(["--host", "0.0.0.0", "--permitir-rede"])
+    assert servico.somente_local("127.0.0.1") and servico.somente_local("::1") and servico.somente_local("localhost")
+    assert not servico.somente_local("0.0.0.0")
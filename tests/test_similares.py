@@ -0,0 +1,77 @@
+import pytest
+
+import similares
+from similares import IndiceSimilares
+
+TEMAS = ["tutela urgência liminar saúde medicamento", "execução fiscal penhora tributo dívida",
+         "guarda alimentos filhos divórcio família", "licitação contrato administrativo pregão"]
+
+def documentos(inicio, quantidade):
+    return [(documento_id, f"{TEMAS[documento_id % len(TEMAS)]} documento{documento_id} processo{documento_id // 7}")
+            for documento_id in range(inicio, inicio + quantidade)]
+
+@pytest.fixture
+def indice(tmp_path):
+    return IndiceSimilares(str(tmp_path / "pj_docs.db"))
+
+def consolidado(tmp_path, docs):
+    referencia = IndiceSimilares(str(tmp_path / "referencia.db"))
+    referencia.adicionar(docs)
+    referencia._consolidar()
+    return referencia
+
+def test_adicionar_nao_refaz_a_matriz_principal(indice, monkeypatch):
+    monkeypatch.setattr(similares, "TAMANHO_BUFFER", 100)
+    indice.adicionar(documentos(0, 40))
+    indice._consolidar()
+    principal, ponderada = indice.frequencias, indice._ponderada
+
+    for documento_id, texto in documentos(40, 10):
+        indice.adicionar([(documento_id, texto)])
+
+    assert indice.frequencias is principal and indice._ponderada is ponderada
+    assert len(indice) == 50 and len(indice._ids_novos) == 10 and indice._ponderada is ponderada
+    # Os documentos ainda fora da matriz principal já aparecem nas consultas
+    indice.adicionar([(99, dict(documentos(0, 40))[13])])
+    assert indice.similares([13], k=1)[13][0][0] == 99
+    assert indice.similares([99], k=1)[99][0][0] == 13
+    assert indice.similares_texto(TEMAS[1], k=1)[0][0] % len(TEMAS) == 1
+
+def test_consolida_ao_atingir_o_limite(indice, monkeypatch):
+    monkeypatch.setattr(similares, "TAMANHO_BUFFER", 8)
+    for documento_id, texto in documentos(0, 8):
+        indice.adicionar([(documento_id, texto)])
+    assert len(indice.ids) == 8 and not indice._ids_novos
+
+def test_resultado_igual_ao_do_indice_consolidado(indice, tmp_path, monkeypatch):
+    monkeypatch.setattr(similares, "TAMANHO_BUFFER", 1000)
+    indice.adicionar(documentos(0, 30))
+    indice._consolidar()
+    indice.remover([3, 5])
+    indice.adicionar([(7, "execução fiscal penhora")])   # Substitui um documento da matriz principal
+    indice.adicionar(documentos(30, 5))
+    indice.remover([31])
+
+    esperado = [(documento_id, texto) for documento_id, texto in documentos(0, 35) if documento_id not in (3, 5, 7, 31)]
+    referencia = consolidado(tmp_path, esperado + [(7, "execução fiscal penhora")])
+    ids = [documento_id for documento_id, _ in esperado]
+
+    assert sorted(indice._posicoes) == sorted(referencia._posicoes)
+    # Antes de consolidar, as linhas excluídas não aparecem nos resultados
+    assert not any({3, 5, 31} & set(dict(resultado)) for resultado in indice.similares(ids, k=50).values())
+    # As pontuações usam o IDF da última consolidação; depois de consolidar, coincidem
+    indice._consolidar()
+    obtido, esperados = indice.similares(ids, k=50), referencia.similares(ids, k=50)
+    for documento_id in ids:
+        assert dict(obtido[documento_id]) == pytest.approx(dict(esperados[documento_id]))
+        assert not {3, 5, 31} & set(dict(obtido[documento_id]))
+
+def test_salvar_e_carregar(indice, tmp_path):
+    indice.adicionar(documentos(0, 12))
+    indice.remover([2])
+    indice.salvar()
+
+    carregado = IndiceSimilares(str(tmp_path / "pj_docs.db"))
+    assert carregado.carregar()
+    assert sorted(carregado._posicoes) == [documento_id for documento_id in range(12) if documento_id != 2]
+    assert carregado.similares([4], k=3) == indice.similares([4], k=3)
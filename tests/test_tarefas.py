@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PySide6.QtWidgets")
+
+import main
+
+@pytest.fixture(autouse=True)
+def app_qt():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+def conectar_sinais(tarefa, *nomes):
+    recebidos = []
+    for nome in nomes:
+        getattr(tarefa.sinais, nome).connect(lambda *valores, nome=nome: recebidos.append((nome, *valores)))
+    return recebidos
+
+def test_resumo_de_pdf_corrompido_termina_com_erro(tmp_path):
+    arquivo = tmp_path / "corrompido.pdf"
+    arquivo.write_bytes(b"isto nao e um PDF")
+    tarefa = main.TarefaResumo(str(arquivo))
+    recebidos = conectar_sinais(tarefa, "concluido", "cancelado", "duplicata")
+
+    tarefa.run()
+
+    assert len(recebidos) == 1
+    sinal, titulo, mensagem = recebidos[0]
+    assert (sinal, titulo) == ("concluido", "Erro") and "Não foi possível processar o arquivo" in mensagem
+
+@pytest.mark.parametrize("classe, funcao, argumentos", [
+    (main.TarefaLote, "processar_lote", (["a.pdf"], "0001/2025")),
+    (main.TarefaRefazerResumos, "refazer_resumos", ("", ())),
+])
+def test_tarefas_de_lote_sempre_emitem_concluido(monkeypatch, classe, funcao, argumentos):
+    def falhar(*args, **kwargs):
+        raise RuntimeError("banco bloqueado")
+    monkeypatch.setattr(main, funcao, falhar)
+    tarefa = classe(*argumentos)
+    recebidos = conectar_sinais(tarefa, "concluido")
+
+    tarefa.run()
+
+    assert len(recebidos) == 1
+    _, quantidade, falhas = recebidos[0]
+    assert quantidade == 0 and falhas and "banco bloqueado" in falhas[0][1]
+
+def test_importacao_de_arquivo_ilegivel_sempre_emite_concluido(tmp_path):
+    arquivo = tmp_path / "documentos.csv"
+    arquivo.write_bytes(b"procedimento;titulo\n0001/2025;Laudo \x81\n")  # 0x81 não existe em cp1252
+    tarefa = main.TarefaImportacao(str(arquivo))
+    recebidos = conectar_sinais(tarefa, "concluido")
+
+    tarefa.run()
+
+    assert len(recebidos) == 1
+    _, inseridos, resumo = recebidos[0]
+    assert inseridos == 0 and "codec can't decode" in resumo["erro"]
@@ -0,0 +1,69 @@
+import pytest
+
+import utils
+import vigilancia
+from vigilancia import VigiaPastas
+from lote import ERRO_LEITURA
+
+@pytest.fixture
+def pasta(banco, tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "CAMINHO_BANCO", str(tmp_path / "pj_docs.db"))
+    banco.execute("INSERT INTO procedimentos (numero) VALUES ('0001/2025')")
+    banco.commit()
+    pasta = tmp_path / "entrada"
+    (pasta / "0001-2025").mkdir(parents=True)
+    for nome in ("lido.txt", "ilegivel.txt", "sem_ia.txt"):
+        (pasta / "0001-2025" / nome).write_text(f"Conteúdo de {nome}", encoding="utf-8")
+    return pasta
+
+def lote_falso(monkeypatch, resultado):
+    chamadas = []
+
+    def processar_lote(arquivos, procedimento, **opcoes):
+        chamadas.append(sorted(arquivos))
+        if isinstance(resultado, Exception):
+            raise resultado
+        falhas = [(arquivo, erro) for arquivo in arquivos for nome, erro in resultado.items() if arquivo.endswith(nome)]
+        return len(arquivos) - len(falhas), falhas
+    monkeypatch.setattr(vigilancia, "processar_lote", processar_lote)
+    return chamadas
+
+def registrados(banco):
+    return {caminho.rsplit("/", 1)[-1]: erro for caminho, erro in banco.execute("SELECT caminho, erro FROM arquivos_processados")}
+
+def test_falhas_passageiras_nao_sao_registradas(pasta, banco, monkeypatch):
+    chamadas = lote_falso(monkeypatch, {
+        "ilegivel.txt": f"{ERRO_LEITURA} (PdfReadError: EOF marker not found).",
+        "sem_ia.txt": "Falha na IA: RateLimitError",
+    })
+    eventos = []
+    vigia = VigiaPastas(str(pasta), ao_evento=lambda evento, **dados: eventos.append(evento))
+
+    assert vigia.executar_uma_vez() == 3
+    assert eventos.count("falha") == 2
+    assert registrados(banco) == {
+        "lido.txt": None, "ilegivel.txt": f"{ERRO_LEITURA} (PdfReadError: EOF marker not found).",
+    }
+
+    # Antes do prazo, nada é tentado de novo; depois dele, só o arquivo com falha passageira
+    assert vigia.executar_uma_vez() == 0
+    vigia._adiados = {caminho: (assinatura, 0.0) for caminho, (assinatura, _) in vigia._adiados.items()}
+    assert vigia.executar_uma_vez() == 1
+    assert chamadas[-1] == [str(pasta / "0001-2025" / "sem_ia.txt")]
+
+    # Ao reiniciar, o arquivo não registrado também é tentado de novo
+    assert VigiaPastas(str(pasta)).executar_uma_vez() == 1
+
+def test_erro_no_lote_nao_interrompe_a_vigilancia(pasta, banco, monkeypatch):
+    lote_falso(monkeypatch, OSError("database is locked"))
+    eventos = []
+    vigia = VigiaPastas(str(pasta), ao_evento=lambda evento, **dados: eventos.append((evento, dados)))
+
+    assert vigia.executar_uma_vez() == 3
+    assert [dados["erro"] for evento, dados in eventos if evento == "falha"] == ["OSError: database is locked"] * 3
+    assert eventos[-1] == ("concluido", {"procedimento": "0001/2025", "inseridos": 0, "falhas": 3})
+    assert registrados(banco) == {}
+
+    lote_falso(monkeypatch, {})
+    assert VigiaPastas(str(pasta)).executar_uma_vez() == 3
+    assert registrados(banco) == {"lido.txt": None, "ilegivel.txt": None, "sem_ia.txt": None}
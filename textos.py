@@ -0,0 +1,64 @@
+import zlib
+import hashlib
+
+from utils import conectar
+
+# Texto limpo de cada documento, guardado comprimido em uma tabela à parte (textos_originais)
+# e identificado pelo hash do conteúdo: arquivos repetidos ocupam espaço uma única vez e a
+# tabela de documentos continua leve. O texto só é descomprimido quando solicitado.
+
+NIVEL_COMPRESSAO = 6
+
+def hash_texto(texto):
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+# Com uma conexão informada, a gravação entra na transação de quem chamou
+def guardar_texto(texto, conn=None):
+    if not texto:
+        return None
+    chave = hash_texto(texto)
+    conexao = conn or conectar()
+    try:
+        existe = conexao.execute("SELECT 1 FROM textos_originais WHERE hash = ?", (chave,)).fetchone()
+        if not existe:  # Evita comprimir de novo um texto já guardado
+            conexao.execute(
+                "INSERT OR IGNORE INTO textos_originais (hash, tamanho, conteudo) VALUES (?, ?, ?)",
+                (chave, len(texto), zlib.compress(texto.encode('utf-8'), NIVEL_COMPRESSAO))
+            )
+        if conn is None:
+            conexao.commit()
+    finally:
+        if conn is None:
+            conexao.close()
+    return chave
+
+def descomprimir(conteudo):
+    return zlib.decompress(conteudo).decode('utf-8')
+
+def carregar_textos(hashes, conn=None):
+    hashes = list(hashes)
+    if not hashes:
+        return {}
+    conexao = conn or conectar()
+    try:
+        linhas = conexao.execute(
+            f"SELECT hash, conteudo FROM textos_originais WHERE hash IN ({', '.join('?' for _ in hashes)})",
+            hashes
+        ).fetchall()
+    finally:
+        if conn is None:
+            conexao.close()
+    return {chave: descomprimir(conteudo) for chave, conteudo in linhas}
+
+# Texto original de um documento, ou None se ele foi cadastrado sem texto guardado
+def texto_do_documento(documento_id, conn=None):
+    conexao = conn or conectar()
+    try:
+        linha = conexao.execute("""
+            SELECT t.conteudo FROM documentos d JOIN textos_originais t ON t.hash = d.hash_texto
+            WHERE d.id = ?
+        """, (documento_id,)).fetchone()
+    finally:
+        if conn is None:
+            conexao.close()
+    return descomprimir(linha[0]) if linha else None
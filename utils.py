@@ -1,11 +1,14 @@
 import os
 import sqlite3
-import json
+import hashlib
+import asyncio
+import importlib
+import threading
+import time
 from datetime import datetime
-from docx import Document
-from PyPDF2 import PdfReader
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dotenv import load_dotenv
-from litellm import completion
 
 # Carrega variáveis de ambiente do arquivo .env
 load_dotenv() 
@@ -13,108 +16,472 @@ pasta_relatorios = os.getenv("PASTA_DOWNLOADS", os.path.expanduser("~\\Downloads
 modelo = os.getenv('modelo_selecionado')
 api_key = os.getenv('OPENAI_API_KEY')
 prompt = os.getenv('prompt')
+concorrencia_llm = int(os.getenv('concorrencia_llm', '4'))
+
+# Limites (em tokens) para a divisão de documentos que excedem o contexto do modelo
+max_tokens_documento = int(os.getenv('max_tokens_documento', '60000'))
+tokens_por_fragmento = int(os.getenv('tokens_por_fragmento', '8000'))
+sobreposicao_fragmentos = int(os.getenv('sobreposicao_fragmentos', '400'))
+
+# Quantidade de páginas a partir da qual o PDF é lido em paralelo
+limite_paginas_paralelo = int(os.getenv('limite_paginas_paralelo', '100'))
+
+# Bibliotecas pesadas (litellm, python-docx, PyPDF2) são importadas apenas no primeiro uso,
+# para não atrasar a abertura da janela. A trava impede que duas threads importem o mesmo
+# módulo ao mesmo tempo (o litellm faz importações internas tardias).
+_trava_importacao = threading.RLock()
+BIBLIOTECAS_PESADAS = ('litellm', 'docx', 'docx.oxml', 'docx.oxml.ns', 'docx.text.paragraph', 'PyPDF2', 'numpy', 'scipy.sparse')
+
+def importar(nome):
+    with _trava_importacao:
+        return importlib.import_module(nome)
+
+# Carrega as bibliotecas pesadas antecipadamente (chamada em segundo plano após abrir a janela)
+def aquecer_bibliotecas():
+    for nome in BIBLIOTECAS_PESADAS:
+        importar(nome)
+
+# Caminho do banco de dados compartilhado pela aplicação
+CAMINHO_BANCO = os.path.join("data", "pj_docs.db")
+
+# Limites do cache de resumos (quantidade de entradas e idade em dias)
+cache_max_itens = int(os.getenv('cache_max_itens', '5000'))
+cache_max_dias = int(os.getenv('cache_max_dias', '180'))
+
+# Contadores de uso do cache durante a sessão
+estatisticas_cache = {'acertos': 0, 'falhas': 0}
 
 # Funções para a leitura dos arquivos PDF, DOCX e TXT
-def ler_pdf(caminho_pdf):
-    reader = PdfReader(caminho_pdf)
-    texto = ''
-    for page in reader.pages:
-        texto += page.extract_text() + '\n'
-    return texto
+
+# Gera o texto de cada página sob demanda (páginas sem texto extraível retornam '')
+def iterar_paginas_pdf(caminho_pdf, inicio=0, fim=None):
+    reader = importar('PyPDF2').PdfReader(caminho_pdf)
+    total = len(reader.pages)
+    fim = total if fim is None else min(fim, total)
+    for indice in range(inicio, fim):
+        yield reader.pages[indice].extract_text() or ''
+
+def _ler_intervalo_pdf(argumentos):
+    caminho_pdf, inicio, fim = argumentos
+    return ''.join(f"{pagina}\n" for pagina in iterar_paginas_pdf(caminho_pdf, inicio, fim))
+
+# Divide as páginas em intervalos processados simultaneamente por um pool de processos
+def ler_pdf_paralelo(caminho_pdf, max_processos=None, total_paginas=None):
+    if total_paginas is None:
+        total_paginas = len(importar('PyPDF2').PdfReader(caminho_pdf).pages)
+    processos = max_processos or os.cpu_count() or 1
+    tamanho = max(1, -(-total_paginas // processos))  # Divisão arredondada para cima
+    intervalos = [(caminho_pdf, inicio, inicio + tamanho) for inicio in range(0, total_paginas, tamanho)]
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        return ''.join(executor.map(_ler_intervalo_pdf, intervalos))
+
+def ler_pdf(caminho_pdf, paralelo=True):
+    total_paginas = len(importar('PyPDF2').PdfReader(caminho_pdf).pages)
+    if paralelo and total_paginas >= limite_paginas_paralelo:
+        return ler_pdf_paralelo(caminho_pdf, total_paginas=total_paginas)
+    return ''.join(f"{pagina}\n" for pagina in iterar_paginas_pdf(caminho_pdf))
 
 def ler_docx(caminho_docx):
-    doc = Document(caminho_docx)
-    texto = ''
-    for paragrafo in doc.paragraphs:
-        texto += paragrafo.text + '\n'
-    return texto
+    doc = importar('docx').Document(caminho_docx)
+    return ''.join(f"{paragrafo.text}\n" for paragrafo in doc.paragraphs)
 
 def ler_txt(caminho_txt):
     with open(caminho_txt, 'r', encoding='utf-8') as file:
         texto = file.read()
     return texto
 
-# Função para limpar o texto extraído
+# Normalização do texto extraído em uma única passagem, trecho a trecho:
+# espaços e tabulações repetidos viram um espaço, cada linha é aparada e as vazias descartadas.
+# Os trechos podem chegar em qualquer tamanho; a linha incompleta aguarda o próximo trecho.
 import re
 
+_ESPACOS = re.compile(r'[ \t]+')
+
+class NormalizadorTexto:
+    def __init__(self):
+        # A linha incompleta fica em partes já normalizadas: só o trecho novo passa pela
+        # expressão regular, e um texto longo sem quebras (comum em PDFs) não é relido
+        self._pendente = []
+        self._espaco = False  # A linha incompleta termina em espaço
+
+    def alimentar(self, trecho):
+        trecho = _ESPACOS.sub(' ', trecho)
+        if self._espaco and trecho.startswith(' '):
+            trecho = trecho[1:]  # Espaços dos dois lados da divisa viram um só
+        if not trecho:
+            return
+        linhas = trecho.split('\n')
+        resto = linhas.pop()
+        if linhas:
+            linhas[0] = ''.join(self._pendente) + linhas[0]
+            self._pendente = []
+        if resto:
+            self._pendente.append(resto)
+        self._espaco = resto.endswith(' ')
+        for linha in linhas:
+            linha = linha.strip()
+            if linha:
+                yield linha
+
+    def finalizar(self):
+        linha, self._pendente, self._espaco = ''.join(self._pendente).strip(), [], False
+        if linha:
+            yield linha
+
+def normalizar_trechos(trechos):
+    normalizador = NormalizadorTexto()
+    for trecho in trechos:
+        yield from normalizador.alimentar(trecho)
+    yield from normalizador.finalizar()
+
+# Função para limpar o texto extraído
 def limpar_texto(texto):
     if not texto:
         return ""
-    # 1. Remove espaços no início e fim do documento
-    texto = texto.strip()
-    # 2. Transforma múltiplos espaços ou tabulações em um único espaço
-    texto = re.sub(r'[ \t]+', ' ', texto)
-    # 3. Substitui quebras de linha múltiplas por uma única quebra (\n)
-    texto = re.sub(r'\n\s*\n+', '\n', texto)
-    # 4. Limpa espaços remanescentes no início e fim de cada linha individual
-    linhas = [linha.strip() for linha in texto.split('\n') if linha.strip()]
-    return '\n'.join(linhas)
-
-# Função para obter o texto do arquivo com base na extensão
-def obter_texto(caminho_arquivo):
+    return '\n'.join(normalizar_trechos([texto]))
+
+# Função para obter o texto do arquivo com base na extensão (ver extratores.py)
+def iterar_texto(caminho_arquivo):
+    from extratores import obter_extrator
+    extrator = obter_extrator(caminho_arquivo)
+    if extrator is None:
+        return iter(())
+    return normalizar_trechos(extrator(caminho_arquivo))
+
+def obter_texto(caminho_arquivo, paralelo=True):
+    from metricas import perfilar
     extensao = os.path.splitext(caminho_arquivo)[1].lower()
-    texto = '' 
-    if extensao == '.pdf':
-        texto = ler_pdf(caminho_arquivo)
-    elif extensao == '.docx':
-        texto = ler_docx(caminho_arquivo)
-    elif extensao == '.txt':
-        texto = ler_txt(caminho_arquivo)
-    else:
-        texto = ''
-    texto = limpar_texto(texto)
-    return texto
+    with perfilar("extracao"):
+        # PDFs extensos continuam sendo lidos em paralelo (ler_pdf decide pelo número de páginas)
+        if extensao == '.pdf' and paralelo:
+            return limpar_texto(ler_pdf(caminho_arquivo, paralelo))
+        return '\n'.join(iterar_texto(caminho_arquivo))
+
+# Texto e tempo de extração em milissegundos (registrado nas métricas da chamada à IA)
+def obter_texto_medido(caminho_arquivo, paralelo=True):
+    inicio = time.perf_counter()
+    texto = obter_texto(caminho_arquivo, paralelo)
+    return texto, (time.perf_counter() - inicio) * 1000
+
+# Mensagens enviadas à IA (compartilhadas pelas chamadas síncronas e assíncronas)
+def montar_mensagens(texto, prompt):
+    instrucao_formato = (
+        "Responda exclusivamente em formato JSON com as seguintes chaves: "
+        "'assunto' (string correspondendo a uma única frase) e 'resumo' (string contendo os 4 parágrafos solicitados)."
+    )
+    return [
+        {"role": "system", "content": "Você é um analista jurídico."},
+        {"role": "system", "content": f"{prompt}\n\n{instrucao_formato}"},
+        {"role": "user", "content": (
+            "Analise o texto abaixo e retorne o resumo em exatamente 4 parágrafos:\n"
+            "1. Visão geral e estrutura do documento.\n"
+            "2. Questões tratadas em cada tópico.\n"
+            "3. Conclusão bem fundamentada sobre o teor.\n"
+            "4. Pendências explicitamente mencionadas.\n\n"
+            f"**Texto fornecido:**\n{texto}"
+        )},
+    ]
+
+# JSON malformado (bloco ```json, texto em volta, vírgula sobrando) é reparado; se não
+# houver conserto, cliente_llm.RespostaInvalida faz a chamada ser repetida
+def interpretar_resposta(resultado):
+    from cliente_llm import carregar_json
+    conteudo_raw = resultado.choices[0].message.content
+    dados = carregar_json(conteudo_raw)
+
+    # Extrai os dados do JSON retornado pela IA
+    assunto = dados.get('assunto', 'Assunto não identificado')
+    resumo = dados.get('resumo', 'Resumo não gerado')
+    return (assunto, resumo)
 
-def analisar_conteudo(texto, prompt, modelo, api_key):
-    print(f"Usando o modelo: {modelo}")
+# Contagem de tokens por linha, com cache (cabeçalhos e rodapés se repetem muito)
+@lru_cache(maxsize=65536)
+def contar_tokens(linha, modelo):
     try:
-        instrucao_formato = (
-            "Responda exclusivamente em formato JSON com as seguintes chaves: "
-            "'assunto' (string correspondendo a uma única frase) e 'resumo' (string contendo os 4 parágrafos solicitados)."
-        )
+        return importar('litellm').token_counter(model=modelo, text=linha)
+    except Exception:
+        return len(linha) // 4 + 1  # Estimativa quando o modelo não é reconhecido
+
+def contar_tokens_texto(texto, modelo):
+    return sum(contar_tokens(linha, modelo) for linha in texto.split('\n'))
+
+# Divide o texto em fragmentos limitados por tokens, repetindo o final de cada um no início do seguinte
+def dividir_em_fragmentos(texto, modelo, limite=None, sobreposicao=None):
+    limite = tokens_por_fragmento if limite is None else limite
+    sobreposicao = sobreposicao_fragmentos if sobreposicao is None else sobreposicao
+
+    linhas = []
+    for linha in texto.split('\n'):
+        tokens = contar_tokens(linha, modelo)
+        if tokens <= limite:
+            linhas.append((linha, tokens))
+            continue
+        # Linhas maiores que o limite são cortadas proporcionalmente ao número de caracteres
+        passo = max(1, len(linha) * limite // tokens)
+        for inicio in range(0, len(linha), passo):
+            pedaco = linha[inicio:inicio + passo]
+            linhas.append((pedaco, contar_tokens(pedaco, modelo)))
 
-        resultado = completion(
+    fragmentos = []
+    atual, tokens_atual = [], 0
+    for linha, tokens in linhas:
+        if atual and tokens_atual + tokens > limite:
+            fragmentos.append('\n'.join(l for l, _ in atual))
+            # Mantém as últimas linhas do fragmento anterior como contexto
+            mantidas, tokens_mantidos = [], 0
+            for item in reversed(atual):
+                if tokens_mantidos + item[1] > sobreposicao:
+                    break
+                mantidas.insert(0, item)
+                tokens_mantidos += item[1]
+            atual, tokens_atual = mantidas, tokens_mantidos
+        atual.append((linha, tokens))
+        tokens_atual += tokens
+    if atual:
+        fragmentos.append('\n'.join(l for l, _ in atual))
+    return fragmentos
+
+# Etapa "map": resumo parcial de um fragmento
+def resumir_fragmento(fragmento, indice, total, modelo, api_key):
+    from metricas import MedicaoChamada
+    from cliente_llm import completar
+    with MedicaoChamada("fragmento", modelo) as medicao:
+        _, resultado, _ = completar(
+            medicao=medicao,
             model=modelo,
             messages=[
                 {"role": "system", "content": "Você é um analista jurídico."},
-                {"role": "system", "content": f"{prompt}\n\n{instrucao_formato}"},
                 {"role": "user", "content": (
-                    "Analise o texto abaixo e retorne o resumo em exatamente 4 parágrafos:\n"
-                    "1. Visão geral e estrutura do documento.\n"
-                    "2. Questões tratadas em cada tópico.\n"
-                    "3. Conclusão bem fundamentada sobre o teor.\n"
-                    "4. Pendências explicitamente mencionadas.\n\n"
-                    f"**Texto fornecido:**\n{texto}"
+                    f"O texto abaixo é a parte {indice} de {total} de um documento maior. "
+                    "Resuma-o de forma objetiva, preservando partes, datas, fatos, pedidos, "
+                    "fundamentos, conclusões e pendências mencionadas.\n\n"
+                    f"**Trecho:**\n{fragmento}"
                 )},
             ],
-            api_key=api_key,
-            response_format={"type": "json_object"} 
+            api_key=api_key
         )
+        return resultado.choices[0].message.content
 
-        conteudo_raw = resultado.choices[0].message.content
-        dados = json.loads(conteudo_raw)
-        
-        # Extrai os dados do JSON retornado pela IA
-        assunto = dados.get('assunto', 'Assunto não identificado')
-        resumo = dados.get('resumo', 'Resumo não gerado')
+# Reduz documentos extensos a resumos parciais, resumidos em paralelo, até caberem no contexto
+def condensar_texto(texto, modelo, api_key, max_rodadas=3):
+    for _ in range(max_rodadas):
+        if contar_tokens_texto(texto, modelo) <= max_tokens_documento:
+            break
+        fragmentos = dividir_em_fragmentos(texto, modelo)
+        total = len(fragmentos)
+        with ThreadPoolExecutor(max_workers=max(1, concorrencia_llm)) as executor:
+            parciais = list(executor.map(
+                lambda item: resumir_fragmento(item[1], item[0], total, modelo, api_key),
+                enumerate(fragmentos, start=1)
+            ))
+        texto = '\n'.join(f"[Parte {i} de {total}]\n{parcial}" for i, parcial in enumerate(parciais, start=1))
+    return texto
 
-        return (assunto, resumo) 
+# Cada chamada é registrada na tabela metricas_llm (latência, tokens, custo, erro; ver metricas.py).
+# Limites de uso, novas tentativas e disjuntor ficam em cliente_llm.py.
+def analisar_conteudo(texto, prompt, modelo, api_key, extracao_ms=None):
+    from metricas import MedicaoChamada
+    from cliente_llm import completar
+    try:
+        # Documentos extensos são condensados em resumos parciais ("map");
+        # o resumo final é gerado sobre eles ("reduce")
+        texto = condensar_texto(texto, modelo, api_key)
+        with MedicaoChamada("resumo", modelo, extracao_ms) as medicao:
+            resposta, _, _ = completar(
+                interpretar_resposta, medicao,
+                model=modelo,
+                messages=montar_mensagens(texto, prompt),
+                api_key=api_key,
+                response_format={"type": "json_object"}
+            )
+            return resposta
 
     except Exception as e:
-        print(f"Erro na análise: {e}")
+        print(f"Erro na análise ({type(e).__name__}): {e}")
         return ("Erro", "Não foi possível processar o conteúdo.")
 
+async def analisar_conteudo_async(texto, prompt, modelo, api_key, extracao_ms=None):
+    from metricas import MedicaoChamada
+    from cliente_llm import acompletar
+    try:
+        texto = await asyncio.to_thread(condensar_texto, texto, modelo, api_key)
+        async with MedicaoChamada("resumo", modelo, extracao_ms) as medicao:
+            resposta, _, _ = await acompletar(
+                interpretar_resposta, medicao,
+                model=modelo,
+                messages=montar_mensagens(texto, prompt),
+                api_key=api_key,
+                response_format={"type": "json_object"}
+            )
+            return resposta
+
+    except Exception as e:
+        print(f"Erro na análise ({type(e).__name__}): {e}")
+        return ("Erro", "Não foi possível processar o conteúdo.")
+
+# Cache de resumos endereçado pelo conteúdo (texto limpo + modelo + prompt)
+def chave_cache(texto, modelo, prompt):
+    h = hashlib.sha256()
+    for parte in (modelo or '', prompt or '', texto):
+        h.update(parte.encode('utf-8'))
+        h.update(b'\0')  # Separador para evitar colisões entre as partes
+    return h.hexdigest()
+
+def buscar_no_cache(chave):
+    try:
+        conn = conectar()
+        try:
+            linha = conn.execute(
+                "SELECT assunto, resumo FROM cache_resumos WHERE chave = ?", (chave,)
+            ).fetchone()
+            if linha:
+                # Atualiza o último acesso para a política de descarte (LRU)
+                conn.execute(
+                    "UPDATE cache_resumos SET acessado_em = CURRENT_TIMESTAMP WHERE chave = ?",
+                    (chave,)
+                )
+                conn.commit()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"Erro ao consultar o cache: {e}")
+        linha = None
+
+    if linha:
+        estatisticas_cache['acertos'] += 1
+        return linha[0], linha[1]
+    estatisticas_cache['falhas'] += 1
+    return None
+
+def gravar_no_cache(chave, modelo, assunto, resumo):
+    try:
+        conn = conectar()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache_resumos (chave, modelo, assunto, resumo) "
+                    "VALUES (?, ?, ?, ?)",
+                    (chave, modelo, assunto, resumo)
+                )
+            limpar_cache(conn=conn)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"Erro ao gravar no cache: {e}")
+
+def limpar_cache(max_itens=None, max_dias=None, conn=None):
+    max_itens = cache_max_itens if max_itens is None else max_itens
+    max_dias = cache_max_dias if max_dias is None else max_dias
+    conexao = conn or conectar()
+    try:
+        with conexao:
+            # 1. Descarta entradas mais antigas que o limite de idade
+            conexao.execute(
+                "DELETE FROM cache_resumos WHERE criado_em < datetime('now', ?)",
+                (f"-{max_dias} days",)
+            )
+            # 2. Mantém apenas as entradas acessadas mais recentemente
+            conexao.execute(
+                "DELETE FROM cache_resumos WHERE chave NOT IN ("
+                "SELECT chave FROM cache_resumos ORDER BY acessado_em DESC LIMIT ?)",
+                (max_itens,)
+            )
+    finally:
+        if conn is None:
+            conexao.close()
+
+def obter_estatisticas_cache():
+    dados = dict(estatisticas_cache)
+    try:
+        conn = conectar()
+        try:
+            dados['entradas'] = conn.execute("SELECT COUNT(*) FROM cache_resumos").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        dados['entradas'] = 0
+    return dados
+
+def resumir_texto(texto, extracao_ms=None):
+    chave = chave_cache(texto, modelo, prompt)
+    em_cache = buscar_no_cache(chave)
+    if em_cache:
+        return em_cache
+
+    assunto, resumo = analisar_conteudo(texto, prompt, modelo, api_key, extracao_ms)
+    # Falhas não são armazenadas para permitir nova tentativa
+    if assunto != "Erro":
+        gravar_no_cache(chave, modelo, assunto, resumo)
+    return assunto, resumo
+
 def gerar_titulo_e_resumo(caminho_arquivo):
-    texto = obter_texto(caminho_arquivo)
+    texto, extracao_ms = obter_texto_medido(caminho_arquivo)
     if not texto:
         return "Erro", "Não foi possível ler o arquivo."
-    assunto, resumo = analisar_conteudo(texto, prompt, modelo, api_key)
+    assunto, resumo = resumir_texto(texto, extracao_ms)
     return assunto, resumo
 
+# Blocos do relatório em DOCX (usados também pela exportação em fluxo, em exportacao.py)
+
+# Acrescenta um parágrafo ao final do corpo. O doc.add_paragraph do python-docx procura
+# o <w:sectPr> entre todos os filhos do corpo a cada chamada, o que torna relatórios
+# grandes quadráticos; aqui o elemento é localizado pelo fim da lista.
+def novo_paragrafo(doc, texto="", estilo=None):
+    corpo = doc.element.body
+    elemento = importar('docx.oxml').OxmlElement('w:p')
+    try:
+        ultimo = corpo[-1]  # Acesso direto ao último filho (len() percorre todos)
+    except IndexError:
+        ultimo = None
+    if ultimo is not None and ultimo.tag == importar('docx.oxml.ns').qn('w:sectPr'):
+        ultimo.addprevious(elemento)
+    else:
+        corpo.append(elemento)
+    paragrafo = importar('docx.text.paragraph').Paragraph(elemento, doc._body)
+    if estilo:
+        paragrafo.style = estilo
+    if texto:
+        paragrafo.add_run(texto)
+    return paragrafo
+
+def adicionar_procedimento_docx(doc, procedimento):
+    novo_paragrafo(doc, f"Autos/expediente: {procedimento}", "Heading 1")
+    novo_paragrafo(doc)
+
+def formatar_data(data_original):
+    try:
+        return datetime.strptime(data_original, "%Y-%m-%d").strftime("%d/%m/%Y")
+    except Exception:
+        return data_original
+
+def adicionar_documento_docx(doc, doc_info):
+    # --- DATA DO CADASTRO ---
+    p_data = novo_paragrafo(doc)
+    p_data.add_run('Data: ').bold = True
+    p_data.add_run(formatar_data(doc_info['data']))
+
+    # --- TÍTULO DO DOCUMENTO ---
+    p_titulo = novo_paragrafo(doc)
+    p_titulo.add_run('Documento: ').bold = True
+    p_titulo.add_run(doc_info['titulo'])
+    
+    # --- RESUMO ---
+    p_resumo = novo_paragrafo(doc)
+    p_resumo.add_run('Teor: ').bold = True
+    p_resumo.add_run(doc_info['resumo'])
+    
+    # Espaço entre documentos do mesmo procedimento
+    novo_paragrafo(doc)
+
+def finalizar_procedimento_docx(doc):
+    # Separador de procedimentos
+    novo_paragrafo(doc, "________________________________________________")
+
+# Seções por procedimento reaproveitadas entre exportações (ver exportacao.EscritorDocx)
 def exportar_relatorio(lista_dados):
+    from exportacao import EscritorDocx
     try:
-        doc = Document()
-        doc.add_heading('PJ Docs', 0)
+        escritor = EscritorDocx(os.path.join(pasta_relatorios, "relatorio_pj_docs.docx"))
 
         # 1. Agrupamento por procedimento
         agrupados = {}
@@ -126,80 +493,277 @@ def exportar_relatorio(lista_dados):
 
         # 2. Construção da hierarquia no documento
         for procedimento, documentos in agrupados.items():
-            doc.add_heading(f"Autos/expediente: {procedimento}", level=1)
-            doc.add_paragraph("")  
-            
+            escritor.iniciar_procedimento(procedimento)
             for doc_info in documentos:
-                # --- DATA DO CADASTRO ---
-                p_data = doc.add_paragraph()
-                p_data.add_run('Data: ').bold = True
-                
-                data_original = doc_info['data']
-                try:
-                    data_formatada = datetime.strptime(data_original, "%Y-%m-%d").strftime("%d/%m/%Y")
-                except Exception:
-                    data_formatada = data_original
-
-                p_data.add_run(data_formatada)
-
-                # --- TÍTULO DO DOCUMENTO ---
-                p_titulo = doc.add_paragraph()
-                p_titulo.add_run('Documento: ').bold = True
-                p_titulo.add_run(doc_info['titulo'])
-                
-                # --- RESUMO ---
-                p_resumo = doc.add_paragraph()
-                p_resumo.add_run('Teor: ').bold = True
-                p_resumo.add_run(doc_info['resumo'])
-                
-                # Espaço entre documentos do mesmo procedimento
-                doc.add_paragraph("") 
-                
-            # Separador de procedimentos (fora do loop de documentos)
-            doc.add_paragraph("________________________________________________")
-
-        doc.save(os.path.join(pasta_relatorios, "relatorio_pj_docs.docx"))
+                escritor.escrever_documento(doc_info)
+            escritor.finalizar_procedimento()
+
+        escritor.fechar()
         return True
     except Exception as e:
         print(f"Erro ao gerar docx: {e}")
         return False
     
+# PRAGMAs aplicados a toda conexão com o banco (sqlite3 e QSqlDatabase)
+PRAGMAS_CONEXAO = (
+    "PRAGMA busy_timeout = 5000",       # Aguarda até 5 s por um bloqueio antes de falhar
+    "PRAGMA cache_size = -65536",       # Cache de páginas de 64 MB
+    "PRAGMA mmap_size = 268435456",     # Leitura por mapeamento de memória (256 MB)
+    "PRAGMA synchronous = NORMAL",      # Seguro no modo WAL e com menos fsyncs
+    "PRAGMA temp_store = MEMORY",
+)
+
+def conectar(caminho_banco=None):
+    conn = sqlite3.connect(caminho_banco or CAMINHO_BANCO)
+    for pragma in PRAGMAS_CONEXAO:
+        conn.execute(pragma)
+    return conn
+
+# Migrações do banco, aplicadas em ordem; a versão atual fica em PRAGMA user_version
+MIGRACOES = [
+    # 1. Tabelas principais e cache de resumos
+    """
+    CREATE TABLE IF NOT EXISTS procedimentos (
+        id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, 
+        numero TEXT NOT NULL UNIQUE, 
+        descricao TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS documentos (
+        id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, 
+        titulo TEXT NOT NULL, 
+        resumo TEXT, 
+        data_criacao TEXT DEFAULT CURRENT_TIMESTAMP, 
+        procedimento TEXT REFERENCES procedimentos (numero) ON DELETE SET NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS cache_resumos (
+        chave TEXT NOT NULL PRIMARY KEY, 
+        modelo TEXT, 
+        assunto TEXT NOT NULL, 
+        resumo TEXT NOT NULL, 
+        criado_em TEXT DEFAULT CURRENT_TIMESTAMP, 
+        acessado_em TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_cache_resumos_acessado ON cache_resumos (acessado_em);
+    """,
+
+    # 2. Índice de busca textual (FTS5) sobre título e resumo, sincronizado por gatilhos
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS documentos_fts USING fts5(
+        titulo, resumo, 
+        content='documentos', content_rowid='id', 
+        tokenize='unicode61 remove_diacritics 2'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS documentos_fts_insercao AFTER INSERT ON documentos BEGIN
+        INSERT INTO documentos_fts (rowid, titulo, resumo) VALUES (new.id, new.titulo, new.resumo);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS documentos_fts_exclusao AFTER DELETE ON documentos BEGIN
+        INSERT INTO documentos_fts (documentos_fts, rowid, titulo, resumo) 
+        VALUES ('delete', old.id, old.titulo, old.resumo);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS documentos_fts_alteracao AFTER UPDATE OF titulo, resumo ON documentos BEGIN
+        INSERT INTO documentos_fts (documentos_fts, rowid, titulo, resumo) 
+        VALUES ('delete', old.id, old.titulo, old.resumo);
+        INSERT INTO documentos_fts (rowid, titulo, resumo) VALUES (new.id, new.titulo, new.resumo);
+    END;
+
+    -- Preenche o índice com os documentos já cadastrados
+    INSERT INTO documentos_fts (documentos_fts) VALUES ('rebuild');
+    """,
+
+    # 3. Índices para os filtros e relatórios por procedimento e data
+    """
+    CREATE INDEX IF NOT EXISTS idx_documentos_procedimento_data ON documentos (procedimento, data_criacao);
+    CREATE INDEX IF NOT EXISTS idx_documentos_data ON documentos (data_criacao);
+    """,
+
+    # 4. Assinaturas MinHash e baldes LSH para detectar documentos quase duplicados
+    """
+    ALTER TABLE documentos ADD COLUMN duplicata_de INTEGER REFERENCES documentos (id) ON DELETE SET NULL;
+
+    CREATE TABLE IF NOT EXISTS assinaturas_documentos (
+        documento_id INTEGER NOT NULL PRIMARY KEY REFERENCES documentos (id) ON DELETE CASCADE,
+        assinatura BLOB NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS faixas_lsh (
+        faixa INTEGER NOT NULL,
+        balde INTEGER NOT NULL,
+        documento_id INTEGER NOT NULL,
+        PRIMARY KEY (faixa, balde, documento_id)
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS idx_faixas_lsh_documento ON faixas_lsh (documento_id);
+
+    CREATE TRIGGER IF NOT EXISTS documentos_assinatura_exclusao AFTER DELETE ON documentos BEGIN
+        DELETE FROM assinaturas_documentos WHERE documento_id = old.id;
+        DELETE FROM faixas_lsh WHERE documento_id = old.id;
+    END;
+    """,
+
+    # 5. Texto original comprimido, em tabela à parte e compartilhado por documentos iguais
+    """
+    CREATE TABLE IF NOT EXISTS textos_originais (
+        hash TEXT NOT NULL PRIMARY KEY,
+        tamanho INTEGER NOT NULL,
+        conteudo BLOB NOT NULL
+    );
+
+    ALTER TABLE documentos ADD COLUMN hash_texto TEXT REFERENCES textos_originais (hash);
+    CREATE INDEX IF NOT EXISTS idx_documentos_hash_texto ON documentos (hash_texto);
+
+    -- Remove o texto quando o último documento que o utiliza é excluído
+    CREATE TRIGGER IF NOT EXISTS documentos_texto_exclusao AFTER DELETE ON documentos
+    WHEN old.hash_texto IS NOT NULL BEGIN
+        DELETE FROM textos_originais WHERE hash = old.hash_texto
+        AND NOT EXISTS (SELECT 1 FROM documentos WHERE hash_texto = old.hash_texto);
+    END;
+    """,
+
+    # 6. Métricas das chamadas à IA (uma linha por chamada, ver metricas.py)
+    """
+    CREATE TABLE IF NOT EXISTS metricas_llm (
+        id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+        criado_em TEXT DEFAULT CURRENT_TIMESTAMP,
+        operacao TEXT NOT NULL,
+        modelo TEXT,
+        latencia_ms REAL,
+        extracao_ms REAL,
+        tokens_prompt INTEGER,
+        tokens_resposta INTEGER,
+        custo REAL,
+        tentativas INTEGER DEFAULT 1,
+        erro TEXT
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_metricas_llm_criado ON metricas_llm (criado_em);
+    """,
+
+    # 7. Arquivos já vistos pela vigilância de pastas (ver vigilancia.py)
+    """
+    CREATE TABLE IF NOT EXISTS arquivos_processados (
+        caminho TEXT NOT NULL PRIMARY KEY,
+        mtime_ns INTEGER NOT NULL,
+        tamanho INTEGER NOT NULL,
+        hash TEXT NOT NULL,
+        procedimento TEXT,
+        processado_em TEXT DEFAULT CURRENT_TIMESTAMP,
+        erro TEXT
+    );
+    """,
+
+    # 8. Remessas à API de lotes do provedor (ver remessas.py); itens com o mesmo texto
+    # compartilham a requisição (custom_id)
+    """
+    CREATE TABLE IF NOT EXISTS remessas (
+        id TEXT NOT NULL PRIMARY KEY,
+        criado_em TEXT DEFAULT CURRENT_TIMESTAMP,
+        modelo TEXT NOT NULL,
+        arquivo TEXT NOT NULL,
+        requisicoes INTEGER NOT NULL DEFAULT 0,
+        lote_externo TEXT,
+        estado TEXT NOT NULL DEFAULT 'preparada',
+        tokens_prompt INTEGER NOT NULL DEFAULT 0,
+        tokens_cache INTEGER NOT NULL DEFAULT 0,
+        tokens_resposta INTEGER NOT NULL DEFAULT 0,
+        atualizado_em TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS itens_remessa (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        remessa_id TEXT NOT NULL REFERENCES remessas (id) ON DELETE CASCADE,
+        custom_id TEXT NOT NULL,
+        arquivo TEXT,
+        procedimento TEXT,
+        data_criacao TEXT,
+        hash_texto TEXT REFERENCES textos_originais (hash),
+        chave_cache TEXT,
+        estado TEXT NOT NULL DEFAULT 'pendente',
+        documento_id INTEGER REFERENCES documentos (id) ON DELETE SET NULL,
+        erro TEXT
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_itens_remessa_custom_id ON itens_remessa (remessa_id, custom_id);
+    """,
+
+    # 9. Seções do relatório DOCX já montadas, por procedimento (ver exportacao.py)
+    """
+    CREATE TABLE IF NOT EXISTS fragmentos_relatorio (
+        chave TEXT NOT NULL PRIMARY KEY,
+        conteudo BLOB NOT NULL,
+        usado_em TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_fragmentos_relatorio_usado_em ON fragmentos_relatorio (usado_em);
+    """,
+
+    # 10. O texto também é mantido enquanto houver item de remessa pendente ou com falha
+    # que o utilize (repetir_falhas reenvia o texto guardado)
+    """
+    CREATE INDEX IF NOT EXISTS idx_itens_remessa_hash_texto ON itens_remessa (hash_texto);
+
+    DROP TRIGGER IF EXISTS documentos_texto_exclusao;
+    CREATE TRIGGER documentos_texto_exclusao AFTER DELETE ON documentos
+    WHEN old.hash_texto IS NOT NULL BEGIN
+        DELETE FROM textos_originais WHERE hash = old.hash_texto
+        AND NOT EXISTS (SELECT 1 FROM documentos WHERE hash_texto = old.hash_texto)
+        AND NOT EXISTS (
+            SELECT 1 FROM itens_remessa WHERE hash_texto = old.hash_texto AND estado IN ('pendente', 'falha')
+        );
+    END;
+    """,
+]
+
+def aplicar_migracoes(conn):
+    versao = conn.execute("PRAGMA user_version").fetchone()[0]
+    pendentes = MIGRACOES[versao:]
+    for numero, script in enumerate(pendentes, start=versao + 1):
+        conn.executescript(f"BEGIN TRANSACTION;\n{script}\nPRAGMA user_version = {numero};\nCOMMIT TRANSACTION;")
+        print(f"Migração {numero} aplicada.")
+    if pendentes:
+        # Atualiza as estatísticas usadas pelo planejador de consultas
+        conn.execute("ANALYZE")
+    return len(pendentes)
+
+# Converte o texto digitado em uma consulta FTS5 segura (cada palavra vira um prefixo entre aspas)
+def montar_consulta_fts(termo):
+    palavras = re.findall(r'\w+', termo or '')
+    return ' '.join(f'"{palavra}"*' for palavra in palavras)
+
+# Busca ordenada por relevância (bm25); retorna os ids dos documentos encontrados
+def buscar_documentos(termo, limite=200):
+    consulta = montar_consulta_fts(termo)
+    if not consulta:
+        return []
+    conn = conectar()
+    try:
+        linhas = conn.execute(
+            "SELECT rowid FROM documentos_fts WHERE documentos_fts MATCH ? ORDER BY rank LIMIT ?",
+            (consulta, limite)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [linha[0] for linha in linhas]
+
 # Criação do banco de dados e tabelas
 def criar_banco():
-    caminho_pasta = "data"
-    nome_banco = os.path.join(caminho_pasta, "pj_docs.db")
+    caminho_pasta = os.path.dirname(CAMINHO_BANCO)
+    nome_banco = CAMINHO_BANCO
     
     try:
         if not os.path.exists(caminho_pasta):
             os.makedirs(caminho_pasta)
             print(f"Diretório '{caminho_pasta}' criado.")
 
-        sql_script = """
-        PRAGMA foreign_keys = off;
-        BEGIN TRANSACTION;
-
-        CREATE TABLE IF NOT EXISTS procedimentos (
-            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, 
-            numero TEXT NOT NULL UNIQUE, 
-            descricao TEXT
-        );
-
-        CREATE TABLE IF NOT EXISTS documentos (
-            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, 
-            titulo TEXT NOT NULL, 
-            resumo TEXT, 
-            data_criacao TEXT DEFAULT CURRENT_TIMESTAMP, 
-            procedimento TEXT REFERENCES procedimentos (numero) ON DELETE SET NULL
-        );
-
-        COMMIT TRANSACTION;
-        PRAGMA foreign_keys = on;
-        """
-        
-        conn = sqlite3.connect(nome_banco)
-        cursor = conn.cursor()
-        cursor.executescript(sql_script)
-        conn.commit()
+        conn = conectar(nome_banco)
+        # O modo WAL permite leituras simultâneas à escrita e fica gravado no arquivo
+        conn.execute("PRAGMA journal_mode = WAL")
+        aplicar_migracoes(conn)
         
         print(f"Banco de dados '{nome_banco}' operacional!")
         
@@ -0,0 +1,268 @@
+import os
+import time
+import hashlib
+import threading
+
+from utils import conectar
+from extratores import extensoes_suportadas
+from lote import processar_lote, ERRO_LEITURA
+
+# Vigilância de uma pasta de entrada: cada subpasta corresponde a um procedimento (pelo
+# número; "0001-2025" ou "0001_2025" também valem para "0001/2025") e os arquivos novos ou
+# alterados são resumidos e registrados automaticamente. Os arquivos já vistos ficam na
+# tabela arquivos_processados (mtime, tamanho e hash): ao reiniciar, basta comparar o stat,
+# sem reler nem resumir de novo. Arquivos ilegíveis também são registrados, com o erro, e só
+# voltam a ser lidos se mudarem; falhas passageiras da IA (limite de requisições, tempo
+# esgotado, disjuntor aberto) não são registradas e o arquivo é tentado de novo após
+# ESPERA_NOVA_TENTATIVA. Usa o watchdog (inotify etc.), se instalado; caso
+# contrário, varre a pasta periodicamente.
+
+INTERVALO_VARREDURA = 5.0             # Segundos entre varreduras, sem o watchdog
+INTERVALO_VARREDURA_COM_EVENTOS = 60.0  # Com o watchdog, a varredura só cobre eventos perdidos
+ESTABILIDADE = 2.0                    # Segundos sem alterações antes de processar um arquivo
+ESPERA_NOVA_TENTATIVA = 300.0        # Segundos antes de repetir um arquivo com falha passageira
+TAMANHO_BLOCO_HASH = 1 << 20
+
+def hash_arquivo(caminho):
+    resumo = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        while bloco := arquivo.read(TAMANHO_BLOCO_HASH):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+def ignorar_arquivo(nome):
+    # Arquivos ocultos e de bloqueio/temporários do Office e do LibreOffice
+    return nome.startswith(('.', '~$', '.~lock')) or nome.endswith(('.tmp', '.part', '.crdownload'))
+
+class VigiaPastas:
+    def __init__(self, pasta, intervalo=None, estabilidade=ESTABILIDADE, concorrencia=None,
+                 max_processos=None, ao_evento=None):
+        self.pasta = os.path.abspath(pasta)
+        self.intervalo = intervalo
+        self.estabilidade = estabilidade
+        self.concorrencia = concorrencia
+        self.max_processos = max_processos
+        self.ao_evento = ao_evento or (lambda evento, **dados: None)
+        self.extensoes = extensoes_suportadas()
+        self._trava = threading.Lock()
+        self._pendentes = {}   # caminho -> (instante do último evento, (mtime_ns, tamanho))
+        self._sem_procedimento = {}  # Arquivos de subpastas sem procedimento cadastrado
+        self._adiados = {}     # caminho -> ((mtime_ns, tamanho), instante da nova tentativa)
+        self._total_procedimentos = None
+        self._conhecidos = self._carregar_conhecidos()
+
+    def _carregar_conhecidos(self):
+        conn = conectar()
+        try:
+            linhas = conn.execute(
+                "SELECT caminho, mtime_ns, tamanho, hash FROM arquivos_processados WHERE caminho LIKE ? ESCAPE '\\'",
+                (self.pasta.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + os.sep + '%',)
+            ).fetchall()
+        finally:
+            conn.close()
+        return {caminho: (mtime_ns, tamanho, chave) for caminho, mtime_ns, tamanho, chave in linhas}
+
+    def interessa(self, caminho):
+        nome = os.path.basename(caminho)
+        return not ignorar_arquivo(nome) and os.path.splitext(nome)[1].lower() in self.extensoes
+
+    # --- Eventos: rajadas sobre o mesmo arquivo viram uma única entrada pendente ---
+
+    def notificar(self, caminho):
+        if not self.interessa(caminho):
+            return
+        try:
+            estado = os.stat(caminho)
+        except OSError:
+            with self._trava:
+                self._pendentes.pop(caminho, None)  # Removido ou renomeado antes de ser processado
+            return
+        assinatura = (estado.st_mtime_ns, estado.st_size)
+        with self._trava:
+            anterior = self._pendentes.get(caminho)
+            if anterior is None or anterior[1] != assinatura:
+                self._pendentes[caminho] = (time.monotonic(), assinatura)
+
+    def _prontos(self, imediatos=False):
+        limite = time.monotonic() - (0 if imediatos else self.estabilidade)
+        with self._trava:
+            prontos = [caminho for caminho, (instante, _) in self._pendentes.items() if instante <= limite]
+            for caminho in prontos:
+                del self._pendentes[caminho]
+        return prontos
+
+    # Compara o stat dos arquivos com o registrado; só os novos ou alterados ficam pendentes
+    def varrer(self):
+        conn = conectar()
+        try:
+            total_procedimentos = conn.execute("SELECT COUNT(*) FROM procedimentos").fetchone()[0]
+        finally:
+            conn.close()
+        if total_procedimentos != self._total_procedimentos:
+            self._sem_procedimento.clear()  # Procedimentos novos: tenta de novo as pastas sem correspondência
+            self._total_procedimentos = total_procedimentos
+
+        for raiz, pastas, nomes in os.walk(self.pasta):
+            pastas[:] = [pasta for pasta in pastas if not pasta.startswith('.')]
+            for nome in nomes:
+                caminho = os.path.join(raiz, nome)
+                if not self.interessa(caminho):
+                    continue
+                try:
+                    estado = os.stat(caminho)
+                except OSError:
+                    continue
+                assinatura = (estado.st_mtime_ns, estado.st_size)
+                if self._conhecidos.get(caminho, (None, None))[:2] == assinatura:
+                    continue
+                if self._sem_procedimento.get(caminho) == assinatura:
+                    continue
+                adiado = self._adiados.get(caminho)
+                if adiado and adiado[0] == assinatura and time.monotonic() < adiado[1]:
+                    continue
+                self.notificar(caminho)
+
+    # --- Processamento ---
+
+    def procedimento_do_arquivo(self, caminho, conn):
+        relativo = os.path.relpath(caminho, self.pasta)
+        partes = relativo.split(os.sep)
+        if len(partes) < 2:
+            return None  # Arquivo na raiz da pasta de entrada: sem procedimento
+        nome = partes[0]
+        for numero in dict.fromkeys((nome, nome.replace('-', '/'), nome.replace('_', '/'))):
+            if conn.execute("SELECT 1 FROM procedimentos WHERE numero = ?", (numero,)).fetchone():
+                return numero
+        return None
+
+    def processar(self, caminhos):
+        grupos = {}
+        assinaturas = {}
+        conn = conectar()
+        try:
+            for caminho in caminhos:
+                try:
+                    estado = os.stat(caminho)
+                    assinatura = (estado.st_mtime_ns, estado.st_size)
+                    procedimento = self.procedimento_do_arquivo(caminho, conn)
+                    if procedimento is None:
+                        self._sem_procedimento[caminho] = assinatura
+                        self.ao_evento("sem_procedimento", arquivo=caminho)
+                        continue
+                    chave = hash_arquivo(caminho)
+                except OSError as e:
+                    self.ao_evento("falha", arquivo=caminho, erro=str(e))
+                    continue
+
+                conhecido = self._conhecidos.get(caminho)
+                if conhecido and conhecido[2] == chave:
+                    # Só a data mudou (arquivo copiado de novo, por exemplo): nada a resumir
+                    with conn:
+                        conn.execute(
+                            "UPDATE arquivos_processados SET mtime_ns = ?, tamanho = ? WHERE caminho = ?",
+                            (*assinatura, caminho)
+                        )
+                    self._conhecidos[caminho] = (*assinatura, chave)
+                    continue
+                assinaturas[caminho] = (*assinatura, chave, procedimento)
+                grupos.setdefault(procedimento, []).append(caminho)
+        finally:
+            conn.close()
+
+        for procedimento, arquivos in grupos.items():
+            self.ao_evento("inicio", procedimento=procedimento, arquivos=len(arquivos))
+            try:
+                inseridos, falhas = processar_lote(
+                    arquivos, procedimento, concorrencia=self.concorrencia, max_processos=self.max_processos
+                )
+            except Exception as e:
+                # Falha do lote inteiro (banco bloqueado, processo de extração encerrado):
+                # a vigilância continua e os arquivos são tentados de novo mais tarde
+                inseridos, falhas = 0, [(arquivo, f"{type(e).__name__}: {e}") for arquivo in arquivos]
+            erros = dict(falhas)
+            for arquivo, erro in falhas:
+                self.ao_evento("falha", arquivo=arquivo, erro=erro)
+            definitivos, adiados = [], []
+            for arquivo in arquivos:
+                erro = erros.get(arquivo)
+                (definitivos if erro is None or erro.startswith(ERRO_LEITURA) else adiados).append(arquivo)
+            self._registrar([(arquivo, *assinaturas[arquivo], erros.get(arquivo)) for arquivo in definitivos])
+            nova_tentativa = time.monotonic() + ESPERA_NOVA_TENTATIVA
+            for arquivo in adiados:
+                self._adiados[arquivo] = (assinaturas[arquivo][:2], nova_tentativa)
+            self.ao_evento("concluido", procedimento=procedimento, inseridos=inseridos, falhas=len(falhas))
+
+    # Arquivos ilegíveis também são registrados (com o erro): só são lidos de novo se mudarem
+    def _registrar(self, registros):
+        conn = conectar()
+        try:
+            with conn:
+                conn.executemany("""
+                    INSERT INTO arquivos_processados (caminho, mtime_ns, tamanho, hash, procedimento, erro)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (caminho) DO UPDATE SET
+                        mtime_ns = excluded.mtime_ns, tamanho = excluded.tamanho, hash = excluded.hash,
+                        procedimento = excluded.procedimento, erro = excluded.erro,
+                        processado_em = CURRENT_TIMESTAMP
+                """, registros)
+        finally:
+            conn.close()
+        for caminho, mtime_ns, tamanho, chave, _, _ in registros:
+            self._conhecidos[caminho] = (mtime_ns, tamanho, chave)
+            self._adiados.pop(caminho, None)
+
+    # --- Laço principal ---
+
+    def _iniciar_observador(self):
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            return None
+
+        vigia = self
+
+        class Manipulador(FileSystemEventHandler):
+            def on_created(self, evento):
+                if not evento.is_directory:
+                    vigia.notificar(evento.src_path)
+
+            on_modified = on_created
+
+            def on_moved(self, evento):
+                if not evento.is_directory:
+                    vigia.notificar(evento.src_path)
+                    vigia.notificar(evento.dest_path)
+
+        observador = Observer()
+        observador.schedule(Manipulador(), self.pasta, recursive=True)
+        observador.start()
+        return observador
+
+    # Varre e processa uma vez, sem aguardar a estabilidade (uso no cron)
+    def executar_uma_vez(self):
+        self.varrer()
+        prontos = self._prontos(imediatos=True)
+        if prontos:
+            self.processar(prontos)
+        return len(prontos)
+
+    def executar(self, parar=None):
+        parar = parar or threading.Event()
+        observador = self._iniciar_observador()
+        intervalo = self.intervalo or (INTERVALO_VARREDURA if observador is None else INTERVALO_VARREDURA_COM_EVENTOS)
+        self.ao_evento("vigiando", pasta=self.pasta, modo="eventos" if observador else "varredura", intervalo=intervalo)
+        proxima_varredura = 0.0
+        try:
+            while not parar.is_set():
+                if time.monotonic() >= proxima_varredura:
+                    self.varrer()
+                    proxima_varredura = time.monotonic() + intervalo
+                prontos = self._prontos()
+                if prontos:
+                    self.processar(prontos)
+                parar.wait(min(1.0, self.estabilidade / 2))
+        finally:
+            if observador:
+                observador.stop()
+                observador.join()